@@ -22,3 +22,6 @@ class API(APIBase):
         super()._configure(config_params)
         ccu_store = config_params.get('ccu_store')
         self.zyre.add_ccu_plugin(ccu_store)
+        event_scheduler = config_params.get('event_scheduler')
+        if event_scheduler:
+            self.zyre.add_event_scheduler(event_scheduler)
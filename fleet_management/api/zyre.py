@@ -10,6 +10,7 @@ class ZyreInterface(ZyreInterfaceBase):
 
     def __init__(self, zyre_node, **kwargs):
         self.ccu_store = kwargs.get('ccu_store')
+        self.event_scheduler = kwargs.get('event_scheduler')
         super().__init__(zyre_node, **kwargs)
 
     def receive_msg_cb(self, msg_content):
@@ -39,5 +40,12 @@ class ZyreInterface(ZyreInterfaceBase):
 
         super().receive_msg_cb(msg_content)
 
+        if self.event_scheduler:
+            # components subscribe to the types of the messages that change their state
+            self.event_scheduler.notify(message_type)
+
     def add_ccu_plugin(self, ccu_store):
         self.ccu_store = ccu_store
+
+    def add_event_scheduler(self, event_scheduler):
+        self.event_scheduler = event_scheduler
@@ -1,6 +1,5 @@
 import argparse
 import logging
-import time
 
 import rospy
 
@@ -22,6 +21,15 @@ class FMS(object):
         self.api = self.config.api
         self.api.register_callbacks(self)
 
+        self.event_scheduler = self.config.event_scheduler
+        self.event_scheduler.add_component('resource_manager', self.resource_manager.run,
+                                           events=['task_request', 'BID', 'NO-BID', 'TASK-CONTRACT-ACKNOWLEDGEMENT',
+                                                   'ROBOT-ELEVATOR-CALL-REQUEST', 'ELEVATOR-CMD-REPLY'])
+        self.event_scheduler.add_component('task_manager', self.task_manager.run,
+                                           events=['planning', 'allocation', 'dispatch'])
+        self.event_scheduler.add_component('api', self.api.run)
+        self.event_scheduler.add_component('duration_estimator', self.config.duration_estimator.write_back)
+
         self.task_manager.restore_task_data()
         self.logger.info("Initialized FMS")
 
@@ -29,18 +37,17 @@ class FMS(object):
         try:
             self.api.start()
 
-            while True:
-                self.resource_manager.run()
-                self.task_manager.run()
-                self.api.run()
-                time.sleep(0.5)
+            self.event_scheduler.run()
         except (KeyboardInterrupt, SystemExit):
             rospy.signal_shutdown('FMS ROS shutting down')
             self.api.shutdown()
+            self.task_manager.shutdown()
             self.logger.info('FMS is shutting down')
 
     def shutdown(self):
+        self.event_scheduler.shutdown()
         self.api.shutdown()
+        self.task_manager.shutdown()
 
 
 if __name__ == '__main__':
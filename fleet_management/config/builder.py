@@ -3,6 +3,8 @@ from datetime import datetime
 
 from fleet_management.api.api import API
 from fleet_management.resources.infrastructure.brsu import DurationGraph
+from fleet_management.resources.infrastructure.duration_estimator import DurationEstimator
+from fleet_management.resources.infrastructure.travel_times import TravelTimeMatrix
 from fmlib.config.builders import Store
 from mrs.allocation.auctioneer import Auctioneer
 from fleet_management.plugins.mrta.bidder import Bidder
@@ -20,11 +22,15 @@ from fleet_management.resources.manager import ResourceManager
 from fleet_management.task.dispatcher import Dispatcher
 from fleet_management.task.manager import TaskManager
 from fleet_management.task.monitor import TaskMonitor
+from fleet_management.utils.scheduler import EventScheduler
 
 _component_modules = {'api': API,
                       'ccu_store': Store,
+                      'event_scheduler': EventScheduler,
                       'elevator_manager': add_elevator_manager,
                       'duration_graph': DurationGraph.load_graph,
+                      'travel_time_matrix': TravelTimeMatrix.load_matrix,
+                      'duration_estimator': DurationEstimator,
                       'fleet_monitor': FleetMonitor,
                       'resource_manager': ResourceManager,
                       'task_monitor': TaskMonitor,
@@ -32,9 +38,9 @@ _component_modules = {'api': API,
                       'task_manager': TaskManager
                       }
 
-_config_order = ['ccu_store', 'api',
+_config_order = ['ccu_store', 'event_scheduler', 'api',
+                 'duration_graph', 'travel_time_matrix', 'duration_estimator',
                  'elevator_manager',
-                 'duration_graph',
                  'fleet_monitor', 'resource_manager',
                  'task_monitor', 'dispatcher', 'task_manager'
                  ]
@@ -83,6 +83,9 @@ class Configurator(object):
 
         component = self._components.get(component_name)
         component_config = self._config_params.get(component_name)
+        # optional components, e.g. a travel time matrix that has not been computed
+        if component is None:
+            return
 
         if hasattr(component, 'configure'):
             self.logger.debug('Configuring %s', component_name)
@@ -116,6 +119,10 @@ class Configurator(object):
     def ccu_store(self):
         return self.get_component('ccu_store')
 
+    @property
+    def event_scheduler(self):
+        return self.get_component('event_scheduler')
+
     @property
     def task_manager(self):
         return self.get_component('task_manager')
@@ -124,6 +131,10 @@ class Configurator(object):
     def resource_manager(self):
         return self.get_component('resource_manager')
 
+    @property
+    def duration_estimator(self):
+        return self.get_component('duration_estimator')
+
     def get_component(self, component):
         if component in self._components.keys():
             return self._components.get(component)
@@ -141,9 +152,12 @@ class Configurator(object):
         plugin_config = self._config_params.get('plugins')
         if plugin_config is None:
             self.logger.debug("Found no plugins in the configuration file.")
-            return None
+            return self._plugins
 
         for plugin, config in plugin_config.items():
+            if plugin == 'osm':
+                # the path planner can plan on the topology shared by the FMS components
+                config = dict(config, duration_graph=self.get_component('duration_graph'))
             try:
                 component = self._plugin_factory.configure(plugin, ccu_store=ccu_store, api=api,
                                                            dispatcher=self.get_component('dispatcher'), **config)
@@ -164,10 +178,13 @@ class Configurator(object):
         robot_components = robot_proxy_builder(robot_id, allocation_method, config)
 
         duration_graph = self.get_component('duration_graph')
-        osm = self._plugin_factory.configure('osm', **self._config_params['plugins']['osm'])
+        travel_time_matrix = self.get_component('travel_time_matrix')
+        osm = self._plugin_factory.configure('osm', duration_graph=duration_graph,
+                                             **self._config_params['plugins']['osm'])
 
         bidder = robot_components.get("bidder")
-        bidder.configure(duration_graph=duration_graph, path_planner=osm.get("path_planner"))
+        bidder.configure(duration_graph=duration_graph, travel_time_matrix=travel_time_matrix,
+                         path_planner=osm.get("path_planner"))
         robot_components.update(bidder=bidder)
 
         return robot_components
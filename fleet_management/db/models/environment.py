@@ -154,6 +154,13 @@ class Area(OSMArea):
         ignore_unknown_fields = True
         final = True
 
+    @classmethod
+    def from_fms_area(cls, area):
+        """Creates an Area from a ropod.structs.area.Area, without going through its dict representation
+        """
+        subareas = [SubArea(id=sub_area.id, name=sub_area.name) for sub_area in area.sub_areas or list()]
+        return cls(name=area.name, id=area.id, type=area.type, floor_number=area.floor_number, subareas=subareas)
+
 
 class Position(PositionBaseModel):
 
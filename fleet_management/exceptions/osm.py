@@ -4,3 +4,11 @@ class OSMPlannerException(Exception):
     a valid path between requested areas."""
 
     pass
+
+
+class OSMSnapshotMiss(OSMPlannerException):
+
+    """This exception will be raised when a query cannot be answered from
+    the offline OSM snapshot."""
+
+    pass
@@ -0,0 +1,77 @@
+import logging
+
+from task_planner.knowledge_base_interface import KnowledgeBaseInterface
+
+
+class InMemoryKnowledgeBase(object):
+    """A task planner knowledge base kept in Python structures
+
+    It provides the part of the ``KnowledgeBaseInterface`` used for planning, so the
+    planner can build the PDDL problem without any database round trips. Facts are
+    stored in the same format in which they are inserted, i.e.
+    ``(predicate, [(param, value), ...])`` and fluents as
+    ``(fluent, [(param, value), ...], value)``.
+
+    Args:
+        kb_database_name (str): Name of the knowledge base database
+        persist (bool): If True, all changes are also written to the database,
+                        e.g. to inspect the knowledge base while debugging
+    """
+
+    def __init__(self, kb_database_name=None, persist=False):
+        self.logger = logging.getLogger('fms.task.planner.kb')
+        self.kb_database_name = kb_database_name
+
+        self._facts = dict()
+        self._fluents = dict()
+
+        self._mongo_interface = None
+        if persist and kb_database_name:
+            self.logger.debug("Persisting knowledge base to %s", kb_database_name)
+            self._mongo_interface = KnowledgeBaseInterface(kb_database_name)
+
+    def insert_facts(self, fact_list):
+        for name, params in fact_list:
+            self._facts[self._get_key(name, params)] = (name, list(params))
+        if self._mongo_interface:
+            self._mongo_interface.insert_facts(fact_list)
+        return True
+
+    def remove_facts(self, fact_list):
+        for name, params in fact_list:
+            self._facts.pop(self._get_key(name, params), None)
+        if self._mongo_interface:
+            self._mongo_interface.remove_facts(fact_list)
+        return True
+
+    def insert_fluents(self, fluent_list):
+        # a fluent has a single value, so inserting it again overwrites the previous value
+        for name, params, value in fluent_list:
+            self._fluents[self._get_key(name, params)] = (name, list(params), value)
+        if self._mongo_interface:
+            self._mongo_interface.insert_fluents(fluent_list)
+        return True
+
+    def remove_fluents(self, fluent_list):
+        for fluent in fluent_list:
+            name, params = fluent[0], fluent[1]
+            self._fluents.pop(self._get_key(name, params), None)
+        if self._mongo_interface:
+            self._mongo_interface.remove_fluents(fluent_list)
+        return True
+
+    def get_predicate_names(self):
+        return sorted({name for name, _ in self._facts.values()})
+
+    def get_fluent_names(self):
+        return sorted({name for name, _, _ in self._fluents.values()})
+
+    def get_predicate_assertions(self):
+        return list(self._facts.values())
+
+    def get_fluent_assertions(self):
+        return list(self._fluents.values())
+
+    @staticmethod
+    def _get_key(name, params):
+        return name, tuple(tuple(param) for param in params)
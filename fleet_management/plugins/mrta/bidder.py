@@ -1,5 +1,4 @@
 from fleet_management.db.models.actions import GoTo
-from fleet_management.db.models.environment import Area
 from fleet_management.db.models.robot import Ropod
 from fleet_management.db.models.task import TaskPlan
 from fleet_management.exceptions.osm import OSMPlannerException
@@ -28,15 +27,23 @@ class Bidder(BidderBase):
         """
         pickup_subarea = self.path_planner.get_sub_area(task.request.pickup_location, behaviour="docking")
 
+        travel_time_matrix = getattr(self, 'travel_time_matrix', None)
+        if travel_time_matrix:
+            duration = travel_time_matrix.get_duration(previous_location, pickup_subarea.name)
+            if duration is not None:
+                mean, variance = duration
+                return InterTimepointConstraint(mean=mean, variance=variance)
+
+        duration = self._get_shortest_expected_duration(previous_location, pickup_subarea.name)
+        if duration is not None:
+            mean, variance = duration
+            return InterTimepointConstraint(mean=mean, variance=variance)
+
         try:
             self.logger.debug('Planning path between %s and %s', previous_location, pickup_subarea.name)
 
             areas = self.path_planner.get_path_plan_from_local_area(previous_location, pickup_subarea.name)
-            path_plan = list()
-
-            for area in areas:
-                model_area = Area(**area.to_dict())
-                path_plan.append(model_area)
+            path_plan = self.path_planner.to_model_areas(areas)
 
             action = GoTo.create_new(type="GOTO", areas=path_plan)
             task_plan = TaskPlan(actions=[action])
@@ -50,3 +57,22 @@ class Bidder(BidderBase):
             self.logger.warning("OSPlanner failed at computing a path between %s and %s", previous_location,
                                 pickup_subarea.name)
             return
+
+    def _get_shortest_expected_duration(self, start, destination):
+        """Returns the (mean, variance) of the shortest expected path between two sub-areas
+        in the duration graph or None if they are not connected in it
+        """
+        location_index = getattr(self.path_planner, 'location_index', None)
+        if not location_index:
+            return None
+        start_sub_area = location_index.get_parent_area(start)
+        destination_sub_area = location_index.get_parent_area(destination)
+        if start_sub_area is None or destination_sub_area is None:
+            return None
+
+        path = self.duration_graph.shortest_expected_duration(start_sub_area[1].id, destination_sub_area[1].id)
+        if path is None:
+            return None
+        mean, variance, sub_areas = path
+        self.logger.debug("Shortest expected path between %s and %s: %s", start, destination, sub_areas)
+        return mean, variance
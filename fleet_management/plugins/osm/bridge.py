@@ -1,14 +1,222 @@
+import hashlib
+import json
 import logging
+import os
+import re
+import threading
+import time
 
 from OBL import OSMBridge
+from overpy import exception as overpy_exception
+from fleet_management.plugins.osm.overpass import OverpassClient, QueryStats
+from fleet_management.plugins.osm.snapshot import OSMSnapshot, SnapshotAdapter
 
 class OSMBridgeFMS(OSMBridge):
 
-    """OSM bridge derived class for FMS functionality"""
+    """OSM bridge derived class for FMS functionality
 
-    def __init__(self, **kwargs):
+    If a ``snapshot`` file is given, all queries are answered from it
+    instead of the Overpass server; the queries missing from the snapshot
+    raise an ``OSMSnapshotMiss``, or are sent to the Overpass server if
+    ``snapshot_fallback`` is set. All the queries sent to the Overpass server,
+    including those of OBL, go through a pool of keep-alive connections and
+    their latency is recorded in ``query_stats``.
+    """
+
+    def __init__(self, snapshot=None, snapshot_fallback=False, pool_size=10, max_batch_size=200, index_file=None,
+                 **kwargs):
+        self.logger = logging.getLogger('fms.plugins.osm.bridge')
         super(OSMBridgeFMS, self).__init__(**kwargs)
 
+        # the areas and local areas of each building, read once from OSM
+        # and optionally persisted to ``index_file``
+        self.index_file = index_file
+        self._area_records = dict()
+        self._behaviour_index = dict()
+        self._index_lock = threading.Lock()
+
+        self.query_stats = QueryStats()
+        self.overpass = OverpassClient(kwargs.get('server_ip'), kwargs.get('server_port'), pool_size=pool_size,
+                                       max_batch_size=max_batch_size, stats=self.query_stats)
+        self._pool_queries()
+
+        self.snapshot = None
+        self.snapshot_file = None
+        if snapshot:
+            self.use_snapshot(OSMSnapshot.load(snapshot), record=snapshot_fallback)
+            self.snapshot_file = snapshot
+
+    def _pool_queries(self):
+        """Sends the queries of the OBL adapter through the connection pool of ``overpass``
+        instead of opening a new connection for each of them. The response is parsed by the
+        overpy API of the adapter, as the adapter does itself
+        """
+        api = getattr(self.osm_adapter, 'api', None)
+        if not hasattr(api, 'parse_json'):
+            self.logger.warning("The OBL adapter does not use overpy, its queries are not pooled")
+            self._time_queries()
+            return
+
+        def pooled_query(query, *args, **kwargs):
+            result = api.parse_json(self._get_obl_response(query).content)
+            return result.nodes, result.ways, result.relations
+
+        self.osm_adapter.get = pooled_query
+
+    def _get_obl_response(self, query):
+        """Sends a query of OBL to the Overpass server and returns its JSON response.
+        Errors raise the same overpy exceptions as the queries of the OBL adapter;
+        the remarks of the server are handled when the response is parsed
+        """
+        response = self.overpass.send(query, kind='obl')
+        if response.status_code == 200:
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('application/json'):
+                raise overpy_exception.OverpassUnknownContentType(content_type)
+            return response
+        if response.status_code == 400:
+            msgs = [re.sub(r'<[^>]*?>', '', msg) for msg in re.findall(r'<p>(<strong\s.*?)</p>', response.text)]
+            raise overpy_exception.OverpassBadRequest(query, msgs=msgs)
+        if response.status_code == 429:
+            raise overpy_exception.OverpassTooManyRequests()
+        if response.status_code == 504:
+            raise overpy_exception.OverpassGatewayTimeout()
+        raise overpy_exception.OverpassUnknownHTTPStatusCode(response.status_code)
+
+    def get_osm_json(self, query):
+        """ Get the OSM/JSON response of the Overpass server to a query of OBL.
+
+        :query: str
+        :returns: dict
+
+        """
+        response = self._get_obl_response(query)
+        # the response is parsed once, so that the errors reported in it are raised before it is recorded
+        self.osm_adapter.api.parse_json(response.content)
+        return response.json()
+
+    def parse_osm_json(self, response):
+        """ Parse an OSM/JSON response into the elements OBL builds its world
+        model objects from, as the OBL adapter does with the responses of the server.
+
+        :response: dict
+        :returns: (list, list, list) of overpy nodes, ways and relations
+
+        """
+        result = self.osm_adapter.api.parse_json(json.dumps(response))
+        return result.nodes, result.ways, result.relations
+
+    def _time_queries(self):
+        query = self.osm_adapter.get
+        query_stats = self.query_stats
+
+        def timed_query(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return query(*args, **kwargs)
+            finally:
+                query_stats.record('obl', time.monotonic() - start)
+
+        self.osm_adapter.get = timed_query
+
+    def get_query_stats(self):
+        """ Get the latency (count, mean, p95 and max in seconds) of the queries
+        sent to the Overpass server, per kind of query.
+
+        :returns: dict
+
+        """
+        return self.query_stats.stats()
+
+    def get_local_area_tags(self, ids):
+        """ Get the tags of several local areas with a single query.
+        Returns None if the bridge is answering from a snapshot.
+
+        :ids: list of int
+        :returns: dict (id -> dict of tags)
+
+        """
+        if self.snapshot is not None:
+            return None
+        return {element_id: element['tags'] for element_id, element in self.overpass.get_elements(ids).items()}
+
+    def use_snapshot(self, snapshot, record=False):
+        """Answers the queries from a snapshot of the world model
+
+        :snapshot: OSMSnapshot
+        :record: bool (send the queries missing from the snapshot to the Overpass server
+                 and add their responses to the snapshot)
+
+        """
+        SnapshotAdapter.install(self, snapshot, record)
+        self.snapshot = snapshot
+        self.snapshot_file = None
+        self.logger.info("Using OSM snapshot of %s (%s queries, created %s)",
+                         snapshot.building, len(snapshot), snapshot.created)
+
+    def get_all_areas(self, building):
+        """ Get all the areas (including corridors and rooms) in a building
+        together with the number of the floor they are on.
+
+        :building: str
+        :returns: list of (int, OBL Area) tuples
+
+        """
+        building = self.get_building(building)
+        areas = []
+        for floor in building.floors:
+            floor_areas = []
+            for temp in (floor.areas, floor.corridors, floor.rooms):
+                if temp is not None:
+                    floor_areas.extend(temp)
+
+            for area in floor_areas:
+                area.geometry # required since the level is in geometrical model
+                level = area.level if area.level else floor.level
+                areas.append((int(level), area))
+        return areas
+
+    def get_area_records(self, building, refresh=False):
+        """ Get the areas of a building with their local areas. The records are read
+        from OSM only once per building (or when ``refresh`` is set); the tags of the
+        local areas are read in batched queries.
+
+        :building: str
+        :refresh: bool (read the building from OSM again)
+        :returns: list of dict with the ref, id, type and floor of an area and the
+                  id, ref and behaviour of its local areas
+
+        """
+        with self._index_lock:
+            if not refresh and building in self._area_records:
+                return self._area_records[building]
+            records = None if refresh else self._load_area_records(building)
+            if records is None:
+                records = self._read_area_records(building)
+                self._save_area_records(building, records)
+            self._set_area_records(building, records)
+            return records
+
+    def get_map_signature(self, building):
+        """ Get a signature of the map of a building, which changes whenever
+        the map changes. It is computed from the source of the map rather than
+        from the area records, which may have been persisted to ``index_file``
+        before the map changed: the content of the snapshot file, or the
+        timestamp of the OSM data of the Overpass server.
+
+        :building: str
+        :returns: str
+
+        """
+        if self.snapshot is None:
+            source = 'overpass:%s' % self.overpass.get_timestamp()
+        elif self.snapshot_file:
+            with open(self.snapshot_file, 'rb') as snapshot_file:
+                source = 'snapshot:%s' % hashlib.sha1(snapshot_file.read()).hexdigest()
+        else:
+            source = 'snapshot:%s' % self.snapshot.created
+        return hashlib.sha1(('%s|%s' % (building, source)).encode()).hexdigest()
+
     def get_all_local_area_of_behaviour_type(self, building, desired_behaviour=None):
         """ Get all the local areas in a building of certain behaviour and return
         their reference.
@@ -18,34 +226,88 @@ class OSMBridgeFMS(OSMBridge):
         :returns: list of str
 
         """
-        building = self.get_building(building)
-        areas = []
-        for floor in building.floors:
-            temp = floor.areas
-            if temp is not None:
-                areas.extend(temp)
-            temp = floor.corridors
-            if temp is not None:
-                areas.extend(temp)
-            temp = floor.rooms
-            if temp is not None:
-                areas.extend(temp)
-
-        local_areas = []
-        for area in areas:
-            temp = area.local_areas
-            if temp is not None:
-                local_areas.extend(temp)
-
-        local_areas_with_desired_behaviour = []
-        for local_area in local_areas:
-            local_area.geometry # required since all tags are in geometrical model
-            if local_area.behaviour:
-                if desired_behaviour is None or local_area.behaviour == desired_behaviour:
-                    local_areas_with_desired_behaviour.append(local_area.ref)
-        return local_areas_with_desired_behaviour
-
-        
+        if building not in self._behaviour_index:
+            self.get_area_records(building)
+        behaviour_index = self._behaviour_index[building]
+        if desired_behaviour is None:
+            return [local_area['ref'] for local_areas in behaviour_index.values() for local_area in local_areas]
+        return [local_area['ref'] for local_area in behaviour_index.get(desired_behaviour, list())]
+
+    def get_local_areas_of_behaviour_type(self, building, desired_behaviour=None):
+        """ Like ``get_all_local_area_of_behaviour_type``, but returns the
+        id, ref and behaviour of each local area.
+
+        :building: str
+        :desired_behaviour: str (docking, undocking, charging or waiting)
+        :returns: list of dict
+
+        """
+        if building not in self._behaviour_index:
+            self.get_area_records(building)
+        behaviour_index = self._behaviour_index[building]
+        if desired_behaviour is None:
+            return [dict(local_area) for local_areas in behaviour_index.values() for local_area in local_areas]
+        return [dict(local_area) for local_area in behaviour_index.get(desired_behaviour, list())]
+
+    def _read_area_records(self, building):
+        building_areas = self.get_all_areas(building)
+
+        ids = [local_area.id for _, area in building_areas for local_area in area.local_areas or list()]
+        try:
+            tags = self.get_local_area_tags(ids) or dict()
+        except Exception:
+            self.logger.warning("Could not get the tags of the local areas in a batch", exc_info=True)
+            tags = dict()
+
+        records = []
+        for floor_number, area in building_areas:
+            local_areas = []
+            for local_area in area.local_areas or list():
+                if local_area.id in tags:
+                    ref = tags[local_area.id].get('ref', local_area.ref)
+                    behaviour = tags[local_area.id].get('behaviour')
+                else:
+                    local_area.geometry # required since all tags are in geometrical model
+                    ref = local_area.ref
+                    behaviour = local_area.behaviour
+                local_areas.append({'id': local_area.id, 'ref': ref, 'behaviour': behaviour})
+
+            records.append({'ref': area.ref, 'id': area.id, 'type': area.type,
+                            'floor': floor_number, 'local_areas': local_areas})
+        self.logger.info("Read %s areas of building %s from OSM", len(records), building)
+        return records
+
+    def _set_area_records(self, building, records):
+        behaviour_index = dict()
+        for area in records:
+            for local_area in area['local_areas']:
+                if local_area['behaviour']:
+                    behaviour_index.setdefault(local_area['behaviour'], list()).append(local_area)
+        self._area_records[building] = records
+        self._behaviour_index[building] = behaviour_index
+
+    def _load_area_records(self, building):
+        if not self.index_file or not os.path.exists(self.index_file):
+            return None
+        with open(self.index_file) as index_file:
+            records = json.load(index_file).get(building)
+        if records is not None:
+            self.logger.info("Loaded %s areas of building %s from %s", len(records), building, self.index_file)
+        return records
+
+    def _save_area_records(self, building, records):
+        if not self.index_file:
+            return
+        index = dict()
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as index_file:
+                index = json.load(index_file)
+        index[building] = records
+        # the index is replaced at once, so that it is never left half-written
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(tmp_file, self.index_file)
 
 
 class OSMBridgeBuilder:
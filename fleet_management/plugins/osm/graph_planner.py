@@ -0,0 +1,119 @@
+import logging
+
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+from ropod.structs.area import Area
+
+
+class DurationGraphPathPlanner(object):
+    """A path planner backend that searches the DurationGraph topology in-process
+
+    Paths between two sub-areas on the same floor are planned with A* on the CSR form
+    of the DurationGraph, minimising the mean duration, and returned in the same
+    format as ``_OSMPathPlanner.get_path_plan``. The sub-areas are mapped to their
+    areas with the location index of the OSM path planner. Everything else,
+    including the paths the graph cannot answer (e.g. between floors or from a robot
+    position), is delegated to the OSM path planner.
+
+    Args:
+        osm_path_planner (_OSMPathPlanner): the OSM path planner
+        duration_graph (DurationGraph): the topology to search
+    """
+
+    def __init__(self, osm_path_planner, duration_graph=None, **_):
+        self.logger = logging.getLogger('fms.plugins.path_planner.graph')
+        self.osm_path_planner = osm_path_planner
+        if duration_graph is None:
+            self.logger.warning("No duration graph given to the path planner, loading the default topology")
+            duration_graph = DurationGraph.load_graph()
+        # the CSR form is taken from the graph for every query, since it is
+        # built again whenever the durations of the edges are updated
+        self.duration_graph = duration_graph
+        # door id -> (ref, type) of the doors read from OSM
+        self._doors = dict()
+        self.logger.info("Path planning on the duration graph (%s nodes)", duration_graph.get_csr().number_of_nodes())
+
+    def get_path_plan(self, start_floor='', destination_floor='',
+                      start_area='', destination_area='', *args, **kwargs):
+        path_plan = None
+        if start_floor == destination_floor and not args:
+            path_plan = self._plan(kwargs.get('start_local_area'), kwargs.get('destination_local_area'))
+        if path_plan is None:
+            return self.osm_path_planner.get_path_plan(start_floor, destination_floor, start_area,
+                                                       destination_area, *args, **kwargs)
+        return path_plan
+
+    def get_path_plan_from_local_area(self, start_local_area, destination_local_area):
+        path_plan = self._plan(start_local_area, destination_local_area)
+        if path_plan is None:
+            return self.osm_path_planner.get_path_plan_from_local_area(start_local_area, destination_local_area)
+        return path_plan
+
+    def _plan(self, start_local_area, destination_local_area):
+        location_index = self.osm_path_planner.location_index
+        if not location_index or start_local_area is None or destination_local_area is None:
+            return None
+
+        start = location_index.get_parent_area(start_local_area)
+        destination = location_index.get_parent_area(destination_local_area)
+        if start is None or destination is None:
+            return None
+        floor = location_index.get_floor(start[0])
+        if floor != location_index.get_floor(destination[0]):
+            return None
+
+        node_ids = self.duration_graph.get_csr().shortest_path(start[1].id, destination[1].id)
+        if node_ids is None:
+            self.logger.debug("No path between %s and %s in the duration graph",
+                              start_local_area, destination_local_area)
+            return None
+        return self._to_areas(node_ids, floor)
+
+    def _to_areas(self, node_ids, floor):
+        """Groups the sub-areas of a path by the area they belong to. As in the plans of the
+        OSM path planner, the areas are named by their ref and doors have no sub-areas
+        """
+        location_index = self.osm_path_planner.location_index
+        areas = list()
+        for node_id in node_ids:
+            parent = location_index.get_parent_area(node_id)
+            # the nodes of the graph that are not sub-areas are doors
+            if parent is None:
+                area = Area()
+                area.id = node_id
+                area.name, area.type = self._get_door(node_id)
+                area.floor_number = floor
+                area.sub_areas = []
+                areas.append(area)
+                continue
+
+            area_ref, sub_area = parent
+            if areas and areas[-1].name == area_ref:
+                areas[-1].sub_areas.append(sub_area)
+                continue
+
+            area = Area()
+            area.id = location_index.get_area_id(area_ref)
+            area.name = area_ref
+            area.type = location_index.get_area_type(area_ref)
+            area.floor_number = location_index.get_floor(area_ref)
+            area.sub_areas = [sub_area]
+            areas.append(area)
+        return areas
+
+    def _get_door(self, door_id):
+        """Returns the ref and type of a door, read from OSM once
+        """
+        door = self._doors.get(door_id)
+        if door is not None:
+            return door
+        try:
+            osm_door = self.osm_path_planner.osm_bridge.get_door(door_id)
+            door = (osm_door.ref, getattr(osm_door, 'type', None) or 'door')
+        except Exception:
+            self.logger.warning("Could not read door %s from OSM", door_id, exc_info=True)
+            return str(door_id), 'door'
+        self._doors[door_id] = door
+        return door
+
+    def __getattr__(self, name):
+        return getattr(self.osm_path_planner, name)
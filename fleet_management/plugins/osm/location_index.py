@@ -0,0 +1,115 @@
+import logging
+import threading
+
+from ropod.structs.area import SubArea
+
+
+class LocationIndex(object):
+    """An in-memory index of the areas of a building
+
+    Maps every area ref to its floor, its id and its sub-areas with a behaviour
+    (docking, undocking, charging or waiting), so that request locations can be
+    validated and their floors looked up without querying OSM. It also maps
+    every sub-area (by ref and by id) to the area it belongs to. The index only
+    keeps the id and ref of the sub-areas; a new SubArea is returned for every lookup.
+
+    Args:
+        osm_bridge (OSMBridgeFMS): bridge used to read the building
+        building (str): building ref, e.g. 'AMK' or 'BRSU'
+    """
+
+    def __init__(self, osm_bridge, building):
+        self.logger = logging.getLogger('fms.plugins.location_index')
+        self.osm_bridge = osm_bridge
+        self.building = building
+
+        self._areas = dict()
+        self._sub_areas = dict()
+        self._lock = threading.Lock()
+
+    def refresh(self, building=None, reload=False):
+        """(Re)builds the index from the areas of the building read by the OSM bridge
+
+        Args:
+            building (str): building ref. Defaults to the building the index was created for
+            reload (bool): if True, the areas are read from the OSM world model again
+        """
+        if building is not None:
+            self.building = building
+
+        areas = dict()
+        all_sub_areas = dict()
+        for area in self.osm_bridge.get_area_records(self.building, refresh=reload):
+            sub_areas = dict()
+            for local_area in area['local_areas']:
+                sub_area = (local_area['id'], local_area['ref'])
+                all_sub_areas[sub_area[0]] = all_sub_areas[sub_area[1]] = (area['ref'], sub_area)
+                if local_area['behaviour']:
+                    sub_areas.setdefault(local_area['behaviour'], list()).append(sub_area)
+
+            areas[area['ref']] = {'id': area['id'],
+                                  'type': area['type'],
+                                  'floor': area['floor'],
+                                  'sub_areas': sub_areas}
+
+        with self._lock:
+            self._areas = areas
+            self._sub_areas = all_sub_areas
+        self.logger.info("Indexed %s areas of building %s", len(areas), self.building)
+
+    def get_floor(self, ref):
+        """Returns the floor number of an area or None if the area is not indexed
+        """
+        area = self._areas.get(ref)
+        return area['floor'] if area else None
+
+    def get_area_id(self, ref):
+        area = self._areas.get(ref)
+        return area['id'] if area else None
+
+    def get_area_type(self, ref):
+        area = self._areas.get(ref)
+        return area['type'] if area else None
+
+    def get_parent_area(self, sub_area):
+        """Returns the (area ref, SubArea) of a sub-area, given its ref or id,
+        or None if the sub-area is not indexed
+        """
+        entry = self._sub_areas.get(sub_area)
+        if entry is None:
+            return None
+        return entry[0], self._to_sub_area(entry[1])
+
+    def get_sub_areas(self, ref, behaviour):
+        """Returns the sub-areas of an area with a given behaviour
+        """
+        area = self._areas.get(ref)
+        if not area:
+            return list()
+        return [self._to_sub_area(sub_area) for sub_area in area['sub_areas'].get(behaviour, list())]
+
+    def get_behaviour_sub_areas(self):
+        """Returns (area ref, floor, behaviour, sub-area) tuples for all the indexed sub-areas
+        """
+        return [(ref, area['floor'], behaviour, self._to_sub_area(sub_area))
+                for ref, area in self._areas.items()
+                for behaviour, sub_areas in area['sub_areas'].items()
+                for sub_area in sub_areas]
+
+    @staticmethod
+    def _to_sub_area(sub_area):
+        """Returns a new SubArea with the (id, ref) of an indexed sub-area
+        """
+        fms_sub_area = SubArea()
+        fms_sub_area.id, fms_sub_area.name = sub_area
+        return fms_sub_area
+
+    def has_sub_area(self, ref, behaviour):
+        area = self._areas.get(ref)
+        return area is not None and bool(area['sub_areas'].get(behaviour))
+
+    def __contains__(self, ref):
+        return ref in self._areas
+
+    def __len__(self):
+        return len(self._areas)
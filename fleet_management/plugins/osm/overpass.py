@@ -0,0 +1,144 @@
+import collections
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class QueryStats(object):
+    """Latency statistics of the queries sent to the Overpass server, per kind of query
+
+    Args:
+        window (int): number of recent samples used for the percentiles
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = dict()
+        self._counts = collections.Counter()
+        self._totals = collections.Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._samples.setdefault(kind, collections.deque(maxlen=self.window)).append(seconds)
+            self._counts[kind] += 1
+            self._totals[kind] += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict()
+            for kind, samples in self._samples.items():
+                ordered = sorted(samples)
+                stats[kind] = {'count': self._counts[kind],
+                               'mean': self._totals[kind] / self._counts[kind],
+                               'p95': ordered[int(0.95 * (len(ordered) - 1))],
+                               'max': ordered[-1]}
+            return stats
+
+
+class OverpassClient(object):
+    """Sends Overpass QL queries over a pool of keep-alive HTTP connections
+
+    Args:
+        server_ip (str): IP of the Overpass server
+        server_port (int): port of the Overpass server
+        pool_size (int): maximum number of connections kept open
+        timeout (float): seconds to wait for a response
+        max_batch_size (int): maximum number of elements requested in a single query
+        stats (QueryStats): where the latency of the queries is recorded
+
+    Each thread gets its own HTTP session, since requests sessions are not thread-safe.
+    """
+
+    def __init__(self, server_ip, server_port, pool_size=10, timeout=10, max_batch_size=200, stats=None):
+        self.logger = logging.getLogger('fms.plugins.osm.overpass')
+        self.url = 'http://%s:%s/api/interpreter' % (server_ip, server_port)
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.stats = stats if stats is not None else QueryStats()
+        self.pool_size = pool_size
+        self._sessions = threading.local()
+
+    @property
+    def session(self):
+        """The HTTP session of the calling thread
+        """
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self.session = self._create_session()
+        return session
+
+    @session.setter
+    def session(self, session):
+        self._sessions.session = session
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def query(self, query, kind='query'):
+        """Returns the elements of the response to an Overpass QL query
+        """
+        return self.post(query, kind).json().get('elements', list())
+
+    def get_timestamp(self):
+        """Returns the timestamp of the OSM data of the server, which changes whenever the map is edited
+        """
+        # the response of an empty query only contains the metadata of the server
+        return self.post('[out:json];', kind='timestamp').json()['osm3s']['timestamp_osm_base']
+
+    def post(self, query, kind='query'):
+        """Sends an Overpass QL query and returns the (successful) response
+        """
+        response = self.send(query, kind)
+        response.raise_for_status()
+        return response
+
+    def send(self, query, kind='query'):
+        """Sends an Overpass QL query and returns the response, whatever its status
+        """
+        start = time.monotonic()
+        try:
+            return self.session.post(self.url, data={'data': query}, timeout=self.timeout)
+        finally:
+            self.stats.record(kind, time.monotonic() - start)
+
+    def get_elements(self, ids, data_type='relation'):
+        """Returns the elements with the given ids, requesting up to ``max_batch_size``
+        elements per query. The tags of the ways that are members of a relation are merged
+        into the tags of the relation, since OBL keeps some tags in the geometrical model.
+
+        Args:
+            ids (list): ids of the elements
+            data_type (str): 'node', 'way' or 'relation'
+
+        Returns:
+            dict: id -> element (the element as returned by Overpass)
+        """
+        ids = list(dict.fromkeys(ids))
+        elements = dict()
+        for i in range(0, len(ids), self.max_batch_size):
+            batch = ','.join(str(element_id) for element_id in ids[i:i + self.max_batch_size])
+            query = '[out:json];%s(id:%s)->.batch;.batch out body;' % (data_type, batch)
+            if data_type == 'relation':
+                query += 'way(r.batch);out tags;'
+            result = self.query(query, kind='%s_batch' % data_type)
+
+            ways = {element['id']: element for element in result if element['type'] == 'way'}
+            for element in result:
+                if element['type'] != data_type:
+                    continue
+                tags = dict()
+                for member in element.get('members', list()):
+                    if member['type'] == 'way' and member['ref'] in ways:
+                        tags.update(ways[member['ref']].get('tags', dict()))
+                tags.update(element.get('tags', dict()))
+                element['tags'] = tags
+                elements[element['id']] = element
+        return elements
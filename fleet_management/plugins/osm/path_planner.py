@@ -1,10 +1,16 @@
+import copy
 import logging
 
 import OBL
+import numpy as np
 import requests
 from OBL.local_area_finder import LocalAreaFinder
+from fleet_management.db.models import environment
 from fleet_management.exceptions.osm import OSMPlannerException
 from fleet_management.plugins.osm import bridge
+from fleet_management.plugins.osm.location_index import LocationIndex
+from fleet_management.plugins.osm.path_store import PathPlanStore
+from fleet_management.utils.cache import LRUCache
 from ropod.structs.area import Area, SubArea
 from fleet_management.exceptions.osm import OSMPlannerException
 
@@ -20,17 +26,49 @@ class _OSMPathPlanner(object):
 
     """
 
-    def __init__(self, building, osm_bridge):
+    def __init__(self, building, osm_bridge, **kwargs):
         """
 
         Args:
             building (str): Building reference to make queries
             osm_bridge(osm_bridge instance): osm bridge
+            location_index (bool): Whether to build an index of the areas of the
+                                   building when the building is set
+            path_cache_size (int): Maximum number of path plans kept in the cache
+            sub_area_cache_size (int): Maximum number of sub-area lookups kept in the cache
+            sub_area_cache_ttl (float): Seconds after which a cached sub-area lookup expires
+            path_store (str): File where the path plans and sub-area lookups are stored
+                              to fill the caches after a restart
         """
         self.logger = logging.getLogger('fms.plugins.path_planner')
 
         self.osm_bridge = osm_bridge
         self.building_ref = building
+        # incremented whenever the map changes, so that results computed
+        # on a previous version of the map can be discarded
+        self.map_version = 0
+
+        # path plans are cached until the building is switched or the map is reloaded
+        self.path_cache = LRUCache(max_size=kwargs.get('path_cache_size', 256))
+        self.distance_cache = LRUCache(max_size=kwargs.get('path_cache_size', 256))
+        self.sub_area_cache = LRUCache(max_size=kwargs.get('sub_area_cache_size', 512),
+                                       ttl=kwargs.get('sub_area_cache_ttl', 600))
+        self._caches = {'path': self.path_cache,
+                        'distance': self.distance_cache,
+                        'sub_area': self.sub_area_cache}
+
+        self.path_store = None
+        self.map_signature = None
+        if kwargs.get('path_store'):
+            self.path_store = PathPlanStore(kwargs.get('path_store'))
+
+        # the refs of the local areas are read once per OSM id; every area of a path
+        # gets new sub-areas, so the path plans returned never share any object
+        self._fms_sub_areas = dict()
+
+        self.location_index = None
+        if kwargs.get('location_index', True):
+            self.location_index = LocationIndex(self.osm_bridge, building)
 
         self.path_planner = OBL.PathPlanner(self.osm_bridge)
         self.local_area_finder = LocalAreaFinder(self.osm_bridge)
@@ -51,9 +89,59 @@ class _OSMPathPlanner(object):
         if self.osm_bridge:
             self.path_planner.set_building(ref)
             self.building_ref = ref
+            self.reload_map(read_map=False)
         else:
             self.logger.error("Path planning service cannot be provided")
 
+    def reload_map(self, read_map=True):
+        """Discards everything computed on the previous version of the map
+
+        Args:
+            read_map (bool): if True, the areas of the building are read from OSM again
+                             instead of reusing the ones read (or persisted) before
+        """
+        self.map_version += 1
+        self.path_cache.clear()
+        self.distance_cache.clear()
+        self.sub_area_cache.clear()
+        self._fms_sub_areas.clear()
+        self.refresh_location_index(read_map)
+        self.load_path_store()
+
+    def load_path_store(self):
+        """Fills the caches with the entries stored for the current map
+        """
+        if self.path_store is None:
+            return
+        try:
+            self.map_signature = self.osm_bridge.get_map_signature(self.building_ref)
+            entries = self.path_store.load(self.map_signature)
+        except Exception:
+            self.logger.error("Could not load the path store", exc_info=True)
+            self.map_signature = None
+            return
+        for kind, cache in self._caches.items():
+            for key, value in entries.get(kind, list()):
+                cache.put(key, value)
+
+    def _cache_put(self, kind, key, value):
+        self._caches[kind].put(key, value)
+        if self.path_store is not None and self.map_signature is not None:
+            try:
+                self.path_store.put(self.map_signature, kind, key, value)
+            except Exception:
+                self.logger.warning("Could not store %s %s", kind, key, exc_info=True)
+
+    def refresh_location_index(self, read_map=False):
+        """Rebuilds the location index of the current building, e.g. after the map was edited
+        """
+        if self.location_index is None:
+            return
+        try:
+            self.location_index.refresh(self.building_ref, reload=read_map)
+        except Exception:
+            self.logger.error("Could not build the location index of %s", self.building_ref, exc_info=True)
+
     def set_coordinate_system(self, coordinate_system):
         """Set coordinate system
 
@@ -75,24 +163,39 @@ class _OSMPathPlanner(object):
         :returns: list of FMS Area
         """
         if self.osm_bridge:
-            start_local_area_obj = self.osm_bridge.get_local_area(start_local_area)
-            start_local_area_obj.geometry
-            destination_local_area_obj = self.osm_bridge.get_local_area(destination_local_area)
-            destination_local_area_obj.geometry
-            start_area = start_local_area_obj.parent_id
-            destination_area = destination_local_area_obj.parent_id
-            start_floor = int(start_local_area_obj.level)
-            destination_floor = int(destination_local_area_obj.level)
-            return self.get_path_plan(start_floor=start_floor,
-                                      destination_floor=destination_floor,
-                                      start_area=start_area,
-                                      destination_area=destination_area,
-                                      start_local_area=start_local_area,
-                                      destination_local_area=destination_local_area)
+            key = ('local_area', self.building_ref, start_local_area, destination_local_area)
+            path_plan = self.path_cache.get(key)
+            if path_plan is not None:
+                return self._copy_path_plan(path_plan)
+
+            start = self._get_local_area_location(start_local_area)
+            destination = self._get_local_area_location(destination_local_area)
+            start_floor, start_area = start
+            destination_floor, destination_area = destination
+            path_plan = self.get_path_plan(start_floor=start_floor,
+                                           destination_floor=destination_floor,
+                                           start_area=start_area,
+                                           destination_area=destination_area,
+                                           start_local_area=start_local_area,
+                                           destination_local_area=destination_local_area)
+            self._cache_put('path', key, self._copy_path_plan(path_plan))
+            return path_plan
         else:
             self.logger.error("Path planning service cannot be provided")
             raise OSMPlannerException('Could not plan a path. OSM Bridge not available.')
 
+    def _get_local_area_location(self, local_area):
+        """Returns the (floor, area) of a local area, from the location index if possible
+        """
+        if self.location_index:
+            parent = self.location_index.get_parent_area(local_area)
+            if parent is not None:
+                return self.location_index.get_floor(parent[0]), parent[0]
+
+        local_area_obj = self.osm_bridge.get_local_area(local_area)
+        local_area_obj.geometry
+        return int(local_area_obj.level), local_area_obj.parent_id
+
     def get_path_plan(self, start_floor='', destination_floor='',
                       start_area='', destination_area='', *args, **kwargs):
         """Plans path using A* and semantic info in in OSM
@@ -118,6 +221,13 @@ class _OSMPathPlanner(object):
 
         """
         if self.osm_bridge:
+            key = self._get_path_cache_key(start_floor, destination_floor, start_area, destination_area,
+                                           *args, **kwargs)
+            if key is not None:
+                path_plan = self.path_cache.get(key)
+                if path_plan is not None:
+                    return self._copy_path_plan(path_plan)
+
             start_floor = self.get_floor_name(self.building_ref, start_floor)
             destination_floor = self.get_floor_name(
                 self.building_ref, destination_floor)
@@ -138,11 +248,36 @@ class _OSMPathPlanner(object):
                     navigation_path_fms.append(temp[0])
                     navigation_path_fms.append(temp[1])
 
+            if key is not None:
+                self._cache_put('path', key, self._copy_path_plan(navigation_path_fms))
             return navigation_path_fms
         else:
             self.logger.error("Path planning service cannot be provided")
             raise OSMPlannerException('Could not plan a path. OSM Bridge not available.')
 
+    @staticmethod
+    def _copy_path_plan(path_plan):
+        """Returns a copy of a path plan, including its sub-areas, so that the
+        cached plan is never shared with (and modified by) the callers
+        """
+        return copy.deepcopy(list(path_plan))
+
+    def _get_path_cache_key(self, start_floor, destination_floor, start_area, destination_area, *args, **kwargs):
+        """Returns the key of a path plan in the path cache or None if the plan
+        should not be cached, i.e. when it starts at the position of a robot
+        """
+        if args or kwargs.get('robot_position') is not None:
+            return None
+        return (self.building_ref, start_floor, destination_floor, start_area, destination_area,
+                kwargs.get('start_local_area'), kwargs.get('destination_local_area'),
+                kwargs.get('destination_task'))
+
+    def get_path_cache_stats(self):
+        return self.path_cache.stats()
+
+    def get_sub_area_cache_stats(self):
+        return self.sub_area_cache.stats()
+
     def get_estimated_path_distance(self, start_floor, destination_floor,
                                     start_area='', destination_area='', *args,
                                     **kwargs):
@@ -171,6 +306,66 @@ class _OSMPathPlanner(object):
             raise OSMPlannerException('Could not estimate path distance.')
             # TODO raise the right exception here
 
+    def get_estimated_path_distances(self, pairs):
+        """Returns the approximate path distances in meters between several
+        pairs of areas. Repeated pairs are only estimated once and the
+        estimates are cached until the map is reloaded
+
+        Args:
+            pairs (list): (start_floor, destination_floor, start_area, destination_area) tuples
+
+        Returns:
+            TYPE: np.ndarray (NaN where the distance could not be estimated)
+
+        """
+        distances = np.full(len(pairs), np.nan)
+        for i, pair in enumerate(pairs):
+            key = (self.building_ref,) + tuple(pair)
+            distance = self.distance_cache.get(key)
+            if distance is None:
+                try:
+                    distance = self.get_estimated_path_distance(*pair)
+                except OSMPlannerException:
+                    continue
+                if distance is None:
+                    continue
+                self._cache_put('distance', key, distance)
+            distances[i] = distance
+        return distances
+
+    def get_path_durations(self, pairs, duration_graph, travel_time_matrix=None):
+        """Returns the expected durations of the paths between several pairs of
+        local areas. The durations are looked up in the travel time matrix, if
+        given, and otherwise computed from the (cached) path plans
+
+        Args:
+            pairs (list): (start_local_area, destination_local_area) tuples
+            duration_graph (DurationGraph): durations of the edges between sub-areas
+            travel_time_matrix (TravelTimeMatrix): precomputed durations
+
+        Returns:
+            TYPE: (np.ndarray, np.ndarray) mean and variance (NaN where no path was found)
+
+        """
+        if travel_time_matrix is not None:
+            mean, variance = travel_time_matrix.get_durations(pairs)
+        else:
+            mean = np.full(len(pairs), np.nan)
+            variance = np.full(len(pairs), np.nan)
+
+        planned = dict()
+        for i in np.flatnonzero(np.isnan(mean)):
+            pair = tuple(pairs[i])
+            if pair not in planned:
+                try:
+                    path_plan = self.get_path_plan_from_local_area(*pair)
+                    planned[pair] = duration_graph.get_path_duration(self.to_model_areas(path_plan))
+                except Exception:
+                    self.logger.warning("Could not plan a path between %s and %s", *pair)
+                    planned[pair] = (np.nan, np.nan)
+            mean[i], variance[i] = planned[pair]
+        return mean, variance
+
     def get_area(self, ref, get_level=False):
         """Returns OBL Area in FMS Area format
 
@@ -204,6 +399,15 @@ class _OSMPathPlanner(object):
             pointX = kwargs.get("x")
             pointY = kwargs.get("y")
             behaviour = kwargs.get("behaviour")
+
+            # lookups by position are not cached, since robots are rarely at the same point twice
+            key = None
+            if not args and not (pointX and pointY):
+                key = (self.building_ref, ref, behaviour)
+                sub_area = self.sub_area_cache.get(key)
+                if sub_area is not None:
+                    return copy.deepcopy(sub_area)
+
             sub_area = None
             if (pointX and pointY) or behaviour:
                 sub_area = self.local_area_finder.get_local_area(
@@ -224,13 +428,17 @@ class _OSMPathPlanner(object):
             else:
                 sub_area = self.osm_bridge.get_local_area(ref)
 
-            return self.obl_to_fms_subarea(sub_area)
+            sub_area = self.obl_to_fms_subarea(sub_area)
+            if key is not None:
+                self._cache_put('sub_area', key, copy.deepcopy(sub_area))
+            return sub_area
         else:
             # self.logger.error("Path planning service cannot be provided")
             raise OSMPlannerException("Path planning service cannot be provided because OSM Bridge is absent")
 
     def obl_to_fms_area(self, osm_wm_area):
-        """Converts OBL area to FMS area
+        """Converts OBL area to FMS area. A new FMS area is returned for every OBL area,
+        since its sub-areas are the navigation areas of the path it is on
 
         Args:
             osm_wm_area (OBL Area): eg. rooms, corridor, elevator etc.
@@ -252,7 +460,8 @@ class _OSMPathPlanner(object):
         return area
 
     def obl_to_fms_subarea(self, osm_wm_local_area):
-        """Converts OBL to FMS subarea
+        """Converts OBL to FMS subarea. The ref of an OSM local area is read
+        once, but a new FMS sub-area is returned for every call
 
         Args:
             osm_wm_local_area (OBL LocalArea): eg. charging, docking,
@@ -261,11 +470,27 @@ class _OSMPathPlanner(object):
             TYPE: FMS SubArea
 
         """
+        ref = self._fms_sub_areas.get(osm_wm_local_area.id)
+        if ref is None:
+            ref = self._fms_sub_areas[osm_wm_local_area.id] = osm_wm_local_area.ref
+
         sa = SubArea()
         sa.id = osm_wm_local_area.id
-        sa.name = osm_wm_local_area.ref
+        sa.name = ref
         return sa
 
+    def to_model_areas(self, areas):
+        """Converts the FMS areas of a path plan to new Area models
+
+        Args:
+            areas (list): FMS areas
+
+        Returns:
+            TYPE: [Area model]
+
+        """
+        return [environment.Area.from_fms_area(area) for area in areas]
+
     def decode_planner_area(self, planner_area):
         """OBL Path planner path consist of PlannerAreas which has local areas and exit doors. In FMS we consider door at same level as area.
         This function is used to extract door from OBL PlannerArea and return it as separate area along with door
@@ -0,0 +1,107 @@
+import atexit
+import logging
+import pickle
+import sqlite3
+import threading
+
+
+class PathPlanStore(object):
+    """An on-disk store of the path plans and sub-area lookups of the path planner
+
+    Entries are kept per map, identified by a signature of the building, so that a
+    restarted FMS or robot proxy can fill its caches with the results computed before
+    the restart. Entries of other maps are discarded when a map is loaded.
+
+    New entries are buffered and written in a single transaction by a background
+    thread, every ``flush_interval`` seconds or as soon as ``batch_size`` entries
+    are waiting, so storing an entry never waits for the disk.
+
+    Args:
+        path (str): path of the SQLite database file
+        batch_size (int): number of buffered entries that triggers a write
+        flush_interval (float): maximum seconds an entry stays in the buffer
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval=5.0):
+        self.logger = logging.getLogger('fms.plugins.path_planner.store')
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                                     'map TEXT NOT NULL, kind TEXT NOT NULL, key BLOB NOT NULL, value BLOB NOT NULL, '
+                                     'PRIMARY KEY (map, kind, key))')
+
+        self._pending = list()
+        self._pending_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write, name='path_store_writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def load(self, map_signature):
+        """Returns the entries stored for a map, discarding those of any other map
+
+        Returns:
+            dict: kind -> list of (key, value)
+        """
+        self.flush()
+        entries = dict()
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM entries WHERE map != ?', (map_signature,))
+            rows = self._connection.execute('SELECT kind, key, value FROM entries WHERE map = ?',
+                                            (map_signature,)).fetchall()
+        for kind, key, value in rows:
+            try:
+                entries.setdefault(kind, list()).append((pickle.loads(key), pickle.loads(value)))
+            except Exception:
+                self.logger.warning("Skipping an entry of kind %s that could not be loaded", kind)
+        self.logger.info("Loaded %s stored entries for map %s", len(rows), map_signature)
+        return entries
+
+    def put(self, map_signature, kind, key, value):
+        """Adds an entry to the buffer of entries to write
+        """
+        # entries are pickled right away, since the objects may be modified once they are returned
+        entry = (map_signature, kind, pickle.dumps(key), pickle.dumps(value))
+        with self._pending_lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._flush_requested.set()
+
+    def flush(self):
+        """Writes the buffered entries
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, list()
+        if not pending:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            with self._connection:
+                self._connection.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', pending)
+        self.logger.debug("Stored %s entries", len(pending))
+
+    def _write(self):
+        while not self._closed:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.logger.warning("Could not write the buffered entries", exc_info=True)
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._connection.close()
+        self._flush_requested.set()
+        atexit.unregister(self.close)
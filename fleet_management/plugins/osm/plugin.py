@@ -1,5 +1,10 @@
 from fleet_management.exceptions.config import InvalidConfig
 from fleet_management.plugins.osm import path_planner, bridge, subarea_monitor
+from fleet_management.plugins.osm.graph_planner import DurationGraphPathPlanner
+
+# path planner backends; each one is created from the OSM path planner
+_path_planner_backends = {'osm': lambda osm_path_planner, **_: osm_path_planner,
+                          'duration_graph': DurationGraphPathPlanner}
 
 
 class OSMBuilder:
@@ -27,16 +32,23 @@ class OSMBuilder:
         osm_bridge = self.osm_bridge(**kwargs)
         if not self._path_planner:
             planner_config = kwargs.get('path_planner')
-            self._path_planner = path_planner.configure(osm_bridge=osm_bridge, **planner_config)
+            osm_path_planner = path_planner.configure(osm_bridge=osm_bridge, **planner_config)
+            backend = _path_planner_backends.get(planner_config.get('backend', 'osm'))
+            if backend is None:
+                raise InvalidConfig('Unknown path planner backend %s' % planner_config.get('backend'))
+            self._path_planner = backend(osm_path_planner, duration_graph=kwargs.get('duration_graph'))
         return self._path_planner
 
     def subarea_monitor(self, **kwargs):
         osm_bridge = self.osm_bridge(**kwargs)
         if not self._subarea_monitor:
             subarea_monitor_config = kwargs.get('subarea_monitor')
+            if not isinstance(subarea_monitor_config, dict):
+                subarea_monitor_config = dict()
             self._subarea_monitor = subarea_monitor.configure(
                                         osm_bridge=osm_bridge,
-                                        building=kwargs['path_planner']['building'])
+                                        building=kwargs['path_planner']['building'],
+                                        **subarea_monitor_config)
         return self._subarea_monitor
 
     def osm_bridge(self, **kwargs):
@@ -0,0 +1,108 @@
+import datetime
+import gzip
+import json
+import logging
+import threading
+
+from fleet_management.exceptions.osm import OSMSnapshotMiss
+
+
+class OSMSnapshot(object):
+    """The Overpass responses needed to answer the FMS queries on a building
+
+    OBL sends every world model and path planning query through
+    ``OSMAdapter.get``, so a snapshot maps each Overpass query to the OSM/JSON
+    response of the server. Snapshots are recorded from a running Overpass server
+    (see ``fleet_management/scripts/export_osm_snapshot.py``) and stored as a
+    gzip-compressed JSON file.
+
+    Args:
+        building (str): ref of the building the snapshot was recorded for
+        responses (dict): Overpass query -> OSM/JSON response
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, building=None, responses=None, created=None):
+        self.building = building
+        self.responses = responses if responses is not None else dict()
+        self.created = created or datetime.datetime.now().isoformat()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        with self._lock:
+            return self.responses.get(query)
+
+    def put(self, query, response):
+        with self._lock:
+            self.responses[query] = response
+
+    def __contains__(self, query):
+        return query in self.responses
+
+    def __len__(self):
+        return len(self.responses)
+
+    def save(self, path):
+        with self._lock:
+            data = {'version': self.FORMAT_VERSION,
+                    'building': self.building,
+                    'created': self.created,
+                    'responses': self.responses}
+            with gzip.open(path, 'wt', encoding='utf-8') as snapshot_file:
+                json.dump(data, snapshot_file)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as snapshot_file:
+            data = json.load(snapshot_file)
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError("Unsupported OSM snapshot version %s in %s" % (data.get('version'), path))
+        return cls(data['building'], data['responses'], data['created'])
+
+
+class SnapshotAdapter(object):
+    """Answers the Overpass queries of an OBL OSMAdapter from a snapshot
+
+    The responses of the snapshot are parsed into new overpy elements on every
+    query, as OBL modifies the world model objects built from them (e.g. when
+    their geometry is loaded). A query that is not in the snapshot is sent to
+    the Overpass server if ``record`` is set, and its response is added to the
+    snapshot; otherwise it raises an ``OSMSnapshotMiss``, which is an
+    ``OSMPlannerException``, so the request that needed it fails like any
+    request that cannot be planned.
+
+    Args:
+        fetch (callable): returns the OSM/JSON response of the Overpass server to a query
+        parse (callable): returns the (nodes, ways, relations) of an OSM/JSON response
+        snapshot (OSMSnapshot): the recorded responses
+        record (bool): fall back to the Overpass server for the queries missing from the snapshot
+    """
+
+    def __init__(self, fetch, parse, snapshot, record=False):
+        self.logger = logging.getLogger('fms.plugins.osm.snapshot')
+        self.snapshot = snapshot
+        self.record = record
+        self._fetch = fetch
+        self._parse = parse
+
+    def get(self, query, *args, **kwargs):
+        response = self.snapshot.get(query)
+        if response is None:
+            if not self.record:
+                self.logger.error("Query not found in the OSM snapshot: %s", query)
+                raise OSMSnapshotMiss("Query not found in the OSM snapshot of %s" % self.snapshot.building)
+            self.logger.debug("Query not found in the OSM snapshot, sending it to Overpass: %s", query)
+            response = self._fetch(query)
+            self.snapshot.put(query, response)
+        return self._parse(response)
+
+    @classmethod
+    def install(cls, osm_bridge, snapshot, record=False):
+        """Makes the adapter of an OSM bridge answer its queries from a snapshot
+        """
+        adapter = cls(osm_bridge.get_osm_json, osm_bridge.parse_osm_json, snapshot, record)
+        # the world model entities share the adapter object of the bridge,
+        # so its query method is replaced rather than the adapter itself
+        osm_bridge.osm_adapter.get = adapter.get
+        return adapter
@@ -9,7 +9,7 @@ class _OSMSubAreaMonitor(object):
 
     """Monitor and manage OSM sub areas for dynamic information."""
 
-    def __init__(self, osm_bridge=None, building='AMK'):
+    def __init__(self, osm_bridge=None, building='AMK', load_sub_areas=False, **_):
         self.osm_bridge = osm_bridge
         self.building = building
 
@@ -17,8 +17,8 @@ class _OSMSubAreaMonitor(object):
 
         # load task related sub areas from OSM world model
         if self.osm_bridge is not None:
-            pass
-            #self._load_sub_areas_from_osm()
+            if load_sub_areas:
+                self._load_sub_areas_from_osm()
         else:
             self.logger.error("Loading sub areas from OSM world model cancelled "
                               "due to osm_bridge being None")
@@ -27,21 +27,19 @@ class _OSMSubAreaMonitor(object):
         """loads sub areas from OSM
         """
         self.logger.debug("Getting local areas with behaviours from OSM...")
-        local_areas = self.osm_bridge.get_all_local_area_of_behaviour_type(self.building)
+        local_areas = self.osm_bridge.get_local_areas_of_behaviour_type(self.building)
         self._convert_and_add_sub_areas_to_database(local_areas)
 
-    def _convert_and_add_sub_areas_to_database(self, osm_sub_area_names):
+    def _convert_and_add_sub_areas_to_database(self, osm_sub_areas):
         """converts and adds list of sub areas to the database
-        :osm_sub_area_names: list of OBL local area names
+        :osm_sub_areas: list of dict with the id, ref and behaviour of OBL local areas
         :returns: None
         """
-        for osm_sub_area_name in osm_sub_area_names:
-            osm_sub_area = self.osm_bridge.get_local_area(osm_sub_area_name)
-            osm_sub_area.geometry # required since all tags are in geometrical model
-            self.logger.debug("Initialising sub area: %s", osm_sub_area.ref)
-            sub_area = SubArea(id=osm_sub_area.id,
-                               name=osm_sub_area.ref,
-                               behaviour=osm_sub_area.behaviour,
+        for osm_sub_area in osm_sub_areas:
+            self.logger.debug("Initialising sub area: %s", osm_sub_area['ref'])
+            sub_area = SubArea(id=osm_sub_area['id'],
+                               name=osm_sub_area['ref'],
+                               behaviour=osm_sub_area['behaviour'],
                                type='local_area',
                                capacity=1)
             sub_area.save()
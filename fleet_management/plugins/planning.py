@@ -1,13 +1,26 @@
+import copy
+import fcntl
 import logging
+import math
+import multiprocessing
+import os
+import re
+import threading
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 from fleet_management.db.models import actions
 from fleet_management.exceptions.osm import OSMPlannerException
 from fleet_management.exceptions.planning import NoPlanFound
+from fleet_management.plugins.knowledge_base import InMemoryKnowledgeBase
 from fleet_management.db.models.task import TaskPlan
+from fleet_management.utils.cache import LRUCache
 from fmlib.utils.messages import Message
+from ropod.structs.action import Action
 from ropod.structs.area import Area, SubArea
 from ropod.structs.task import TaskRequest
+from ropod.utils.uuid import generate_uuid
 from task_planner.knowledge_base_interface import KnowledgeBaseInterface
 from task_planner.lama_interface import LAMAInterface
 
@@ -18,34 +31,172 @@ class TaskPlannerInterface(object):
     .. codeauthor:: Alex Mitrevski <aleksandar.mitrevski@h-brs.de>
     """
 
-    def __init__(self, kb_database_name, domain_file, planner_cmd, plan_file_path, **_):
+    def __init__(self, kb_database_name, domain_file, planner_cmd, plan_file_path, **kwargs):
         self.logger = logging.getLogger('fms.task.planner.interface')
+        self.domain_file = domain_file
+
+        # plans are reused for requests with the same pickup and delivery locations,
+        # load type and floors; the cache is cleared when the domain or the map changes
+        self.plan_cache = LRUCache(max_size=kwargs.get('plan_cache_size', 100))
+        self._plan_cache_version = None
+
+        # the GOTO segments of a plan are independent, so their paths are planned concurrently
+        self.path_planning_executor = ThreadPoolExecutor(max_workers=kwargs.get('path_planning_workers', 3),
+                                                         thread_name_prefix='path_planning')
+
+        self.plan_templates = None
+        templates_config = kwargs.get('plan_templates')
+        if templates_config:
+            self.plan_templates = PlanTemplates(**templates_config)
+
+        # the symbolic plans are computed either in this process or, to plan several
+        # requests in parallel, in worker processes with their own knowledge bases
+        kb_config = {'kb_backend': kwargs.get('kb_backend', 'mongo'),
+                     'debug': kwargs.get('debug', False)}
+        planner_workers = kwargs.get('planner_workers', 0)
+        if planner_workers:
+            self.symbolic_planner = PlannerWorkerPool(planner_workers, kb_database_name, domain_file,
+                                                      planner_cmd, plan_file_path,
+                                                      timeout_margin=kwargs.get('planner_timeout_margin', 30),
+                                                      **kb_config)
+        else:
+            self.symbolic_planner = SymbolicPlanner(kb_database_name, domain_file, planner_cmd, plan_file_path,
+                                                    **kb_config)
 
-        self.kb_interface = KnowledgeBaseInterface(kb_database_name)
+        self.logger.info("Configured task planner")
 
-        # we initialize the knowledge base with some common knowledge,
-        # such as the locations of the elevators in the environment
-        initialize_knowledge_base(kb_database_name)
+    def shutdown(self):
+        """Stops the path planning threads and the planner workers
+        """
+        self.path_planning_executor.shutdown(wait=False)
+        if isinstance(self.symbolic_planner, PlannerWorkerPool):
+            self.symbolic_planner.shutdown()
 
-        self.logger.info("Configured knowledge base...")
-        self.planner_interface = LAMAInterface(kb_database_name=kb_database_name,
-                                               domain_file=domain_file,
-                                               planner_cmd=planner_cmd,
-                                               plan_file_path=plan_file_path)
+    def plan(self, request, path_planner, time_budget=None):
+        """Returns the TaskPlan of a task request
 
-        self.logger.info("Configured task planner")
+        Args:
+            request: a TaskRequest model
+            path_planner: an interface to a path planner
+            time_budget (float): Seconds the task planner may spend searching for a plan.
+                                 If None, the search time limit of the planner command is used
+        """
+        task_request = self._to_task_request(request, path_planner)
+
+        plan = self._get_cached_plan(task_request, path_planner)
+        if plan is None:
+            plan = self._get_task_plan(task_request, path_planner, time_budget)
+            self.plan_cache.put(self._get_plan_cache_key(task_request), plan)
+
+        return self._to_task_plan(plan)
+
+    def plan_batch(self, requests, path_planner):
+        """Plans several task requests at once
+
+        Requests with the same pickup and delivery locations, load type and floors
+        are planned only once, the symbolic plans of the batch are computed in parallel
+        if there are planner workers, and the sub-area lookups and paths are shared
+        by all the plans of the batch.
+
+        Args:
+            requests (list): TaskRequest models
+            path_planner: an interface to a path planner
+
+        Returns:
+            list: A TaskPlan for each request, or None if the request could not be planned
+        """
+        batch_path_planner = _BatchPathPlanner(path_planner)
+        floors = dict()
+        task_requests = list()
+        for request in requests:
+            try:
+                task_requests.append(self._to_task_request(request, path_planner, floors))
+            except Exception:
+                self.logger.error("Could not read task request %s", request.request_id, exc_info=True)
+                task_requests.append(None)
+
+        plans = dict()
+        to_plan = dict()
+        for task_request in task_requests:
+            if task_request is None:
+                continue
+            key = self._get_plan_cache_key(task_request)
+            if key in plans or key in to_plan:
+                continue
+
+            plan = self._get_cached_plan(task_request, path_planner)
+            if plan is None and self.plan_templates:
+                actions_ = self.plan_templates.get_plan(task_request)
+                if actions_:
+                    plan = self._plan_batch_paths(task_request, actions_, batch_path_planner)
+
+            if plan is None:
+                to_plan[key] = task_request
+            else:
+                plans[key] = plan
+
+        symbolic_plans = self.symbolic_planner.plan_many(list(to_plan.values()))
+        for (key, task_request), actions_ in zip(to_plan.items(), symbolic_plans):
+            if isinstance(actions_, Exception):
+                self.logger.error("Task plan could not be found for task %s: %s", task_request.id, actions_)
+                plans[key] = None
+            else:
+                plans[key] = self._plan_batch_paths(task_request, actions_, batch_path_planner)
+
+        task_plans = list()
+        used_plans = set()
+        for task_request in task_requests:
+            plan = None
+            if task_request is not None:
+                key = self._get_plan_cache_key(task_request)
+                plan = plans.get(key)
+            if plan is None:
+                task_plans.append(None)
+                continue
+            if key in used_plans:
+                plan = self._copy_plan(plan)
+            used_plans.add(key)
+            task_plans.append(self._to_task_plan(plan))
 
-    def plan(self, request, path_planner):
+        self.logger.debug("Planned a batch of %s requests (%s distinct plans)", len(task_requests), len(plans))
+        return task_plans
+
+    def _plan_batch_paths(self, task_request, actions_, path_planner):
+        # a request whose paths cannot be planned, for any reason, must not fail the rest of the batch
+        try:
+            plan = self._plan_paths(actions_, path_planner)
+        except OSMPlannerException:
+            self.logger.error("Path planning failed for task %s", task_request.id)
+            return None
+        except Exception:
+            self.logger.error("Path planning failed for task %s", task_request.id, exc_info=True)
+            return None
+        self.plan_cache.put(self._get_plan_cache_key(task_request), plan)
+        return plan
+
+    def _to_task_request(self, request, path_planner=None, floors=None):
         """Temporary solution to translate between the TaskRequest model and
         the existing TaskRequest struct
+
+        Args:
+            request: a TaskRequest model
+            path_planner: an interface to a path planner, used to look up the floors
+            floors (dict): floor numbers of the locations looked up so far
         """
+        if floors is None:
+            floors = dict()
         formatted_dict = Message.from_model(request, meta_model_prefix=None).get('payload')
-        formatted_dict["pickupLocationLevel"] = self._get_location_floor(formatted_dict.get('pickupLocation'))
-        formatted_dict["deliveryLocationLevel"] = self._get_location_floor(formatted_dict.get('deliveryLocation'))
-        task_request = TaskRequest.from_dict(formatted_dict)
-
-        plan = self._get_task_plan_without_robot(task_request, path_planner)
-
+        for location_key, level_key in [('pickupLocation', 'pickupLocationLevel'),
+                                        ('deliveryLocation', 'deliveryLocationLevel')]:
+            location = formatted_dict.get(location_key)
+            if location not in floors:
+                floors[location] = self._get_location_floor(location, path_planner)
+            formatted_dict[level_key] = floors[location]
+        return TaskRequest.from_dict(formatted_dict)
+
+    def _to_task_plan(self, plan):
+        """Converts a list of ropod.structs.action.Action objects to a TaskPlan
+        """
         task_plan = TaskPlan()
         for action in plan:
             if action.type == "DOCK":
@@ -72,7 +223,56 @@ class TaskPlannerInterface(object):
             task_plan.actions.append(a)
         return task_plan
 
-    def _get_task_plan_without_robot(self, task_request: TaskRequest, path_planner):
+    @staticmethod
+    def _get_plan_cache_key(task_request):
+        return (task_request.pickup_pose.name,
+                task_request.delivery_pose.name,
+                task_request.load_type,
+                task_request.pickup_pose.floor_number,
+                task_request.delivery_pose.floor_number)
+
+    def _get_cached_plan(self, task_request, path_planner):
+        """Returns a copy of a cached plan for the task request, with new action IDs,
+        or None if there is no valid plan in the cache
+        """
+        try:
+            domain_version = os.path.getmtime(self.domain_file)
+        except OSError:
+            domain_version = None
+        version = (domain_version, getattr(path_planner, 'map_version', None))
+        if version != self._plan_cache_version:
+            if self._plan_cache_version is not None:
+                self.logger.info("The planning domain or the map changed, clearing the plan cache")
+            self.plan_cache.clear()
+            self._plan_cache_version = version
+            return None
+
+        plan = self.plan_cache.get(self._get_plan_cache_key(task_request))
+        if plan is None:
+            return None
+
+        self.logger.debug("Reusing cached plan for task %s", task_request.id)
+        return self._copy_plan(plan)
+
+    @staticmethod
+    def _copy_plan(plan):
+        plan = copy.deepcopy(plan)
+        for action in plan:
+            action.id = generate_uuid()
+        return plan
+
+    def _get_task_plan(self, task_request: TaskRequest, path_planner, time_budget=None):
+        """Builds the plan from a template if one covers the task request,
+        otherwise calls the task planner
+        """
+        if self.plan_templates:
+            actions_ = self.plan_templates.get_plan(task_request)
+            if actions_:
+                self.logger.debug("Using a plan template for task %s", task_request.id)
+                return self._plan_paths(actions_, path_planner)
+        return self._get_task_plan_without_robot(task_request, path_planner, time_budget)
+
+    def _get_task_plan_without_robot(self, task_request: TaskRequest, path_planner, time_budget=None):
         """Generates a task plan based on the given task request and
         returns a list of ropod.structs.action.Action objects
         representing the plan's actions
@@ -81,83 +281,12 @@ class TaskPlannerInterface(object):
             task_request: task request parameters
             path_planner: an interface to a path planner used for planning paths
                           once a task plan is obtained
+            time_budget: seconds the task planner may spend searching for a plan
 
         """
-        # at this point, we don't know which robot will be
-        # used for the task, so we plan for a dummy robot
-        robot_name = 'dummy_robot_{0}'.format(str(uuid.uuid4()))
-
-        # load IDs come as numbers, so we append "load_" in front
-        # in order to make the name a valid ground value
-        load_id = 'load_' + task_request.load_id
-
-        # we want to plan from the pickup location to the delivery location,
-        # so we assume that the robot is already there; note that the locations of the
-        # robot and the cart are inserted in the knowledge base as temporal fluents,
-        # while the gripper state of the robot is inserted as a fact
-        robot_location_fluent = ('robot_at', [('bot', robot_name)],
-                                 task_request.pickup_pose.name)
-
-        cart_location_fluent = ('load_at', [('load', load_id)],
-                                task_request.pickup_pose.name)
-
-        gripper_state_fact = ('empty_gripper', [('bot', robot_name)])
-
-        self.kb_interface.insert_facts([gripper_state_fact])
-        self.kb_interface.insert_fluents([robot_location_fluent,
-                                          cart_location_fluent])
-
-        # the floors of the locations and the elevators are
-        # inserted in the knowledge base as fluents
-        pickup_pose_floor_fluent = ('location_floor',
-                                    [('loc', task_request.pickup_pose.name)],
-                                    'floor{0}'.format(task_request.pickup_pose.floor_number))
-
-        delivery_pose_floor_fluent = ('location_floor',
-                                      [('loc', task_request.delivery_pose.name)],
-                                      'floor{0}'.format(task_request.delivery_pose.floor_number))
-
-        robot_floor_fluent = ('robot_floor', [('bot', robot_name)],
-                              'floor{0}'.format(task_request.pickup_pose.floor_number))
-
-        load_floor_fluent = ('load_floor', [('load', load_id)],
-                             'floor{0}'.format(task_request.pickup_pose.floor_number))
-
-        self.kb_interface.insert_fluents([pickup_pose_floor_fluent,
-                                          delivery_pose_floor_fluent,
-                                          robot_floor_fluent,
-                                          load_floor_fluent])
-
-        actions_ = []
-        try:
-            # we set the task goals based on the task request
-            task_goals = []
-            if task_request.load_type == 'mobidik':
-                task_goals = [('load_at', [('load', load_id),
-                                           ('loc', task_request.delivery_pose.name)]),
-                              ('empty_gripper', [('bot', robot_name)])]
-            elif task_request.load_type == 'sickbed':
-                # TBD
-                pass
-
-            # we get the action plan
-            plan_found, actions_ = self.planner_interface.plan(task_request,
-                                                               robot_name,
-                                                               task_goals)
-            if plan_found:
-                for action in actions_:
-                    self.logger.debug("Action %s added: %s", action.id, action.type)
-            else:
-                self.logger.warning('Task plan could not be found')
-                raise NoPlanFound(task_request.id)
-        except Exception as exc:
-            self.logger.error('A plan could not be created: %s', str(exc))
-            raise NoPlanFound(task_request.id, cause=exc) from exc
-
-        # we remove the location of the dummy robot and
-        # the gripper state from the knowledge base
-        self.kb_interface.remove_facts([gripper_state_fact])
-        self.kb_interface.remove_fluents([robot_location_fluent, robot_floor_fluent])
+        actions_ = self.symbolic_planner.plan(task_request, time_budget)
+        for action in actions_:
+            self.logger.debug("Action %s added: %s", action.id, action.type)
 
         try:
             task_plan_with_paths = self._plan_paths(actions_, path_planner)
@@ -168,17 +297,23 @@ class TaskPlannerInterface(object):
             raise
         return task_plan_with_paths
 
-    def _get_location_floor(self, location):
+    def _get_location_floor(self, location, path_planner=None):
         """Return the floor number of a given location.
-        For ROPOD, this can either be done through the OSM path planner or
-        by parsing an Area string
+        For ROPOD, this can either be done through the location index of the
+        OSM path planner or by parsing an Area string
 
         Args:
             location: An Area string
+            path_planner: an interface to a path planner
 
         Returns:
             floor (int): The floor number of an area
         """
+        location_index = getattr(path_planner, 'location_index', None)
+        if location_index:
+            floor = location_index.get_floor(location)
+            if floor is not None:
+                return floor
         return int(location.split('_')[2].replace('L', ''))
 
     def _plan_paths(self, task_plan: list, path_planner):
@@ -186,12 +321,17 @@ class TaskPlannerInterface(object):
         the list of task actions in ``task_plan`` with added paths between
         the areas involved in the plan.
 
+        The start and destination of each GOTO action are resolved first; the paths
+        of all GOTO actions are then planned concurrently and added to the
+        actions in the order of the plan.
+
         Args:
             task_plan (list): a list of ropod.structs.action.Action objects
             path_planner: an interface to a path planner
 
         """
         task_plan_with_paths = list()
+        path_requests = list()
 
         previous_area = Area()
         if task_plan[0].areas:
@@ -235,44 +375,473 @@ class TaskPlannerInterface(object):
 
                 destination = action.areas[0]
                 self.logger.debug('Planning path between %s and %s ', previous_sub_area.name, next_sub_area.name)
-                try:
-                    path_plan = path_planner.get_path_plan(start_floor=previous_area.floor_number,
-                                                           destination_floor=destination.floor_number,
-                                                           start_area=previous_area.name,
-                                                           destination_area=destination.name,
-                                                           start_local_area=previous_sub_area.name,
-                                                           destination_local_area=next_sub_area.name)
-                except Exception as e:
-                    self.logger.error("Path planner error", exc_info=True)
-                    raise OSMPlannerException("Task planning failed") from e
-
-                action.areas = path_plan
+                path_requests.append((action, dict(start_floor=previous_area.floor_number,
+                                                   destination_floor=destination.floor_number,
+                                                   start_area=previous_area.name,
+                                                   destination_area=destination.name,
+                                                   start_local_area=previous_sub_area.name,
+                                                   destination_local_area=next_sub_area.name)))
                 task_plan_with_paths.append(action)
 
-                self.logger.debug('Path plan length: %i', len(path_plan))
-                self.logger.debug('Sub areas: ')
-                for area in path_plan:
-                    for sub_area in area.sub_areas:
-                        self.logger.debug(sub_area.name)
+        futures = [self.path_planning_executor.submit(path_planner.get_path_plan, **path_request)
+                   for _, path_request in path_requests]
+
+        for (action, _), future in zip(path_requests, futures):
+            try:
+                path_plan = future.result()
+            except Exception as e:
+                self.logger.error("Path planner error", exc_info=True)
+                for pending in futures:
+                    pending.cancel()
+                raise OSMPlannerException("Task planning failed") from e
+
+            action.areas = path_plan
+
+            self.logger.debug('Path plan length: %i', len(path_plan))
+            self.logger.debug('Sub areas: ')
+            for area in path_plan:
+                for sub_area in area.sub_areas:
+                    self.logger.debug(sub_area.name)
 
         return task_plan_with_paths
 
 
-def initialize_knowledge_base(kb_database_name):
-    kb_interface = KnowledgeBaseInterface(kb_database_name)
+class SymbolicPlanner(object):
+    """Computes the action plan of a task request with the task planner,
+    using one knowledge base
+
+    The facts of the request are inserted in the knowledge base while planning,
+    so only one request is planned at a time.
+
+    Args:
+        kb_database_name (str): Name of the knowledge base database
+        domain_file (str): Path to the PDDL domain file
+        planner_cmd (str): Command used to call the planner
+        plan_file_path (str): Directory where the planner writes its plans
+        kb_backend (str): 'mongo' or 'memory'. The in-memory knowledge base only
+                          writes to the database if ``debug`` is True
+        debug (bool): Persist the in-memory knowledge base
+    """
+
+    def __init__(self, kb_database_name, domain_file, planner_cmd, plan_file_path, kb_backend='mongo',
+                 debug=False):
+        self.logger = logging.getLogger('fms.task.planner.symbolic')
+
+        if kb_backend == 'memory':
+            self.kb_interface = InMemoryKnowledgeBase(kb_database_name, persist=debug)
+        else:
+            self.kb_interface = KnowledgeBaseInterface(kb_database_name)
+
+        # we initialize the knowledge base with some common knowledge,
+        # such as the locations of the elevators in the environment
+        initialize_knowledge_base(self.kb_interface)
+
+        self.logger.info("Configured %s knowledge base...", kb_backend)
+        self.planner_interface = LAMAInterface(kb_database_name=kb_database_name,
+                                               domain_file=domain_file,
+                                               planner_cmd=planner_cmd,
+                                               plan_file_path=plan_file_path)
+        if kb_backend == 'memory':
+            # the planner generates the problem file from its knowledge base interface
+            self.planner_interface.kb_interface = self.kb_interface
+        self.planner_cmd = planner_cmd
+        self._lock = threading.Lock()
+
+    def plan(self, task_request, time_budget=None):
+        """Returns the list of ropod.structs.action.Action objects (without paths)
+        that achieves the task request
+
+        Args:
+            task_request: task request parameters
+            time_budget (float): Seconds the planner may spend searching for a plan
+
+        Raises:
+            NoPlanFound: if the planner did not find a plan
+        """
+        with self._lock:
+            self.planner_interface.planner_cmd = self.get_planner_cmd(time_budget)
+
+            # at this point, we don't know which robot will be
+            # used for the task, so we plan for a dummy robot
+            robot_name = 'dummy_robot_{0}'.format(str(uuid.uuid4()))
+
+            # load IDs come as numbers, so we append "load_" in front
+            # in order to make the name a valid ground value
+            load_id = 'load_' + task_request.load_id
+
+            # we want to plan from the pickup location to the delivery location,
+            # so we assume that the robot is already there; note that the locations of the
+            # robot and the cart are inserted in the knowledge base as temporal fluents,
+            # while the gripper state of the robot is inserted as a fact
+            robot_location_fluent = ('robot_at', [('bot', robot_name)],
+                                     task_request.pickup_pose.name)
+
+            cart_location_fluent = ('load_at', [('load', load_id)],
+                                    task_request.pickup_pose.name)
+
+            gripper_state_fact = ('empty_gripper', [('bot', robot_name)])
+
+            self.kb_interface.insert_facts([gripper_state_fact])
+            self.kb_interface.insert_fluents([robot_location_fluent,
+                                              cart_location_fluent])
+
+            # the floors of the locations and the elevators are
+            # inserted in the knowledge base as fluents
+            pickup_pose_floor_fluent = ('location_floor',
+                                        [('loc', task_request.pickup_pose.name)],
+                                        'floor{0}'.format(task_request.pickup_pose.floor_number))
+
+            delivery_pose_floor_fluent = ('location_floor',
+                                          [('loc', task_request.delivery_pose.name)],
+                                          'floor{0}'.format(task_request.delivery_pose.floor_number))
+
+            robot_floor_fluent = ('robot_floor', [('bot', robot_name)],
+                                  'floor{0}'.format(task_request.pickup_pose.floor_number))
+
+            load_floor_fluent = ('load_floor', [('load', load_id)],
+                                 'floor{0}'.format(task_request.pickup_pose.floor_number))
+
+            self.kb_interface.insert_fluents([pickup_pose_floor_fluent,
+                                              delivery_pose_floor_fluent,
+                                              robot_floor_fluent,
+                                              load_floor_fluent])
+
+            actions_ = []
+            try:
+                # we set the task goals based on the task request
+                task_goals = []
+                if task_request.load_type == 'mobidik':
+                    task_goals = [('load_at', [('load', load_id),
+                                               ('loc', task_request.delivery_pose.name)]),
+                                  ('empty_gripper', [('bot', robot_name)])]
+                elif task_request.load_type == 'sickbed':
+                    # TBD
+                    pass
+
+                # we get the action plan
+                plan_found, actions_ = self.planner_interface.plan(task_request,
+                                                                   robot_name,
+                                                                   task_goals)
+                if not plan_found:
+                    self.logger.warning('Task plan could not be found')
+                    raise NoPlanFound(task_request.id)
+            except Exception as exc:
+                self.logger.error('A plan could not be created: %s', str(exc))
+                raise NoPlanFound(task_request.id, cause=exc) from exc
+
+            # we remove the location of the dummy robot and
+            # the gripper state from the knowledge base
+            self.kb_interface.remove_facts([gripper_state_fact])
+            self.kb_interface.remove_fluents([robot_location_fluent, robot_floor_fluent])
+            return actions_
+
+    def get_planner_cmd(self, time_budget=None):
+        """Returns the planner command with the search time limit set to the time budget
+
+        LAMA keeps improving its plan until the time limit is reached, so if the budget
+        is shorter than the configured limit, the planner is asked to return
+        the first plan it finds instead.
+        """
+        if time_budget is None:
+            return self.planner_cmd
+
+        match = re.search(r'--search-time-limit\s+(\d+)', self.planner_cmd)
+        if match is None:
+            return self.planner_cmd
+
+        search_time_limit = int(match.group(1))
+        time_budget = max(1, math.ceil(time_budget))
+        if time_budget >= search_time_limit:
+            return self.planner_cmd
+
+        planner_cmd = self.planner_cmd[:match.start(1)] + str(time_budget) + self.planner_cmd[match.end(1):]
+        return planner_cmd.replace('seq-sat-lama-2011', 'lama-first')
+
+    def plan_many(self, task_requests):
+        """Plans several task requests one after the other
+
+        Returns:
+            list: The actions of each request, or the NoPlanFound exception if a plan was not found
+        """
+        plans = list()
+        for task_request in task_requests:
+            try:
+                plans.append(self.plan(task_request))
+            except NoPlanFound as e:
+                plans.append(e)
+        return plans
+
+
+class PlannerWorkerPool(object):
+    """A pool of processes that compute symbolic plans in parallel
+
+    Each worker has its own knowledge base (``<kb_database_name>_worker_<i>``)
+    and plan directory (``<plan_file_path>/worker_<i>/``), so plans computed
+    at the same time do not interfere with each other.
+
+    If a worker process dies (e.g. the planner crashed or ran out of memory), the
+    requests being planned fail with NoPlanFound and the pool is started again;
+    the new workers take over the ids of the old ones (see ``_claim_worker_id``).
+    A request also fails if its plan takes ``timeout_margin`` seconds longer than
+    its time budget.
+
+    Args:
+        workers (int): Number of worker processes
+        kb_database_name (str): Prefix of the knowledge base databases
+        domain_file (str): Path to the PDDL domain file
+        planner_cmd (str): Command used to call the planner
+        plan_file_path (str): Directory where the workers create their plan directories
+        timeout_margin (float): Seconds a worker may take beyond the time budget of a request
+    """
+
+    def __init__(self, workers, kb_database_name, domain_file, planner_cmd, plan_file_path, timeout_margin=30,
+                 **kwargs):
+        self.logger = logging.getLogger('fms.task.planner.workers')
+        self.workers = workers
+        self.timeout_margin = timeout_margin
+        self._initargs = (workers, kb_database_name, domain_file, planner_cmd, plan_file_path, kwargs)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        self.logger.info("Started %s planner workers", workers)
+
+    def _create_executor(self):
+        # spawned (not forked) since the FMS already runs communication threads
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_planner_worker, initargs=self._initargs)
+
+    def plan(self, task_request, time_budget=None):
+        """Returns the actions of a task request, computed by one of the workers
+
+        Raises:
+            NoPlanFound: if the planner did not find a plan, the worker died or timed out
+        """
+        executor, future = self._submit(task_request, time_budget)
+        return self._get_result(executor, future, task_request, time_budget)
+
+    def plan_many(self, task_requests):
+        """Plans several task requests in parallel
+
+        Returns:
+            list: The actions of each request, or the NoPlanFound exception if a plan was not found
+        """
+        submitted = [(task_request, self._submit(task_request)) for task_request in task_requests]
+        plans = list()
+        for task_request, (executor, future) in submitted:
+            try:
+                plans.append(self._get_result(executor, future, task_request))
+            except NoPlanFound as e:
+                plans.append(e)
+        return plans
+
+    def _submit(self, task_request, time_budget=None):
+        with self._lock:
+            executor = self._executor
+        try:
+            return executor, executor.submit(_plan_in_worker, task_request, time_budget)
+        except BrokenProcessPool:
+            executor = self._restart(executor)
+            return executor, executor.submit(_plan_in_worker, task_request, time_budget)
+
+    def _get_result(self, executor, future, task_request, time_budget=None):
+        timeout = time_budget + self.timeout_margin if time_budget is not None else None
+        try:
+            return future.result(timeout)
+        except BrokenProcessPool as e:
+            self.logger.error("A planner worker died while planning task %s", task_request.id)
+            self._restart(executor)
+            raise NoPlanFound(task_request.id, cause=e) from e
+        except TimeoutError as e:
+            self.logger.error("Planning task %s took more than %.1fs", task_request.id, timeout)
+            raise NoPlanFound(task_request.id, cause=e) from e
+
+    def _restart(self, executor):
+        """Replaces a broken executor, unless another thread already did, and returns the current one
+        """
+        with self._lock:
+            if self._executor is executor:
+                self.logger.warning("Restarting the planner workers")
+                executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_worker_planner = None
+_worker_id_lock = None
+
+
+def _claim_worker_id(plan_file_path, workers):
+    """Returns the lowest worker id that no other process holds, and the file that holds it
+
+    Ids are held with a lock on ``<plan_file_path>/worker_<i>.lock``, which the OS releases
+    when the process exits, so the workers of a restarted pool get the ids of the workers
+    that died. If all the ids are held, e.g. by the workers of another pool
+    on the same plan directory, the process id is used instead.
+    """
+    os.makedirs(plan_file_path, exist_ok=True)
+    for worker_id in range(workers):
+        lock_file = open(os.path.join(plan_file_path, 'worker_%s.lock' % worker_id), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return worker_id, lock_file
+    return 'pid_%s' % os.getpid(), None
+
+
+def _init_planner_worker(workers, kb_database_name, domain_file, planner_cmd, plan_file_path, kb_config):
+    global _worker_planner, _worker_id_lock
+    worker_id, _worker_id_lock = _claim_worker_id(plan_file_path, workers)
+    worker_plan_file_path = os.path.join(plan_file_path, 'worker_%s' % worker_id, '')
+    os.makedirs(worker_plan_file_path, exist_ok=True)
+    _worker_planner = SymbolicPlanner('%s_worker_%s' % (kb_database_name, worker_id),
+                                      domain_file, planner_cmd, worker_plan_file_path, **kb_config)
+
+
+def _plan_in_worker(task_request, time_budget=None):
+    try:
+        return _worker_planner.plan(task_request, time_budget)
+    except NoPlanFound as e:
+        # the cause of the error might not be picklable
+        raise NoPlanFound(e.task_id) from None
+
+
+class _BatchPathPlanner(object):
+    """Wraps a path planner to reuse the sub-area lookups and paths
+    computed for the other plans of a batch. Every plan gets its own copy
+    of the sub-areas and paths, since the plans are modified afterwards
+    """
+
+    def __init__(self, path_planner):
+        self._path_planner = path_planner
+        self._sub_areas = dict()
+        self._path_plans = dict()
+
+    def get_sub_area(self, ref, *args, **kwargs):
+        key = (ref, args, tuple(sorted(kwargs.items())))
+        if key not in self._sub_areas:
+            self._sub_areas[key] = self._path_planner.get_sub_area(ref, *args, **kwargs)
+        return copy.deepcopy(self._sub_areas[key])
+
+    def get_path_plan(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in self._path_plans:
+            self._path_plans[key] = self._path_planner.get_path_plan(*args, **kwargs)
+        return copy.deepcopy(self._path_plans[key])
+
+    def __getattr__(self, name):
+        return getattr(self._path_planner, name)
+
+
+class PlanTemplates(object):
+    """Builds the action lists of the common transportation plans without calling the task planner
+
+    Mobidik transports on the same floor always result in DOCK, GOTO, UNDOCK;
+    transports between floors add the elevator sequence (GOTO elevator, REQUEST_ELEVATOR,
+    WAIT_FOR_ELEVATOR, ENTER_ELEVATOR, RIDE_ELEVATOR, EXIT_ELEVATOR) before going
+    to the delivery location. As in the task planner, the robot is assumed to be
+    at the pickup location already, and the actions have the same areas, floors and
+    elevator as those of the task planner.
+
+    Args:
+        elevators (dict): The area in front of each elevator on each floor, by elevator
+                          name. Defaults to the elevators of the knowledge base
+        load_types (list): Load types covered by the templates
+    """
+
+    def __init__(self, elevators=None, load_types=None, **_):
+        self.elevators = {name: {int(floor): area for floor, area in areas.items()}
+                          for name, areas in (elevators or ELEVATORS).items()}
+        self.load_types = load_types or ['mobidik']
+
+    def get_plan(self, task_request):
+        """Returns a list of ropod.structs.action.Action objects for the task request,
+        or None if no template covers it
+        """
+        if task_request.load_type not in self.load_types:
+            return None
+
+        pickup_floor = task_request.pickup_pose.floor_number
+        delivery_floor = task_request.delivery_pose.floor_number
+        pickup = task_request.pickup_pose.name
+        delivery = task_request.delivery_pose.name
+
+        plan = [self._create_action('DOCK', areas=[self._create_area(pickup, pickup_floor)])]
+
+        if pickup_floor != delivery_floor:
+            elevator = self._get_elevator(pickup_floor, delivery_floor)
+            if elevator is None:
+                return None
+            elevator_id = get_elevator_id(elevator)
+            start_elevator_area = self.elevators[elevator][pickup_floor]
+            goal_elevator_area = self.elevators[elevator][delivery_floor]
+
+            plan.extend([self._create_action('GOTO', areas=[self._create_area(start_elevator_area, pickup_floor)]),
+                         self._create_action('REQUEST_ELEVATOR', start_floor=pickup_floor, goal_floor=delivery_floor),
+                         self._create_action('WAIT_FOR_ELEVATOR', elevator_id=elevator_id),
+                         self._create_action('ENTER_ELEVATOR', elevator_id=elevator_id),
+                         self._create_action('RIDE_ELEVATOR', elevator_id=elevator_id, level=delivery_floor),
+                         self._create_action('EXIT_ELEVATOR', elevator_id=elevator_id,
+                                             areas=[self._create_area(goal_elevator_area, delivery_floor)])])
+
+        plan.extend([self._create_action('GOTO', areas=[self._create_area(delivery, delivery_floor)]),
+                     self._create_action('UNDOCK', areas=[self._create_area(delivery, delivery_floor)])])
+        return plan
+
+    def _get_elevator(self, start_floor, goal_floor):
+        """Returns the name of the first elevator that serves both floors, or None
+        """
+        for name, areas in sorted(self.elevators.items()):
+            if start_floor in areas and goal_floor in areas:
+                return name
+        return None
+
+    @staticmethod
+    def _create_action(action_type, areas=None, **attributes):
+        action = Action()
+        action.id = generate_uuid()
+        action.type = action_type
+        action.areas = areas or list()
+        for name, value in attributes.items():
+            setattr(action, name, value)
+        return action
+
+    @staticmethod
+    def _create_area(name, floor_number):
+        area = Area()
+        area.name = name
+        area.floor_number = floor_number
+        return area
+
+
+# The elevators of the environment, with the area in front of each elevator on each floor
+# TODO: Use the actual areas where the elevators are
+ELEVATORS = {'elevator0': {0: 'BRSU_A_L0_A8',
+                           2: 'BRSU_A_L2_A1'}}
+
+
+def get_elevator_id(name):
+    """Returns the id of an elevator given its name in the knowledge base, e.g. 0 for elevator0
+    """
+    return int(name[len('elevator'):])
+
 
+def initialize_knowledge_base(kb_interface):
     print('[initialize_knowledge_base] Initializing elevators')
-    # TODO: Use the actual areas where the elevators are
-    elevator_facts = [('elevator_at', [('elevator', 'elevator0'),
-                                       ('loc', 'BRSU_A_L0_A8')]),
-                      ('elevator_at', [('elevator', 'elevator0'),
-                                       ('loc', 'BRSU_A_L2_A1')])]
+    elevator_facts = [('elevator_at', [('elevator', elevator), ('loc', area)])
+                      for elevator, areas in ELEVATORS.items() for area in areas.values()]
     kb_interface.insert_facts(elevator_facts)
 
-    elevator_fluents = [('elevator_floor', [('elevator', 'elevator0')], 'floor100'),
-                        ('destination_floor', [('elevator', 'elevator0')], 'floor100')]
+    elevator_fluents = list()
+    for elevator in ELEVATORS:
+        elevator_fluents.extend([('elevator_floor', [('elevator', elevator)], 'floor100'),
+                                 ('destination_floor', [('elevator', elevator)], 'floor100')])
     kb_interface.insert_fluents(elevator_fluents)
 
-    elevator_location_fluents = [('location_floor', [('loc', 'BRSU_A_L0_A8')], 'floor0'),
-                                 ('location_floor', [('loc', 'BRSU_A_L2_A1')], 'floor2')]
+    elevator_location_fluents = [('location_floor', [('loc', area)], 'floor{0}'.format(floor))
+                                 for areas in ELEVATORS.values() for floor, area in areas.items()]
     kb_interface.insert_fluents(elevator_location_fluents)
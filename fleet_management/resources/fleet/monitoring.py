@@ -12,6 +12,7 @@ class FleetMonitor:
         self.ccu_store = ccu_store
         self.api = api
         self.robots = dict()
+        self.duration_estimator = kwargs.get('duration_estimator')
 
         robot_config = kwargs.get('robots', None)
         if robot_config:
@@ -40,6 +41,8 @@ class FleetMonitor:
         robot_id = payload.get('robotId')
         robot = self.robots.get(robot_id)
         robot.update_position(subarea=payload.get('subarea'), **payload.get('pose'))
+        if self.duration_estimator:
+            self.duration_estimator.update_position(robot_id, payload.get('subarea'))
 
     def __configure_api(self, api_config):
         self.api.register_callbacks(self, api_config)
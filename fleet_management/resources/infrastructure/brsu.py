@@ -1,16 +1,214 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import numbers
+import os
+import threading
+
 import networkx as nx
+import numpy as np
 
+from fleet_management.utils.cache import LRUCache
 from fmlib.utils.utils import load_yaml, load_file_from_module
 
 
+_COMPILED_TOPOLOGY_VERSION = 2
+_EDGE_COLUMNS = ['mean', 'variance', 'stdev', 'n_runs', 'max_n_obstacles']
+_INTEGER_EDGE_COLUMNS = ('n_runs', 'max_n_obstacles')
+_COMPILED_ARRAYS = ('node_ids', 'poses', 'edges', 'edge_table', 'indptr', 'indices', 'edge_ids')
+
+# guards building the networkx view of the graphs loaded from a compiled topology
+_compiled_view_lock = threading.RLock()
+_LOADING = object()
+
+
+def _get_file_hash(path):
+    with open(path, 'rb') as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+class _CompiledView(object):
+    """Data descriptor of the node and adjacency dicts of a DurationGraph
+
+    A graph loaded from a compiled topology only has its compiled form at first;
+    its networkx view is built from it the first time these dicts are used.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, graph, owner=None):
+        if graph is None:
+            return self
+        if '_compiled_view' in graph.__dict__:
+            graph._load_compiled_view()
+        return graph.__dict__[self.name]
+
+    def __set__(self, graph, value):
+        # networkx resets its cached views when the dicts are replaced
+        descriptor = nx.Graph.__dict__.get(self.name)
+        if hasattr(descriptor, '__set__'):
+            descriptor.__set__(graph, value)
+        else:
+            graph.__dict__[self.name] = value
+
+
 class DurationGraph(nx.Graph):
 
+    # Estimated values based on observations
+    action_durations = {'DOCK': 50, 'UNDOCK': 20}
+
+    # (mean, variance) of the elevator actions. These are placeholders, not measurements, used
+    # until the actions have been observed: the DurationEstimator learns their costs from the
+    # elevator requests of the robots (see update_action_costs), per pair of floors for waiting
+    # for and riding the elevator (see update_floor_pair_costs). Measured costs can also be set
+    # in the graph attribute 'action_costs' of the topology, which overrides these and the
+    # action durations until the actions are observed
+    elevator_action_costs = {'REQUEST_ELEVATOR': (5, 4),
+                             'WAIT_FOR_ELEVATOR': (60, 900),
+                             'ENTER_ELEVATOR': (15, 25),
+                             'RIDE_ELEVATOR': (30, 100),
+                             'EXIT_ELEVATOR': (15, 25)}
+
+    # actions whose duration depends on the floors of the elevator trip
+    floor_pair_actions = ('WAIT_FOR_ELEVATOR', 'RIDE_ELEVATOR')
+
+    _node = _CompiledView('_node')
+    _adj = _CompiledView('_adj')
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        super().__init__(incoming_graph_data, **attr)
+        self._csr = None
+        self._action_costs = None
+        self._floor_pair_costs = None
+        self.learned_durations = None
+
+    def compile(self):
+        """Compiles the graph into its CSR form, which answers the edge lookups and the
+        shortest path queries, and the cost table of the actions other than GOTO.
+        Must be called again after the edges or the graph attributes change
+        """
+        self._csr = CSRDurationGraph.from_graph(self)
+        self._compile_action_costs()
+
+    def _compile_action_costs(self):
+        action_costs = {action: (duration, 0) for action, duration in self.action_durations.items()}
+        action_costs.update(self.elevator_action_costs)
+        action_costs.update({action: tuple(cost) for action, cost in self.graph.get('action_costs', dict()).items()})
+        action_costs.update(self._get_observed_action_costs())
+        action_costs.update({action: (mean, variance) for action, mean, variance, n_samples
+                             in self.graph.get('observed_action_costs', list()) if n_samples > 0})
+        self._action_costs = action_costs
+        self._floor_pair_costs = {(action, start_floor, goal_floor): (mean, variance)
+                                  for action, start_floor, goal_floor, mean, variance, _
+                                  in self.graph.get('floor_pair_costs', list())}
+
+    def _get_observed_action_costs(self):
+        """Returns the (mean, variance) of the floor pair actions over all the observed pairs of floors,
+        weighted by their number of samples
+        """
+        samples = dict()
+        for action, _, _, mean, variance, n_samples in self.graph.get('floor_pair_costs', list()):
+            if n_samples > 0:
+                samples.setdefault(action, list()).append((mean, variance, n_samples))
+
+        action_costs = dict()
+        for action, rows in samples.items():
+            mean, variance, n_samples = np.array(rows, dtype=float).T
+            pooled_mean = np.average(mean, weights=n_samples)
+            # the variance within the pairs plus the variance between them
+            pooled_variance = np.average(variance + (mean - pooled_mean) ** 2, weights=n_samples)
+            action_costs[action] = (float(pooled_mean), float(pooled_variance))
+        return action_costs
+
+    def update_floor_pair_costs(self, costs):
+        """Updates the costs of actions between pairs of floors
+
+        Args:
+            costs (list): [action, start floor, goal floor, mean, variance, number of samples] rows
+        """
+        floor_pair_costs = {tuple(row[:3]): list(row) for row in self.graph.get('floor_pair_costs', list())}
+        floor_pair_costs.update({tuple(row[:3]): list(row) for row in costs})
+        self.graph['floor_pair_costs'] = list(floor_pair_costs.values())
+        self._compile_action_costs()
+
+    def update_action_costs(self, costs):
+        """Updates the observed costs of the actions that do not depend on the floors
+
+        Args:
+            costs (list): [action, mean, variance, number of samples] rows
+        """
+        action_costs = {row[0]: list(row) for row in self.graph.get('observed_action_costs', list())}
+        action_costs.update({row[0]: list(row) for row in costs})
+        self.graph['observed_action_costs'] = list(action_costs.values())
+        self._compile_action_costs()
+
+    def get_action_cost(self, action_type, start_floor=None, goal_floor=None):
+        """Returns the (mean, variance) of the duration of an action other than GOTO,
+        for the given floors of the elevator trip if it has been observed for them
+        """
+        if self._action_costs is None:
+            self._compile_action_costs()
+        cost = self._floor_pair_costs.get((action_type, start_floor, goal_floor))
+        if cost is None:
+            cost = self._action_costs.get(action_type, (0, 0))
+        return cost
+
+    def update_edges(self, edges):
+        """Updates the attributes of edges, adding the edges that are not in the graph
+
+        The durations of the edges are updated in a copy of the compiled edge table, which
+        then replaces the compiled graph at once, so the durations are never read half updated.
+        The graph is only compiled again if edges were added
+
+        Args:
+            edges (list): (node, node, attributes) tuples
+        """
+        edges = list(edges)
+        if not edges:
+            return
+        csr = self.get_csr()
+        rows = csr.find_edges([u for u, _, _ in edges], [v for _, v, _ in edges])
+        if (rows < 0).any():
+            for u, v, data in edges:
+                if self.has_edge(u, v):
+                    self.edges[u, v].update(data)
+                else:
+                    self.add_edge(u, v, source=u, target=v, **data)
+            self.compile()
+            return
+
+        # the compiled table may be memory-mapped, and is read by other threads
+        edge_table = np.array(csr.edge_table, dtype=float)
+        view_loaded = '_compiled_view' not in self.__dict__
+        for row, (u, v, data) in zip(rows, edges):
+            for column, value in data.items():
+                if column in _EDGE_COLUMNS:
+                    edge_table[row, _EDGE_COLUMNS.index(column)] = value
+            # the networkx view of a compiled topology is built from the compiled table
+            if view_loaded or any(column not in _EDGE_COLUMNS for column in data):
+                self.edges[u, v].update(data)
+        self._csr = csr.with_edge_table(edge_table)
+
+    def has_edge(self, u, v):
+        if '_compiled_view' in self.__dict__:
+            return bool(self._csr.find_edges([u], [v])[0] >= 0)
+        return super().has_edge(u, v)
+
+    def get_edge_data(self, u, v, default=None):
+        if '_compiled_view' in self.__dict__:
+            row = self._csr.find_edges([u], [v])[0]
+            return self._csr.get_edge_attributes(row) if row >= 0 else default
+        return super().get_edge_data(u, v, default)
+
     def get_duration(self, plan):
         """Computes the duration of the task plan
 
-        The estimated duration only includes GOTO, DOCK and UNDOCK actions.
-        This is based on the data collected for the navigation tasks in the ROPOD project
-        from September 2019 to February 2020.
+        The durations of the GOTO, DOCK and UNDOCK actions are based on the data collected for
+        the navigation tasks in the ROPOD project from September 2019 to February 2020.
+        The durations of the elevator actions are observed per pair of floors (see get_action_cost).
 
         See https://github.com/anenriquez/ropod_rosbag_processing for details.
 
@@ -21,24 +219,85 @@ class DurationGraph(nx.Graph):
             mean:
             variance:
 
+        """
+        mean, variance, subarea_plan = self._get_plan_subareas(plan)
+        edges_mean, edges_variance = self._get_edges_duration(subarea_plan)
+        return mean + edges_mean, variance + edges_variance
+
+    def get_duration_many(self, plans):
+        """Computes the durations of several task plans in one pass
+
+        Args:
+            plans(list): TaskPlans
+
+        Returns:
+            mean (np.ndarray):
+            variance (np.ndarray):
+
+        """
+        csr = self.get_csr()
+        mean = np.zeros(len(plans))
+        variance = np.zeros(len(plans))
+        plan_ids = list()
+        sources = list()
+        targets = list()
+        for i, plan in enumerate(plans):
+            mean[i], variance[i], subarea_plan = self._get_plan_subareas(plan)
+            plan_ids.extend([i] * max(len(subarea_plan) - 1, 0))
+            sources.extend(subarea_plan[:-1])
+            targets.extend(subarea_plan[1:])
+
+        rows = csr.find_edges(sources, targets)
+        found = rows >= 0
+        plan_ids = np.array(plan_ids, dtype=int)[found]
+        mean += np.bincount(plan_ids, weights=csr.mean[rows[found]], minlength=len(plans))
+        variance += np.bincount(plan_ids, weights=csr.variance[rows[found]], minlength=len(plans))
+        return mean, variance
+
+    def get_path_duration(self, areas):
+        """Computes the duration of traversing the areas of a path
+
+        Args:
+            areas (list): Areas of a GOTO action
+
+        Returns:
+            mean:
+            variance:
+
+        """
+        return self._get_edges_duration(self.get_subarea_plan(areas))
+
+    def _get_plan_subareas(self, plan):
+        """Returns the duration (mean, variance) of the actions other than GOTO and the
+        sub-areas visited by the GOTO actions of a plan
         """
         mean = 0
         variance = 0
-
         subarea_plan = list()
+        floors = (None, None)
         for action in plan.actions:
             if action.type == "GOTO":
                 subarea_plan.extend(self.get_subarea_plan(action.areas))
-            elif action.type == "DOCK":
-                mean = mean + 50  # This is an estimated value based on observations
-            elif action.type == "UNDOCK":
-                mean = mean + 20  # This is an estimated value based on observations
+                continue
 
-        for edge in nx.utils.pairwise(subarea_plan):
-            mean = mean + self.edges.get(edge, {}).get('mean', 0)
-            variance = variance + self.edges.get(edge, {}).get('variance', 0)
+            if action.type == "REQUEST_ELEVATOR":
+                floors = (getattr(action, 'start_floor', None), getattr(action, 'goal_floor', None))
+            elif action.type == "RIDE_ELEVATOR" and getattr(action, 'level', None) is not None:
+                floors = (floors[0], action.level)
 
-        return mean, variance
+            if action.type in self.floor_pair_actions:
+                action_mean, action_variance = self.get_action_cost(action.type, *floors)
+            else:
+                action_mean, action_variance = self.get_action_cost(action.type)
+            mean = mean + action_mean
+            variance = variance + action_variance
+        return mean, variance, subarea_plan
+
+    def _get_edges_duration(self, subarea_plan):
+        csr = self.get_csr()
+        rows = csr.find_edges(subarea_plan[:-1], subarea_plan[1:])
+        rows = rows[rows >= 0]
+        return float(csr.mean[rows].sum()), float(csr.variance[rows].sum())
 
     def get_subarea_plan(self, areas):
         sub_area_plan = list()
@@ -51,9 +310,500 @@ class DurationGraph(nx.Graph):
 
         return sub_area_plan
 
+    def shortest_expected_duration(self, source, target):
+        """Returns the path with the lowest mean duration between two sub-areas,
+        without planning a path in OSM
+
+        Args:
+            source (int): id of the start sub-area
+            target (int): id of the destination sub-area
+
+        Returns:
+            (mean, variance, list of sub-area ids) or None if there is no path
+        """
+        tree = self._get_shortest_path_tree(source)
+        return tree.get(target) if tree is not None else None
+
+    def shortest_expected_durations(self, source):
+        """Returns the paths with the lowest mean duration from a sub-area to every
+        sub-area reachable from it
+
+        Returns:
+            dict: sub-area id -> (mean, variance, list of sub-area ids)
+        """
+        tree = self._get_shortest_path_tree(source)
+        return {target: tree.get(target) for target in tree.targets()} if tree is not None else dict()
+
+    def _get_shortest_path_tree(self, source):
+        """Returns the (cached) Dijkstra tree of the mean durations from a sub-area
+        """
+        return self.get_csr().get_shortest_path_tree(source)
+
+    def get_csr(self):
+        """Returns the graph in compressed sparse row form, compiling it if needed
+        """
+        csr = self._csr
+        if csr is None:
+            self.compile()
+            csr = self._csr
+        return csr
+
+    def to_csr(self):
+        """Returns the graph in compressed sparse row form
+        """
+        return CSRDurationGraph.from_graph(self)
+
     @classmethod
-    def load_graph(cls, **_):
+    def load_graph(cls, compiled_topology=None, learned_durations=None, **_):
+        """Loads the topology of the map
+
+        Args:
+            compiled_topology (str): directory of the compiled topology. If it is up to date,
+                                     the topology is loaded from it instead of the YAML file,
+                                     otherwise it is (re)compiled
+            learned_durations (str): JSON file with the edge durations learned online
+                                     (see DurationEstimator), applied over the topology
+        """
         graph_yaml = load_file_from_module('fleet_management.config.osm_map', 'topology.yaml')
+        graph = cls.load_compiled(compiled_topology, graph_yaml) if compiled_topology else None
+        if graph is None:
+            graph = cls._load_topology(graph_yaml, compiled_topology)
+
+        graph.learned_durations = learned_durations
+        if learned_durations and os.path.exists(learned_durations):
+            try:
+                edges, floor_pair_costs, action_costs = cls.load_learned_durations(learned_durations)
+                graph.update_edges(edges)
+                graph.update_floor_pair_costs(floor_pair_costs)
+                graph.update_action_costs(action_costs)
+            except (OSError, ValueError):
+                logging.getLogger('fms.resources.duration_graph').warning(
+                    "Could not load the learned durations from %s", learned_durations, exc_info=True)
+        return graph
+
+    @classmethod
+    def _load_topology(cls, graph_yaml, compiled_topology=None):
         graph_data = load_yaml(graph_yaml)
-        graph = nx.node_link_graph(graph_data)
-        return cls(graph)
+        graph = cls(nx.node_link_graph(graph_data))
+        graph.compile()
+
+        if compiled_topology:
+            try:
+                graph.save_compiled(compiled_topology, graph_yaml)
+            except OSError:
+                logging.getLogger('fms.resources.duration_graph').warning(
+                    "Could not compile the topology to %s", compiled_topology, exc_info=True)
+        return graph
+
+    @staticmethod
+    def save_learned_durations(path, edges, floor_pair_costs=None, action_costs=None):
+        """Saves learned durations to a JSON file
+
+        Args:
+            path (str): path of the file
+            edges (list): (node, node, attributes) tuples
+            floor_pair_costs (list): rows of the floor pair cost table (see update_floor_pair_costs)
+            action_costs (list): rows of the observed action cost table (see update_action_costs)
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as learned_file:
+            json.dump({'edges': [dict(data, source=u, target=v) for u, v, data in edges],
+                       'floor_pair_costs': floor_pair_costs or list(),
+                       'action_costs': action_costs or list()}, learned_file)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load_learned_durations(path):
+        """Returns the (edges, floor pair costs, action costs) saved with save_learned_durations
+        """
+        with open(path) as learned_file:
+            learned = json.load(learned_file)
+        edges = [(edge.pop('source'), edge.pop('target'), edge) for edge in learned.get('edges', list())]
+        return edges, learned.get('floor_pair_costs', list()), learned.get('action_costs', list())
+
+    def save_compiled(self, path, source):
+        """Saves the compiled graph as a directory with the arrays of its CSR form (.npy),
+        an attributes.json file with the node and edge attributes that are not in the arrays,
+        and a meta.json file with the graph attributes (including the action and floor pair
+        cost tables) and the modification time and hash of the source file. The files are
+        replaced atomically, since the arrays of a loaded compiled topology are memory-mapped
+
+        Args:
+            path (str): directory of the compiled topology
+            source (str): path of the topology YAML file the graph was loaded from
+        """
+        os.makedirs(path, exist_ok=True)
+        csr = self.to_csr()
+        attributes = {'nodes': [{key: value for key, value in self.nodes[node_id].items() if key != 'pose'}
+                                for node_id in csr.node_ids.tolist()],
+                      'edges': [{key: value for key, value in data.items() if key not in _EDGE_COLUMNS}
+                                for _, _, data in self.edges(data=True)]}
+
+        for name in _COMPILED_ARRAYS:
+            with open(os.path.join(path, name + '.npy.tmp'), 'wb') as array_file:
+                np.save(array_file, getattr(csr, name))
+            os.replace(os.path.join(path, name + '.npy.tmp'), os.path.join(path, name + '.npy'))
+        meta = {'version': _COMPILED_TOPOLOGY_VERSION,
+                'source_mtime': os.path.getmtime(source),
+                'source_hash': _get_file_hash(source),
+                'graph': self.graph,
+                'edge_columns': _EDGE_COLUMNS}
+        for name, content in (('attributes.json', attributes), ('meta.json', meta)):
+            with open(os.path.join(path, name + '.tmp'), 'w') as json_file:
+                json.dump(content, json_file)
+            os.replace(os.path.join(path, name + '.tmp'), os.path.join(path, name))
+
+    @classmethod
+    def load_compiled(cls, path, source):
+        """Loads a compiled topology. Returns None if it does not exist or is out of date
+
+        The CSR form of the graph is backed by the memory-mapped arrays, so loading does not
+        depend on the size of the topology; the networkx view of the graph is only built
+        (from the arrays and attributes.json) if it is used
+        """
+        try:
+            with open(os.path.join(path, 'meta.json')) as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != _COMPILED_TOPOLOGY_VERSION or meta.get('edge_columns') != _EDGE_COLUMNS:
+            return None
+        # the hash is only computed if the source was modified (or copied) since it was compiled
+        if meta.get('source_mtime') != os.path.getmtime(source) and meta.get('source_hash') != _get_file_hash(source):
+            return None
+
+        try:
+            arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in _COMPILED_ARRAYS}
+        except (OSError, ValueError):
+            return None
+
+        graph = cls(**meta.get('graph', dict()))
+        graph._csr = CSRDurationGraph(**arrays)
+        graph._compile_action_costs()
+        graph.__dict__['_compiled_view'] = os.path.join(path, 'attributes.json')
+        return graph
+
+    def _load_compiled_view(self):
+        """Builds the networkx view of a graph loaded from a compiled topology
+        """
+        with _compiled_view_lock:
+            attributes_file = self.__dict__.get('_compiled_view')
+            # the view is being built by this thread, or was built while waiting for the lock
+            if attributes_file is None or attributes_file is _LOADING:
+                return
+            self.__dict__['_compiled_view'] = _LOADING
+
+            csr = self._csr
+            try:
+                with open(attributes_file) as json_file:
+                    attributes = json.load(json_file)
+            except (OSError, ValueError):
+                logging.getLogger('fms.resources.duration_graph').warning(
+                    "Could not load the attributes of the compiled topology from %s", attributes_file)
+                attributes = dict()
+            node_attributes = attributes.get('nodes', list())
+            if len(node_attributes) != len(csr.node_ids):
+                node_attributes = [dict() for _ in range(len(csr.node_ids))]
+            edge_attributes = attributes.get('edges', list())
+            if len(edge_attributes) != len(csr.edges):
+                edge_attributes = [dict() for _ in range(len(csr.edges))]
+
+            for node_id, pose, data in zip(csr.node_ids.tolist(), csr.poses.tolist(), node_attributes):
+                if not any(math.isnan(value) for value in pose):
+                    data['pose'] = pose
+                self.add_node(node_id, **data)
+            for row, ((u, v), data) in enumerate(zip(csr.edges.tolist(), edge_attributes)):
+                data.update(csr.get_edge_attributes(row))
+                self.add_edge(u, v, **data)
+            del self.__dict__['_compiled_view']
+
+
+class CSRDurationGraph(object):
+    """A DurationGraph in compressed sparse row (CSR) form, for fast edge lookups and shortest path queries
+
+    The neighbours of the node at index ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, sorted,
+    and the edges to them are the rows ``edge_ids[indptr[i]:indptr[i + 1]]`` of ``edge_table``,
+    whose columns are the durations of the edges (see ``_EDGE_COLUMNS``). Missing values are NaN.
+    The arrays are only read, so they can be memory-mapped.
+
+    Args:
+        node_ids (np.ndarray): sorted ids of the nodes
+        poses (np.ndarray): (x, y, theta) pose of each node, NaN if the node has no pose
+        edges (np.ndarray): (node id, node id) of each edge
+        edge_table (np.ndarray): durations of each edge
+        indptr (np.ndarray): offsets of the neighbours of each node
+        indices (np.ndarray): neighbour indices
+        edge_ids (np.ndarray): edge of each neighbour
+    """
+
+    def __init__(self, node_ids, poses, edges, edge_table, indptr, indices, edge_ids):
+        self.node_ids = node_ids
+        self.poses = poses
+        self.edges = edges
+        self.edge_table = edge_table
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_ids = edge_ids
+        self.mean = np.nan_to_num(edge_table[:, _EDGE_COLUMNS.index('mean')])
+        self.variance = np.nan_to_num(edge_table[:, _EDGE_COLUMNS.index('variance')])
+
+        self._keys = None
+        self._search = None
+        self._shortest_path_trees = LRUCache(max_size=256)
+
+    @classmethod
+    def from_graph(cls, graph):
+        node_ids = sorted(graph.nodes)
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        poses = list()
+        for node_id in node_ids:
+            pose = graph.nodes[node_id].get('pose')
+            poses.append((list(pose) + [0, 0, 0])[:3] if pose is not None else [math.nan] * 3)
+
+        edges = list()
+        edge_table = list()
+        edge_rows = dict()
+        for i, (u, v, data) in enumerate(graph.edges(data=True)):
+            edges.append([u, v])
+            edge_table.append([data.get(column, math.nan) for column in _EDGE_COLUMNS])
+            edge_rows[(u, v)] = edge_rows[(v, u)] = i
+
+        indptr = [0]
+        indices = list()
+        edge_ids = list()
+        for node_id in node_ids:
+            for neighbour in sorted(graph.adj[node_id]):
+                indices.append(node_index[neighbour])
+                edge_ids.append(edge_rows[(node_id, neighbour)])
+            indptr.append(len(indices))
+
+        return cls(np.array(node_ids, dtype=np.int64), np.array(poses, dtype=float).reshape(-1, 3),
+                   np.array(edges, dtype=np.int64).reshape(-1, 2),
+                   np.array(edge_table, dtype=float).reshape(-1, len(_EDGE_COLUMNS)),
+                   np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64),
+                   np.array(edge_ids, dtype=np.int64))
+
+    def with_edge_table(self, edge_table):
+        """Returns a CSRDurationGraph with the same structure and other durations
+        """
+        return CSRDurationGraph(self.node_ids, self.poses, self.edges, edge_table, self.indptr,
+                                self.indices, self.edge_ids)
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def find_edges(self, sources, targets):
+        """Returns the rows of the edge table of the edges between pairs of nodes, -1 if there is none
+        """
+        found = np.ones(len(sources), dtype=bool)
+        sources = self._get_node_indices(sources, found)
+        targets = self._get_node_indices(targets, found)
+        if not len(self.indices):
+            return np.full(len(found), -1, dtype=np.int64)
+
+        # the neighbours are sorted, so (node index, neighbour index) keys are sorted as well
+        keys = self._get_keys()
+        queries = sources * len(self.node_ids) + targets
+        positions = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+        found &= keys[positions] == queries
+        return np.where(found, self.edge_ids[positions], -1)
+
+    def get_edge_attributes(self, row):
+        """Returns the durations of the edge in a row of the edge table
+        """
+        attributes = dict()
+        for column, value in zip(_EDGE_COLUMNS, self.edge_table[row].tolist()):
+            if not math.isnan(value):
+                attributes[column] = int(value) if column in _INTEGER_EDGE_COLUMNS and value.is_integer() else value
+        return attributes
+
+    def _get_node_indices(self, node_ids, found):
+        node_ids = np.array([node_id if isinstance(node_id, numbers.Integral) else -1 for node_id in node_ids],
+                            dtype=np.int64)
+        if not len(self.node_ids):
+            found[:] = False
+            return node_ids
+        indices = np.minimum(np.searchsorted(self.node_ids, node_ids), len(self.node_ids) - 1)
+        found &= self.node_ids[indices] == node_ids
+        return indices
+
+    def _get_keys(self):
+        keys = self._keys
+        if keys is None:
+            rows = np.repeat(np.arange(len(self.node_ids), dtype=np.int64), np.diff(self.indptr))
+            keys = self._keys = rows * len(self.node_ids) + self.indices
+        return keys
+
+    def _get_search(self):
+        """Returns the lists used by the searches, built on the first query
+
+        Plain lists are faster than numpy arrays for element-wise access in the search
+        """
+        search = self._search
+        if search is not None:
+            return search
+
+        mean = self.mean[self.edge_ids]
+        variance = self.variance[self.edge_ids]
+        positions = self.poses[:, :2]
+
+        # the A* heuristic is the straight line distance at the highest speed
+        # observed on any edge, which never overestimates the remaining duration
+        sources = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        distances = np.linalg.norm(positions[sources] - positions[self.indices], axis=1)
+        known = ~np.isnan(distances)
+        if np.any((mean <= 0) & known & (distances > 0)):
+            max_speed = math.inf
+        else:
+            moving = (mean > 0) & known
+            max_speed = float(np.max(distances[moving] / mean[moving])) if moving.any() else math.inf
+        if max_speed == 0:
+            # no node has a position, the search falls back to Dijkstra
+            max_speed = math.inf
+
+        # nodes without a position get no heuristic
+        search = self._search = {
+            'node_ids': self.node_ids.tolist(),
+            'node_index': {node_id: i for i, node_id in enumerate(self.node_ids.tolist())},
+            'indptr': self.indptr.tolist(),
+            'indices': self.indices.tolist(),
+            'mean': mean.tolist(),
+            'variance': variance.tolist(),
+            'positions': [None if math.isnan(x) or math.isnan(y) else (x, y) for x, y in positions.tolist()],
+            'max_speed': max_speed}
+        return search
+
+    def shortest_path(self, source, target):
+        """Returns the ids of the nodes on the path with the lowest mean duration
+        from ``source`` to ``target`` (A* search) or None if there is no path
+        """
+        search = self._get_search()
+        node_index = search['node_index']
+        if source not in node_index or target not in node_index:
+            return None
+        start = node_index[source]
+        goal = node_index[target]
+
+        indptr = search['indptr']
+        indices = search['indices']
+        edge_mean = search['mean']
+        positions = search['positions']
+        goal_position = positions[goal]
+        max_speed = search['max_speed']
+
+        def heuristic(i):
+            if max_speed == math.inf or goal_position is None or positions[i] is None:
+                return 0.
+            x, y = positions[i]
+            return math.hypot(x - goal_position[0], y - goal_position[1]) / max_speed
+
+        costs = {start: 0.}
+        previous = {start: None}
+        queue = [(heuristic(start), start)]
+        closed = set()
+        while queue:
+            _, i = heapq.heappop(queue)
+            if i == goal:
+                break
+            if i in closed:
+                continue
+            closed.add(i)
+            for k in range(indptr[i], indptr[i + 1]):
+                j = indices[k]
+                cost = costs[i] + edge_mean[k]
+                if cost < costs.get(j, math.inf):
+                    costs[j] = cost
+                    previous[j] = i
+                    heapq.heappush(queue, (cost + heuristic(j), j))
+        else:
+            return None
+
+        node_ids = search['node_ids']
+        path = list()
+        i = goal
+        while i is not None:
+            path.append(node_ids[i])
+            i = previous[i]
+        return path[::-1]
+
+    def get_shortest_path_tree(self, source):
+        """Returns the (cached) tree of the paths with the lowest mean duration from ``source``
+        """
+        tree = self._shortest_path_trees.get(source)
+        if tree is None:
+            tree = self.shortest_path_tree(source)
+            if tree is not None:
+                self._shortest_path_trees.put(source, tree)
+        return tree
+
+    def shortest_path_tree(self, source):
+        """Returns the tree of the paths with the lowest mean duration from ``source``
+        to all the other nodes (Dijkstra search) or None if ``source`` is not in the graph
+        """
+        search = self._get_search()
+        start = search['node_index'].get(source)
+        if start is None:
+            return None
+
+        indptr = search['indptr']
+        indices = search['indices']
+        edge_mean = search['mean']
+        edge_variance = search['variance']
+        n_nodes = len(indptr) - 1
+        costs = [math.inf] * n_nodes
+        variances = [0.] * n_nodes
+        previous = [-1] * n_nodes
+        costs[start] = 0.
+        queue = [(0., start)]
+        closed = set()
+        while queue:
+            cost, i = heapq.heappop(queue)
+            if i in closed:
+                continue
+            closed.add(i)
+            for k in range(indptr[i], indptr[i + 1]):
+                j = indices[k]
+                if cost + edge_mean[k] < costs[j]:
+                    costs[j] = cost + edge_mean[k]
+                    variances[j] = variances[i] + edge_variance[k]
+                    previous[j] = i
+                    heapq.heappush(queue, (costs[j], j))
+
+        return ShortestPathTree(search['node_ids'], search['node_index'], costs, variances, previous)
+
+
+class ShortestPathTree(object):
+    """The paths with the lowest mean duration from one node of a CSRDurationGraph
+
+    Args:
+        node_ids (list): id of the node at each index
+        node_index (dict): node id -> index
+        mean (list): mean duration of the path to each node. inf if the node is not reachable
+        variance (list): variance of the duration of the path to each node
+        previous (list): index of the previous node on the path to each node, -1 for the root
+    """
+
+    def __init__(self, node_ids, node_index, mean, variance, previous):
+        self.node_ids = node_ids
+        self.node_index = node_index
+        self.mean = mean
+        self.variance = variance
+        self.previous = previous
+
+    def get(self, target):
+        """Returns the (mean, variance, node ids) of the path to ``target`` or None if it is not reachable
+        """
+        i = self.node_index.get(target)
+        if i is None or self.mean[i] == math.inf:
+            return None
+
+        path = list()
+        while i != -1:
+            path.append(self.node_ids[i])
+            i = self.previous[i]
+        target_index = self.node_index[target]
+        return self.mean[target_index], self.variance[target_index], path[::-1]
+
+    def targets(self):
+        return [node_id for node_id, mean in zip(self.node_ids, self.mean) if mean != math.inf]
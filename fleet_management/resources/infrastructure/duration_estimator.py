@@ -0,0 +1,344 @@
+import logging
+import math
+import threading
+import time
+
+import inflection
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+from ropod.structs.status import ActionStatus
+
+
+# the events of an elevator trip; each elevator action lasts from one event to the next
+_ELEVATOR_EVENTS = ['called', 'accepted', 'at_start_floor', 'entered', 'at_goal_floor', 'exited']
+_ELEVATOR_ACTIONS = ['REQUEST_ELEVATOR', 'WAIT_FOR_ELEVATOR', 'ENTER_ELEVATOR', 'RIDE_ELEVATOR', 'EXIT_ELEVATOR']
+
+
+class DurationEstimator(object):
+    """Learns the durations of the transitions between sub-areas from the robots' progress
+
+    While a robot executes a GOTO action (reported by the TASK-STATUS messages), the time
+    between consecutive sub-area changes (reported by the ROBOT-POSE messages) is a sample
+    of the duration of the edge between both sub-areas. The mean and variance of each edge
+    are updated with Welford's algorithm, starting from the values of the topology, and
+    periodically written back to the DurationGraph and to its learned durations file, from
+    which the robot proxies load them. The values of the topology count as at most
+    ``prior_weight`` samples, so that the estimates follow the durations observed online
+    even for edges with thousands of recorded runs.
+
+    The costs of the elevator actions are learned from the elevator requests of the robots
+    (see ElevatorManager): requesting lasts from the call until the elevator control accepts
+    it, waiting until the elevator is at the start floor, entering until the robot finished
+    entering, riding until the elevator is at the goal floor and exiting until the robot
+    finished exiting. Waiting and riding are learned per pair of floors. If some events of a
+    trip are not reported, the time between the reported ones is attributed to waiting or
+    riding, minus the costs of the other actions in between.
+
+    Sub-areas are reported by ref; they are mapped to the sub-area ids of the DurationGraph
+    with the location index of the path planner plugin.
+
+    Args:
+        duration_graph (DurationGraph): the graph whose edge durations are learned
+        min_samples (int): samples needed before an edge that is not in the topology, or the
+                           cost of an elevator action for a pair of floors, is used
+        max_duration (float): seconds above which a transition is discarded,
+                              e.g. because the robot was waiting or blocked
+        prior_weight (int): maximum number of samples the values of the topology count as
+        elevator_query_ttl (float): seconds after which an elevator trip that was not reported
+                                    as finished is forgotten
+    """
+
+    def __init__(self, duration_graph=None, min_samples=5, max_duration=120, prior_weight=20,
+                 elevator_query_ttl=1800, **_):
+        self.logger = logging.getLogger('fms.resources.duration_estimator')
+        self.duration_graph = duration_graph
+        self.min_samples = min_samples
+        self.max_duration = max_duration
+        self.prior_weight = prior_weight
+        self.elevator_query_ttl = elevator_query_ttl
+        self.path_planner = None
+
+        # (node, node) -> [number of samples, mean, sum of squared differences from the mean]
+        self._stats = dict()
+        self._updated = set()
+        # (action, start floor, goal floor) -> [number of samples, mean, sum of squared differences];
+        # the floors are None for the actions whose cost does not depend on them
+        self._action_stats = dict()
+        self._updated_actions = set()
+        self._elevator_queries = dict()
+        self._positions = dict()
+        self._travelling = set()
+        self._lock = threading.Lock()
+
+    def add_plugin(self, obj, name=None):
+        if name:
+            key = inflection.underscore(name)
+        else:
+            key = inflection.underscore(obj.__class__.__name__)
+        self.__dict__[key] = obj
+        self.logger.debug("Added %s plugin to %s", key, self.__class__.__name__)
+
+    def update_position(self, robot_id, sub_area, timestamp=None):
+        """Records the sub-area a robot is in. If it changed while the robot was travelling,
+        the time spent since the previous change is added to the estimate of the edge
+
+        Args:
+            robot_id (str): id of the robot
+            sub_area (str or int): ref or id of the sub-area
+            timestamp (float): seconds since the epoch. Defaults to the current time
+        """
+        sub_area_id = self._get_sub_area_id(sub_area)
+        if sub_area_id is None:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            previous = self._positions.get(robot_id)
+            if previous is not None and previous[0] == sub_area_id:
+                return
+            self._positions[robot_id] = (sub_area_id, timestamp)
+            if previous is None or robot_id not in self._travelling:
+                return
+
+            duration = timestamp - previous[1]
+            if 0 < duration <= self.max_duration:
+                self._add_sample(previous[0], sub_area_id, duration)
+
+    def update_task_progress(self, robot_id, action_type, action_status, timestamp=None):
+        """Starts or stops learning from the sub-area changes of a robot, depending on
+        whether it is executing a GOTO action
+        """
+        travelling = action_type == 'GOTO' and action_status not in (ActionStatus.COMPLETED, ActionStatus.FAILED)
+        with self._lock:
+            if not travelling:
+                self._travelling.discard(robot_id)
+                return
+            if robot_id in self._travelling:
+                return
+
+            self._travelling.add(robot_id)
+            # the robot starts moving from the sub-area it is in
+            position = self._positions.get(robot_id)
+            if position is not None:
+                self._positions[robot_id] = (position[0], time.time() if timestamp is None else timestamp)
+
+    def task_finished(self, robot_id):
+        with self._lock:
+            self._travelling.discard(robot_id)
+
+    def elevator_called(self, query_id, start_floor, goal_floor, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._expire_elevator_queries(timestamp)
+            self._elevator_queries[query_id] = {'floors': (start_floor, goal_floor), 'called': timestamp}
+
+    def elevator_call_accepted(self, query_id, timestamp=None):
+        self._add_elevator_event(query_id, 'accepted', timestamp)
+
+    def elevator_at_start_floor(self, query_id, timestamp=None):
+        self._add_elevator_event(query_id, 'at_start_floor', timestamp)
+
+    def elevator_entered(self, query_id, timestamp=None):
+        self._add_elevator_event(query_id, 'entered', timestamp)
+
+    def elevator_at_goal_floor(self, query_id, timestamp=None):
+        self._add_elevator_event(query_id, 'at_goal_floor', timestamp)
+
+    def elevator_exited(self, query_id, timestamp=None):
+        self._add_elevator_event(query_id, 'exited', timestamp)
+        with self._lock:
+            self._elevator_queries.pop(query_id, None)
+
+    def elevator_call_cancelled(self, query_id):
+        with self._lock:
+            self._elevator_queries.pop(query_id, None)
+
+    def _add_elevator_event(self, query_id, event, timestamp=None):
+        """Records an event of an elevator trip and learns the cost of the actions since the previous event
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        index = _ELEVATOR_EVENTS.index(event)
+        with self._lock:
+            query = self._elevator_queries.get(query_id)
+            # events are only recorded once and in order, e.g. the elevator is
+            # reported at the start floor as long as its doors are open
+            if query is None or any(later in query for later in _ELEVATOR_EVENTS[index:]):
+                return
+            previous = max(i for i, earlier in enumerate(_ELEVATOR_EVENTS[:index]) if earlier in query)
+            query[event] = timestamp
+            self._add_elevator_sample(query, _ELEVATOR_ACTIONS[previous:index],
+                                      timestamp - query[_ELEVATOR_EVENTS[previous]])
+
+    def _add_elevator_sample(self, query, actions, duration):
+        action = actions[0]
+        if len(actions) > 1:
+            floor_pair_actions = [a for a in actions if a in DurationGraph.floor_pair_actions]
+            if len(floor_pair_actions) != 1:
+                return
+            action = floor_pair_actions[0]
+            duration -= sum(self._get_action_cost(other) for other in actions if other != action)
+
+        floors = query['floors'] if action in DurationGraph.floor_pair_actions else (None, None)
+        self._add_action_sample(action, *floors, max(duration, 0))
+
+    def _expire_elevator_queries(self, now):
+        expired = [query_id for query_id, query in self._elevator_queries.items()
+                   if now - query['called'] > self.elevator_query_ttl]
+        for query_id in expired:
+            del self._elevator_queries[query_id]
+
+    def add_sample(self, u, v, duration):
+        with self._lock:
+            self._add_sample(u, v, duration)
+
+    def _add_sample(self, u, v, duration):
+        edge = (min(u, v), max(u, v))
+        stats = self._stats.get(edge)
+        if stats is None:
+            stats = self._stats[edge] = self._get_prior(u, v)
+        self._update(stats, duration)
+        self._updated.add(edge)
+
+    def _add_action_sample(self, action, start_floor, goal_floor, duration):
+        key = (action, start_floor, goal_floor)
+        stats = self._action_stats.get(key)
+        if stats is None:
+            stats = self._action_stats[key] = self._get_action_prior(key)
+        self._update(stats, duration)
+        self._updated_actions.add(key)
+
+    @staticmethod
+    def _update(stats, sample):
+        """Adds a sample to the [number of samples, mean, sum of squared differences] of Welford's algorithm
+        """
+        stats[0] += 1
+        delta = sample - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (sample - stats[1])
+
+    def _get_prior(self, u, v):
+        """Returns the statistics of an edge of the topology, as if they had been learned
+        from at most ``prior_weight`` samples
+        """
+        data = self.duration_graph.get_edge_data(u, v) if self.duration_graph is not None else None
+        if data is None:
+            return [0, 0., 0.]
+        n_runs = min(int(data.get('n_runs', 0)), self.prior_weight)
+        if n_runs == 0:
+            return [0, 0., 0.]
+        return [n_runs, float(data.get('mean', 0)), float(data.get('variance', 0)) * n_runs]
+
+    def _get_action_prior(self, key):
+        """Returns the statistics of an elevator action that were already written to the
+        DurationGraph, counting as at most ``prior_weight`` samples
+        """
+        if self.duration_graph is None:
+            return [0, 0., 0.]
+        if key[0] in DurationGraph.floor_pair_actions:
+            rows = [row[3:] for row in self.duration_graph.graph.get('floor_pair_costs', list())
+                    if tuple(row[:3]) == key]
+        else:
+            rows = [row[1:] for row in self.duration_graph.graph.get('observed_action_costs', list())
+                    if row[0] == key[0]]
+        for mean, variance, n_samples in rows:
+            n_samples = min(n_samples, self.prior_weight)
+            if n_samples > 0:
+                return [n_samples, float(mean), float(variance) * n_samples]
+        return [0, 0., 0.]
+
+    def _get_action_cost(self, action):
+        if self.duration_graph is None:
+            return 0
+        return self.duration_graph.get_action_cost(action)[0]
+
+    def get_estimate(self, u, v):
+        """Returns the learned (mean, variance, number of samples) of an edge,
+        or None if no sample of the edge has been recorded
+        """
+        with self._lock:
+            stats = self._stats.get((min(u, v), max(u, v)))
+            if stats is None:
+                return None
+            n_samples, mean, m2 = stats
+            return mean, m2 / n_samples, n_samples
+
+    def get_action_estimate(self, action, start_floor=None, goal_floor=None):
+        """Returns the learned (mean, variance, number of samples) of an elevator action
+        (between two floors, for waiting and riding), or None if it has not been observed
+        """
+        with self._lock:
+            stats = self._action_stats.get((action, start_floor, goal_floor))
+            if stats is None:
+                return None
+            n_samples, mean, m2 = stats
+            return mean, m2 / n_samples, n_samples
+
+    def write_back(self):
+        """Writes the edges and elevator costs updated since the last call to the DurationGraph
+        and saves all the learned durations to its learned durations file
+        """
+        if self.duration_graph is None:
+            return
+
+        with self._lock:
+            updated = [edge for edge in self._updated
+                       if self._stats[edge][0] >= self.min_samples or self.duration_graph.has_edge(*edge)]
+            self._updated.difference_update(updated)
+            edges = [self._to_edge(edge) for edge in updated]
+
+            updated_actions = [key for key in self._updated_actions if self._action_stats[key][0] >= self.min_samples]
+            self._updated_actions.difference_update(updated_actions)
+            floor_pair_costs = [self._to_floor_pair_cost(key) for key in updated_actions
+                                if key[0] in DurationGraph.floor_pair_actions]
+            action_costs = [self._to_action_cost(key) for key in updated_actions
+                            if key[0] not in DurationGraph.floor_pair_actions]
+        if not edges and not updated_actions:
+            return
+
+        self.duration_graph.update_edges(edges)
+        self.duration_graph.update_floor_pair_costs(floor_pair_costs)
+        self.duration_graph.update_action_costs(action_costs)
+        self.logger.debug("Updated the durations of %s edges and %s elevator actions",
+                          len(edges), len(updated_actions))
+
+        path = self.duration_graph.learned_durations
+        if not path:
+            return
+        with self._lock:
+            learned_edges = [self._to_edge(edge) for edge in self._stats if self.duration_graph.has_edge(*edge)]
+            learned_actions = [key for key, stats in self._action_stats.items() if stats[0] >= self.min_samples]
+            learned_floor_pair_costs = [self._to_floor_pair_cost(key) for key in learned_actions
+                                        if key[0] in DurationGraph.floor_pair_actions]
+            learned_action_costs = [self._to_action_cost(key) for key in learned_actions
+                                    if key[0] not in DurationGraph.floor_pair_actions]
+        try:
+            self.duration_graph.save_learned_durations(path, learned_edges, learned_floor_pair_costs,
+                                                       learned_action_costs)
+        except OSError:
+            self.logger.warning("Could not save the learned durations to %s", path, exc_info=True)
+
+    def _to_edge(self, edge):
+        n_samples, mean, m2 = self._stats[edge]
+        variance = m2 / n_samples
+        return edge[0], edge[1], {'mean': mean, 'variance': variance, 'stdev': math.sqrt(variance),
+                                  'n_runs': n_samples}
+
+    def _to_floor_pair_cost(self, key):
+        n_samples, mean, m2 = self._action_stats[key]
+        return [key[0], key[1], key[2], mean, m2 / n_samples, n_samples]
+
+    def _to_action_cost(self, key):
+        n_samples, mean, m2 = self._action_stats[key]
+        return [key[0], mean, m2 / n_samples, n_samples]
+
+    def _get_sub_area_id(self, sub_area):
+        if isinstance(sub_area, int):
+            return sub_area
+        location_index = self.path_planner.location_index if self.path_planner is not None else None
+        if location_index:
+            parent = location_index.get_parent_area(sub_area)
+            if parent is not None:
+                return parent[1].id
+        try:
+            return int(sub_area)
+        except (TypeError, ValueError):
+            return None
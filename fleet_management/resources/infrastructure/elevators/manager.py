@@ -15,12 +15,14 @@ class ElevatorManager:
         self.elevators = dict()
         self.pending_requests = list()
         self.ongoing_queries = dict()
+        self.duration_estimator = kwargs.get('duration_estimator')
 
         monitoring_config = kwargs.get('monitors')
         interface_config = kwargs.get('interfaces')
         self._elevator_builder = ElevatorBuilder(self.ccu_store, self.api,
                                                  monitoring_config=monitoring_config,
-                                                 interface_config=interface_config)
+                                                 interface_config=interface_config,
+                                                 duration_estimator=self.duration_estimator)
 
     def add_elevator(self, elevator_id):
         self.elevators[elevator_id] = self._elevator_builder(elevator_id)
@@ -53,8 +55,13 @@ class ElevatorManager:
 
             # self.ccu_store.add_elevator_call(robot_request)
             elevator.request_elevator(robot_request)
+            if self.duration_estimator:
+                self.duration_estimator.elevator_called(query_id, robot_request.start_floor,
+                                                        robot_request.goal_floor)
         elif command == 'CANCEL_CALL':
             elevator.cancel_elevator_call(robot_request)
+            if self.duration_estimator:
+                self.duration_estimator.elevator_call_cancelled(query_id)
 
     def create_request(self, msg):
         payload = msg.get('payload')
@@ -75,12 +82,16 @@ class ElevatorManager:
             # Close the doors
             self.logger.info('Received entering confirmation from ropod')
             request.update_status(ElevatorRequestStatus.GOING_TO_GOAL)
+            if self.duration_estimator:
+                self.duration_estimator.elevator_entered(query_id)
         elif command == 'ROBOT_FINISHED_EXITING':
             # Close the doors
             self.logger.info('Received exiting confirmation from ropod')
             # Remove the request from the ongoing queries
             self.ongoing_queries.pop(query_id)
             request.update_status(ElevatorRequestStatus.COMPLETED)
+            if self.duration_estimator:
+                self.duration_estimator.elevator_exited(query_id)
 
         elevator.confirm_robot_action(command, query_id)
 
@@ -99,6 +110,8 @@ class ElevatorManager:
                 elevator = query.get('elevator')
                 self.confirm_elevator(query_id, elevator.elevator_id)
                 request.update_status(ElevatorRequestStatus.GOING_TO_START)
+                if self.duration_estimator:
+                    self.duration_estimator.elevator_call_accepted(query_id)
 
     def configure_api(self, api_config):
         if self.api:
@@ -150,15 +163,17 @@ class Elevator:
 
 
 class ElevatorBuilder:
-    def __init__(self, ccu_store, api, monitoring_config=None, interface_config=None):
+    def __init__(self, ccu_store, api, monitoring_config=None, interface_config=None, duration_estimator=None):
         self._monitoring_config = monitoring_config
         self._interface_config = interface_config
+        self._duration_estimator = duration_estimator
         self._params = dict({'ccu_store': ccu_store,
                              'api': api})
 
     def __call__(self, elevator_id, **kwargs):
         elevator_interface = ElevatorControlInterface(elevator_id, **self._params)
         elevator_interface.configure_api(**self._interface_config)
-        elevator_monitor = ElevatorMonitor(elevator_id, **self._params)
+        elevator_monitor = ElevatorMonitor(elevator_id, duration_estimator=self._duration_estimator,
+                                           **self._params)
         elevator_monitor.configure_api(**self._monitoring_config)
         return Elevator(elevator_id, elevator_monitor, elevator_interface)
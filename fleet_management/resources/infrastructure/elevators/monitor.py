@@ -12,6 +12,7 @@ class ElevatorMonitor:
         self.api = api
         self.elevator = Elevator(self.id)
         self.query_progress = dict()
+        self.duration_estimator = kwargs.get('duration_estimator')
 
     def elevator_status_cb(self, msg):
         payload = msg.get('payload')
@@ -19,8 +20,12 @@ class ElevatorMonitor:
         self.elevator.update_status(payload)
         if self.at_start_floor():
             self.logger.info('Elevator reached start floor; waiting for confirmation...')
+            if self.duration_estimator:
+                self.duration_estimator.elevator_at_start_floor(query_id)
         elif self.at_goal_floor():
             self.logger.info('Elevator reached goal floor; waiting for confirmation...')
+            if self.duration_estimator:
+                self.duration_estimator.elevator_at_goal_floor(query_id)
 
     def configure_api(self, api_config):
         self.api.register_callbacks(self, api_config)
@@ -0,0 +1,131 @@
+import datetime
+import logging
+import os
+
+import numpy as np
+
+
+class TravelTimeMatrix(object):
+    """Expected travel durations between all the sub-areas where robots start and end travelling
+
+    Robots only travel between docking, undocking, charging and waiting sub-areas,
+    so the duration (mean and variance) of the paths between all such sub-areas is
+    computed offline (see ``fleet_management/scripts/compute_travel_times.py``) and
+    travel estimates become array lookups.
+
+    Args:
+        locations (list): names of the sub-areas, in the order of the rows and columns
+        mean (np.ndarray): mean[i, j] is the mean duration from locations[i] to locations[j].
+                           NaN if no path was found
+        variance (np.ndarray): variance of the durations
+        building (str): ref of the building
+    """
+
+    def __init__(self, locations, mean, variance, building=None, created=None):
+        self.logger = logging.getLogger('fms.resources.travel_times')
+        self.locations = list(locations)
+        self.mean = mean
+        self.variance = variance
+        self.building = building
+        self.created = created or datetime.datetime.now().isoformat()
+
+        self.index = {location: i for i, location in enumerate(self.locations)}
+
+    def get_duration(self, start, destination):
+        """Returns the (mean, variance) of the travel duration between two sub-areas
+        or None if it is not in the matrix
+        """
+        i = self.index.get(start)
+        j = self.index.get(destination)
+        if i is None or j is None or np.isnan(self.mean[i, j]):
+            return None
+        return float(self.mean[i, j]), float(self.variance[i, j])
+
+    def get_durations(self, pairs):
+        """Returns the (mean, variance) arrays of the travel durations between
+        several (start, destination) pairs. NaN where a pair is not in the matrix
+        """
+        rows = np.array([self.index.get(start, -1) for start, _ in pairs], dtype=int)
+        columns = np.array([self.index.get(destination, -1) for _, destination in pairs], dtype=int)
+        known = (rows >= 0) & (columns >= 0)
+
+        mean = np.full(len(pairs), np.nan)
+        variance = np.full(len(pairs), np.nan)
+        mean[known] = self.mean[rows[known], columns[known]]
+        variance[known] = self.variance[rows[known], columns[known]]
+        return mean, variance
+
+    def get_mean_duration_to(self, destination):
+        """Returns the mean travel duration to a sub-area from all the other sub-areas
+        """
+        j = self.index.get(destination)
+        if j is None:
+            return None
+        durations = np.delete(self.mean[:, j], j)
+        if np.isnan(durations).all():
+            return None
+        return float(np.nanmean(durations))
+
+    def save(self, path):
+        np.savez_compressed(path, locations=np.array(self.locations), mean=self.mean, variance=self.variance,
+                            building=np.array(self.building or ''), created=np.array(self.created))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['locations'].tolist(), data['mean'], data['variance'],
+                       building=str(data['building']) or None, created=str(data['created']))
+
+    @classmethod
+    def load_matrix(cls, path=None, **_):
+        """Loads the matrix of the FMS configuration. Returns None if there is none
+        """
+        logger = logging.getLogger('fms.resources.travel_times')
+        if not path or not os.path.exists(path):
+            logger.warning("No travel time matrix found, travel durations will be estimated from path plans")
+            return None
+        matrix = cls.load(path)
+        logger.info("Loaded travel times between %s locations of %s (created %s)",
+                    len(matrix.locations), matrix.building, matrix.created)
+        return matrix
+
+    @classmethod
+    def compute(cls, path_planner, duration_graph, behaviours=('docking', 'undocking', 'charging', 'waiting')):
+        """Computes the travel durations between all the sub-areas with the given behaviours
+
+        Args:
+            path_planner: the OSM path planner; its location index provides the sub-areas
+            duration_graph (DurationGraph): the durations of the edges between sub-areas
+            behaviours (tuple): behaviours of the sub-areas to include
+
+        Returns:
+            TravelTimeMatrix
+        """
+        logger = logging.getLogger('fms.resources.travel_times')
+        sub_areas = [(floor, area, sub_area.name)
+                     for area, floor, behaviour, sub_area in path_planner.location_index.get_behaviour_sub_areas()
+                     if behaviour in behaviours]
+        # a sub-area can have more than one behaviour
+        sub_areas = list({name: (floor, area, name) for floor, area, name in sub_areas}.values())
+
+        n_locations = len(sub_areas)
+        mean = np.full((n_locations, n_locations), np.nan)
+        variance = np.full((n_locations, n_locations), np.nan)
+
+        for i, (start_floor, start_area, start) in enumerate(sub_areas):
+            mean[i, i] = variance[i, i] = 0.
+            for j, (destination_floor, destination_area, destination) in enumerate(sub_areas):
+                if i == j:
+                    continue
+                try:
+                    path = path_planner.get_path_plan(start_floor=start_floor, destination_floor=destination_floor,
+                                                      start_area=start_area, destination_area=destination_area,
+                                                      start_local_area=start, destination_local_area=destination)
+                except Exception:
+                    logger.warning("Could not plan a path between %s and %s", start, destination)
+                    continue
+                model_areas = path_planner.to_model_areas(path)
+                mean[i, j], variance[i, j] = duration_graph.get_path_duration(model_areas)
+            logger.info("Computed travel times from %s (%s/%s)", start, i + 1, n_locations)
+
+        return cls([name for _, _, name in sub_areas], mean, variance, building=path_planner.building_ref)
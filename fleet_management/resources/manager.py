@@ -12,6 +12,7 @@ class ResourceManager(object):
 
         self.fleet_monitor = kwargs.get('fleet_monitor')
         self.elevator_manager = kwargs.get('elevator_manager')
+        self.event_scheduler = kwargs.get('event_scheduler')
 
         self.scheduled_robot_tasks = dict()
         self.allocations = list()
@@ -58,6 +59,11 @@ class ResourceManager(object):
         """
         self.auctioneer.allocate(tasks)
 
+    def get_allocation_backlog(self):
+        """ Returns the number of tasks waiting to be allocated by the auctioneer
+        """
+        return len(getattr(self.auctioneer, 'tasks_to_allocate', dict()))
+
     def _get_allocation(self):
         """ Gets the allocation of a task when the auctioneer terminates an allocation round.
         The allocation is a tuple in the form of  (task_id, [robot_id])
@@ -67,6 +73,9 @@ class ResourceManager(object):
             self.logger.debug("Allocation %s: ", allocation)
             self.allocations.append(allocation)
 
+        if self.allocations and self.event_scheduler:
+            self.event_scheduler.notify('allocation')
+
     def get_task_schedule(self, task_id, robot_id):
         """ Returns a dictionary with the start and finish time of the task_id assigned to the robot_id
         """
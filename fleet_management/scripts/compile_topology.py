@@ -0,0 +1,24 @@
+import argparse
+import logging
+
+from fleet_management.config.loader import ConfigParams, default_config
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compiles the topology of the map for fast loading')
+    parser.add_argument('--file', type=str, action='store', help='Path to the config file')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Directory of the compiled topology. Defaults to the one in the config file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    config = default_config if args.file is None else ConfigParams.from_file(args.file)
+    output = args.output or config.get('duration_graph', dict()).get('compiled_topology')
+    if not output:
+        raise SystemExit("No output directory given")
+
+    # loading the graph compiles it if the compiled topology is missing or out of date
+    graph = DurationGraph.load_graph(compiled_topology=output)
+    print("Compiled a topology with %s nodes and %s edges to %s" % (len(graph.nodes), len(graph.edges), output))
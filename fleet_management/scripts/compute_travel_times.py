@@ -0,0 +1,32 @@
+import argparse
+import logging
+
+from fleet_management.config.builder import plugin_factory
+from fleet_management.config.loader import ConfigParams, default_config
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+from fleet_management.resources.infrastructure.travel_times import TravelTimeMatrix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Computes the travel durations between all the sub-areas '
+                                                 'where robots start and end travelling')
+    parser.add_argument('--file', type=str, action='store', help='Path to the config file')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Path of the matrix. Defaults to the path in the config file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    config = default_config if args.file is None else ConfigParams.from_file(args.file)
+    duration_graph = DurationGraph.load_graph(**config.get('duration_graph', dict()))
+    osm = plugin_factory.configure('osm', duration_graph=duration_graph, **config['plugins']['osm'])
+    path_planner = osm.get('path_planner')
+    if not path_planner.location_index:
+        raise SystemExit("The location index of %s is empty, check the connection to the "
+                         "Overpass server or the OSM snapshot" % path_planner.building_ref)
+
+    matrix = TravelTimeMatrix.compute(path_planner, duration_graph)
+
+    output = args.output or config.get('travel_time_matrix', dict()).get('path')
+    matrix.save(output)
+    print("Saved the travel times between %s locations to %s" % (len(matrix.locations), output))
@@ -0,0 +1,75 @@
+import argparse
+import itertools
+import logging
+
+from fleet_management.exceptions.osm import OSMPlannerException
+from fleet_management.plugins.osm.bridge import OSMBridgeFMS
+from fleet_management.plugins.osm.path_planner import _OSMPathPlanner
+from fleet_management.plugins.osm.snapshot import OSMSnapshot
+
+BEHAVIOURS = ['docking', 'undocking', 'charging', 'waiting']
+
+
+def export_snapshot(server_ip, server_port, building, plan_paths=True):
+    """Records the Overpass queries the FMS makes on a building
+
+    The building is walked through the FMS path planner, so the snapshot contains the
+    queries for the location index, the areas and sub-areas with a behaviour and,
+    optionally, the paths between all pairs of such sub-areas.
+    """
+    logger = logging.getLogger('fms.scripts.export_osm_snapshot')
+
+    osm_bridge = OSMBridgeFMS(server_ip=server_ip, server_port=server_port)
+    snapshot = OSMSnapshot(building)
+    osm_bridge.use_snapshot(snapshot, record=True)
+
+    path_planner = _OSMPathPlanner(building, osm_bridge)
+    location_index = path_planner.location_index
+
+    sub_areas = list()
+    for _, area in osm_bridge.get_all_areas(building):
+        path_planner.get_area(area.ref, get_level=True)
+        for behaviour in BEHAVIOURS:
+            if not location_index.has_sub_area(area.ref, behaviour):
+                continue
+            sub_area = path_planner.get_sub_area(area.ref, behaviour=behaviour)
+            path_planner.get_sub_area(sub_area.name)
+            sub_areas.append((location_index.get_floor(area.ref), area.ref, sub_area.name))
+    logger.info("Recorded %s areas and %s sub-areas", len(location_index), len(sub_areas))
+
+    if plan_paths:
+        for start, destination in itertools.permutations(sub_areas, 2):
+            if start[1] == destination[1]:
+                continue
+            try:
+                path_planner.get_path_plan(start_floor=start[0], destination_floor=destination[0],
+                                           start_area=start[1], destination_area=destination[1],
+                                           start_local_area=start[2], destination_local_area=destination[2])
+            except Exception:
+                logger.warning("Could not plan a path between %s and %s", start[2], destination[2])
+        logger.info("Recorded the paths between %s sub-areas", len(sub_areas))
+
+    return snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exports an offline snapshot of an OSM world model')
+    parser.add_argument('building', type=str, help='Ref of the building, e.g. BRSU')
+    parser.add_argument('--output', type=str, default=None, help='Path of the snapshot file')
+    parser.add_argument('--server-ip', type=str, default='127.0.0.1', help='IP of the Overpass server')
+    parser.add_argument('--server-port', type=int, default=8000, help='Port of the Overpass server')
+    parser.add_argument('--skip-paths', action='store_true',
+                        help='Do not record the paths between the sub-areas with a behaviour')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        osm_snapshot = export_snapshot(args.server_ip, args.server_port, args.building,
+                                       plan_paths=not args.skip_paths)
+    except OSMPlannerException as e:
+        raise SystemExit("Could not export the snapshot: %s" % e)
+
+    output = args.output or '%s_osm_snapshot.json.gz' % args.building.lower()
+    osm_snapshot.save(output)
+    print("Saved %s queries to %s" % (len(osm_snapshot), output))
@@ -1,10 +1,10 @@
 import copy
 import logging
+import time
 from datetime import timedelta
 
 import inflection
 from fleet_management.db.models.actions import GoTo
-from fleet_management.db.models.environment import Area
 from fleet_management.db.models.robot import Ropod
 from fleet_management.exceptions.osm import OSMPlannerException
 from ropod.structs.status import TaskStatus as TaskStatusConst
@@ -19,6 +19,8 @@ class Dispatcher:
         self.freeze_window = timedelta(minutes=kwargs.get('freeze_window', 0.5))
         self.n_queued_tasks = kwargs.get('n_queued_tasks', 3)
         self.d_graph_updates = dict()
+        self.event_scheduler = kwargs.get('event_scheduler')
+        self._dispatch_deadline = None
 
     def add_plugin(self, obj, name=None):
         if name:
@@ -38,6 +40,7 @@ class Dispatcher:
         """
         Dispatches earliest task in each robot's timetable that is ready for dispatching
         """
+        time_to_dispatch = None
         for robot_id, timetable in self.timetable_manager.items():
             task = timetable.get_earliest_task()
             if task and task.status.status == TaskStatusConst.ALLOCATED:
@@ -53,6 +56,26 @@ class Dispatcher:
                     else:
                         self.send_d_graph_update(timetable)
                         self.dispatch_task(task, robot_id)
+                else:
+                    time_to_task = start_time.get_difference(TimeStamp()) - self.freeze_window
+                    if time_to_dispatch is None or time_to_task < time_to_dispatch:
+                        time_to_dispatch = time_to_task
+
+        if time_to_dispatch is not None:
+            self._schedule_dispatch(time_to_dispatch)
+
+    def _schedule_dispatch(self, time_to_dispatch):
+        """Requests a wake up from the event scheduler when the next task
+        enters the freeze window, unless an earlier one is already scheduled
+        """
+        if not self.event_scheduler:
+            return
+        now = time.monotonic()
+        delay = max(time_to_dispatch.total_seconds(), 0)
+        deadline = now + delay
+        if self._dispatch_deadline is None or not now < self._dispatch_deadline <= deadline:
+            self.event_scheduler.notify('dispatch', delay=delay)
+            self._dispatch_deadline = deadline
 
     def _add_pre_task_action(self, robot, task):
         self.logger.debug("Adding pre task action to plan for task %s robot %s", task.task_id, robot.robot_id)
@@ -79,11 +102,7 @@ class Dispatcher:
             self.logger.debug('Planning path between %s and %s', robot.position.subarea.name, pickup_subarea.name)
 
             areas = self.path_planner.get_path_plan_from_local_area(robot.position.subarea.name, pickup_subarea.name)
-            path_plan = list()
-
-            for area in areas:
-                model_area = Area(**area.to_dict())
-                path_plan.append(model_area)
+            path_plan = self.path_planner.to_model_areas(areas)
 
         except Exception as e:
             self.logger.error("Path planner error", exc_info=True)
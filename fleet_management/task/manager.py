@@ -6,6 +6,8 @@ import inflection
 from fleet_management.exceptions.osm import OSMPlannerException
 from fleet_management.exceptions.planning import NoPlanFound
 from fleet_management.resources.infrastructure.brsu import DurationGraph
+from fleet_management.task.pipeline import PlanningPipeline
+from fleet_management.utils.cache import LRUCache
 from fmlib.models.requests import TransportationRequest
 from fleet_management.db.models.task import TransportationTask as Task
 from ropod.structs.status import TaskStatus
@@ -29,6 +31,17 @@ class TaskManager(object):
         self.dispatcher = kwargs.get('dispatcher')
         self.task_monitor = kwargs.get('task_monitor')
         self.duration_graph = kwargs.get('duration_graph')
+        self.travel_time_matrix = kwargs.get('travel_time_matrix')
+        self.event_scheduler = kwargs.get('event_scheduler')
+        self.planning_budget = kwargs.get('planning_budget')
+        # expected travel times to the pickup locations; they expire since the durations are learned online
+        self.travel_time_cache = LRUCache(max_size=256, ttl=(self.planning_budget or dict()).get('travel_time_ttl'))
+
+        self.planning_pipeline = None
+        pipeline_config = kwargs.get('planning_pipeline')
+        if pipeline_config:
+            self.planning_pipeline = PlanningPipeline(self._plan_task, on_done=self._planning_done_cb,
+                                                      **pipeline_config)
         self.logger.info("Task Manager initialized...")
 
     def add_plugin(self, obj, name=None):
@@ -43,6 +56,13 @@ class TaskManager(object):
         if self.resource_manager:
             self.logger.debug("Adding allocation interface")
             self._allocate = self.resource_manager.allocate
+        if self.planning_pipeline:
+            self.planning_pipeline.start()
+
+    def shutdown(self):
+        task_planner = getattr(self, 'task_planner', None)
+        if task_planner:
+            task_planner.shutdown()
 
     def restore_task_data(self):
         """Loads any existing task data (ongoing tasks, scheduled tasks) from the CCU store database
@@ -67,9 +87,47 @@ class TaskManager(object):
             self.logger.error("Request %s is invalid" % payload.get('requestId'))
             return
 
+        if self.planning_pipeline:
+            self.logger.debug("Queueing task %s for planning", task.task_id)
+            if not self.planning_pipeline.submit(task):
+                # TODO Communicate this back to the user
+                task.update_status(TaskStatus.PLANNING_FAILED)
+            return
+
         self.logger.debug("Processing task request")
         self._process_task(task)
 
+    def process_requests(self, requests):
+        """Validates, plans and allocates a batch of task requests,
+        e.g. several carts requested by a ward at shift change
+
+        Args:
+            requests (list): Task request payloads in the ROPOD format
+        """
+        tasks = list()
+        for request in requests:
+            try:
+                tasks.append(self._process_request(request))
+            except (InvalidRequestLocation, InvalidRequestTime):
+                self.logger.error("Request %s is invalid", request.get('requestId'))
+
+        if not tasks:
+            return
+
+        self.logger.debug("Planning a batch of %s tasks", len(tasks))
+        task_plans = self.task_planner.plan_batch([task.request for task in tasks], self.path_planner)
+
+        for task, task_plan in zip(tasks, task_plans):
+            if task_plan is None:
+                # TODO Communicate this back to the user
+                task.update_status(TaskStatus.PLANNING_FAILED)
+                continue
+
+            task.update_plan(task_plan)
+            mean, variance = self.get_task_duration_estimate(task_plan)
+            task.update_duration(mean=mean, variance=variance)
+            self._allocate_task(task)
+
     def _process_request(self, request):
 
         task_request = TransportationRequest.from_payload(request)
@@ -99,6 +157,9 @@ class TaskManager(object):
 
     def _is_valid_request_location(self, location, **kwargs):
         behaviour = kwargs.get('behaviour')
+        location_index = getattr(self.path_planner, 'location_index', None)
+        if location_index:
+            return location_index.has_sub_area(location, behaviour)
         try:
             self.path_planner.get_sub_area(location, behaviour=behaviour)
         except OSMPlannerException as e:
@@ -113,17 +174,28 @@ class TaskManager(object):
         Args:
             task (Task): A task object to be processed
         """
+        if self._plan_task(task):
+            self._allocate_task(task)
+
+    def _plan_task(self, task):
+        """Generates the task plan and the duration estimate of a task
 
+        Args:
+            task (Task): A task object to be processed
+
+        Returns:
+            bool: True if the task was planned successfully
+        """
         try:
             task_plan = self._get_task_plan(task)
         except NoPlanFound as e:
             self.logger.error(e, exc_info=True)
             task.update_status(TaskStatus.PLANNING_FAILED)
             # TODO Communicate this back to the user
-            return
+            return False
         except OSMPlannerException:
             task.update_status(TaskStatus.PLANNING_FAILED)
-            return  # TODO: this error needs to be communicated with the end user
+            return False  # TODO: this error needs to be communicated with the end user
 
         task.update_plan(task_plan)
         self.logger.debug('Task plan updated...')
@@ -131,11 +203,19 @@ class TaskManager(object):
         # TODO: Get estimated duration from planner
         mean, variance = self.get_task_duration_estimate(task_plan)
         task.update_duration(mean=mean, variance=variance)
+        return True
 
+    def _allocate_task(self, task):
         self.logger.debug('Allocating robots for the task %s ', task.task_id)
 
         self._allocate(task)
         self.logger.debug('Sent to resource manager for allocation')
+        if self.event_scheduler:
+            self.event_scheduler.notify('task_request')
+
+    def _planning_done_cb(self):
+        if self.event_scheduler:
+            self.event_scheduler.notify('planning')
 
     def get_task_duration_estimate(self, task_plan):
         # TODO This is a hardcoded way to get the duration based on OSM and Guido runs
@@ -145,10 +225,85 @@ class TaskManager(object):
     def _allocate(self, *_, **__):
         self.logger.warning("No allocation interface configured")
 
+    def _get_planning_budget(self, task):
+        """Returns the number of seconds the task planner may spend on a task
+
+        The budget is a fraction of the time left before the latest pickup time,
+        once the expected travel time to the pickup location and the time taken by the
+        allocation of the tasks ahead of this one are discounted.
+
+        Args:
+            task (Task): The task to plan
+
+        Returns:
+            float: The planning budget in seconds or None if no budget is configured
+        """
+        if not self.planning_budget:
+            return None
+
+        time_to_pickup = (task.request.latest_pickup_time - datetime.datetime.now()).total_seconds()
+
+        backlog = 0
+        if self.resource_manager:
+            backlog += self.resource_manager.get_allocation_backlog()
+        if self.planning_pipeline:
+            backlog += self.planning_pipeline.depth
+
+        slack = time_to_pickup - self._get_expected_travel_time(task) \
+            - backlog * self.planning_budget.get('allocation_time', 0)
+        budget = self.planning_budget.get('fraction', 1.0) * slack
+        budget = min(max(budget, self.planning_budget.get('min', 1)), self.planning_budget.get('max', budget))
+
+        self.logger.debug("Planning budget for task %s: %.1fs (backlog: %s tasks)", task.task_id, budget, backlog)
+        return budget
+
+    def _get_expected_travel_time(self, task):
+        """Returns the expected time for a robot to reach the pickup location of a task,
+        i.e. the mean travel time from all known locations to the docking sub-areas of the
+        pickup location, taken from the travel time matrix or from the shortest expected
+        paths in the duration graph. The robot may dock at any of them, so the travel times
+        to all of them are averaged
+        """
+        default = self.planning_budget.get('expected_travel_time', 0)
+        location_index = getattr(self.path_planner, 'location_index', None)
+        if not location_index:
+            return default
+
+        key = (task.request.pickup_location, getattr(self.path_planner, 'map_version', None))
+        travel_time = self.travel_time_cache.get(key)
+        if travel_time is not None:
+            return travel_time
+
+        travel_times = list()
+        for sub_area in location_index.get_sub_areas(task.request.pickup_location, 'docking'):
+            travel_time = None
+            if self.travel_time_matrix:
+                travel_time = self.travel_time_matrix.get_mean_duration_to(sub_area.name)
+            if travel_time is None and self.duration_graph:
+                travel_time = self._get_mean_graph_duration_to(sub_area.id, location_index)
+            if travel_time is not None:
+                travel_times.append(travel_time)
+        travel_time = sum(travel_times) / len(travel_times) if travel_times else default
+        self.travel_time_cache.put(key, travel_time)
+        return travel_time
+
+    def _get_mean_graph_duration_to(self, sub_area_id, location_index):
+        """Returns the mean duration of the shortest expected paths in the duration graph
+        between a sub-area and the sub-areas where robots start travelling
+        """
+        # the durations are symmetric, so a single Dijkstra tree from the destination is enough
+        paths = self.duration_graph.shortest_expected_durations(sub_area_id)
+        sub_area_ids = {sub_area.id for _, _, _, sub_area in location_index.get_behaviour_sub_areas()}
+        durations = [paths[i][0] for i in sub_area_ids if i in paths and i != sub_area_id]
+        if not durations:
+            return None
+        return sum(durations) / len(durations)
+
     def _get_task_plan(self, task):
         self.logger.debug('Creating a task plan...')
         try:
-            task_plan = self.task_planner.plan(task.request, self.path_planner)
+            time_budget = self._get_planning_budget(task)
+            task_plan = self.task_planner.plan(task.request, self.path_planner, time_budget=time_budget)
             self.logger.debug('Planning successful for task %s', task.task_id)
         except OSMPlannerException:
             self.logger.error("Path planning failed for task %s", task.task_id, exc_info=True)
@@ -158,6 +313,13 @@ class TaskManager(object):
 
     def run(self):
 
+        if self.planning_pipeline:
+            tasks = self.planning_pipeline.get_results()
+            for task in tasks:
+                self._allocate_task(task)
+            if tasks:
+                self.logger.debug("Planning pipeline metrics: %s", self.planning_pipeline.metrics())
+
         while self.resource_manager.allocations:
             task_id, robot_ids = self.resource_manager.allocations.pop()
             self.logger.debug('Reserving robots %s for task %s.', robot_ids, task_id)
@@ -15,14 +15,16 @@ class TaskMonitor:
     Args:
         ccu_store (MongoInterface): An interface to the MongoDB database
         api (API): A component to communicate through the network
+        duration_estimator (DurationEstimator): Learns the durations of the GOTO actions
 
     """
 
-    def __init__(self, ccu_store, api, **_):
+    def __init__(self, ccu_store, api, **kwargs):
         self.logger = logging.getLogger('fms.task.monitor')
 
         self.ccu_store = ccu_store
         self.api = api
+        self.duration_estimator = kwargs.get('duration_estimator')
 
     def add_plugin(self, obj, name=None):
         if name:
@@ -54,6 +56,9 @@ class TaskMonitor:
         self.logger.debug("Received task status message for task %s by %s", task_id, robot_id)
         self._update_task_status(task_id, status, robot_id)
 
+        if self.duration_estimator and status in [TaskStatus.COMPLETED, TaskStatus.ABORTED, TaskStatus.FAILED]:
+            self.duration_estimator.task_finished(robot_id)
+
         failure_warning = ''
         if status == TaskStatus.FAILED:
             failure_warning = "Task %s has failed. " % task_id
@@ -64,6 +69,8 @@ class TaskMonitor:
             self._update_timetable(timestamp, **payload)
             action_type = task_progress.get('action_type')
             action_id = task_progress.get('action_id')
+            if self.duration_estimator:
+                self.duration_estimator.update_task_progress(robot_id, action_type, action_status)
 
             action_failure = ''
             if action_status == ActionStatus.FAILED:
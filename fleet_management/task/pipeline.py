@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+import time
+
+
+class PlanningPipeline(object):
+    """A bounded queue of tasks waiting to be planned, drained by a pool of worker threads
+
+    Tasks are planned outside the thread that receives the task requests, so a slow
+    planner call does not block the reception of other messages. When the queue is full,
+    ``submit`` blocks for up to ``enqueue_timeout`` seconds before rejecting the task.
+
+    Args:
+        process (callable): Function that plans a task. It returns True if the task
+                            should be passed on for allocation
+        workers (int): Number of worker threads
+        max_queue_size (int): Maximum number of tasks waiting to be planned
+        enqueue_timeout (float): Seconds to wait for a free slot in the queue
+        on_done (callable): Called (without arguments) every time a task finishes planning
+    """
+
+    def __init__(self, process, workers=1, max_queue_size=20, enqueue_timeout=1.0, on_done=None, **_):
+        self.logger = logging.getLogger('fms.task.pipeline')
+        self.process = process
+        self.n_workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self.on_done = on_done
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._results = queue.Queue()
+        self._workers = list()
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._total_wait_time = 0.
+        self._total_planning_time = 0.
+
+    def start(self):
+        for i in range(self.n_workers - len(self._workers)):
+            worker = threading.Thread(target=self._work, name='planning_worker_%s' % i, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self.logger.debug("Started %s planning workers", len(self._workers))
+
+    def submit(self, task):
+        """Adds a task to the planning queue
+
+        Args:
+            task (Task): The task to plan
+
+        Returns:
+            bool: False if the task was rejected because the queue is full
+        """
+        try:
+            self._queue.put((task, time.monotonic()), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            self.logger.warning("Planning queue is full, rejecting task %s", task.task_id)
+            return False
+
+        with self._lock:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    def get_results(self):
+        """Returns the tasks that were successfully planned since the last call
+        """
+        tasks = list()
+        while True:
+            try:
+                tasks.append(self._results.get_nowait())
+            except queue.Empty:
+                return tasks
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        with self._lock:
+            n_processed = self._completed + self._failed
+            return {'depth': self.depth,
+                    'max_depth': self._max_depth,
+                    'submitted': self._submitted,
+                    'rejected': self._rejected,
+                    'completed': self._completed,
+                    'failed': self._failed,
+                    'mean_wait_time': self._total_wait_time / n_processed if n_processed else 0.,
+                    'mean_planning_time': self._total_planning_time / n_processed if n_processed else 0.}
+
+    def _work(self):
+        while True:
+            task, enqueued_at = self._queue.get()
+            started_at = time.monotonic()
+            try:
+                success = self.process(task)
+            except Exception:
+                self.logger.error("Unexpected error while planning task %s", task.task_id, exc_info=True)
+                success = False
+            finished_at = time.monotonic()
+
+            with self._lock:
+                self._total_wait_time += started_at - enqueued_at
+                self._total_planning_time += finished_at - started_at
+                if success:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+            if success:
+                self._results.put(task)
+            self._queue.task_done()
+
+            if self.on_done:
+                self.on_done()
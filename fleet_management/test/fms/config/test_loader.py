@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+
+from fleet_management.config.loader import Configurator
+from fleet_management.resources.infrastructure.travel_times import TravelTimeMatrix
+
+
+class ConfiguratorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.directory.name, 'config.yaml')
+        with open(self.config_file, 'w') as config_file:
+            config_file.write('travel_time_matrix:\n  path: %s\n'
+                              % os.path.join(self.directory.name, 'travel_times.npz'))
+
+    def test_configure_without_travel_time_matrix(self):
+        config = Configurator(self.config_file, logger=False,
+                              component_modules={'travel_time_matrix': TravelTimeMatrix.load_matrix},
+                              config_order=['travel_time_matrix'])
+        config.configure()
+        self.assertIsNone(config.get_component('travel_time_matrix'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
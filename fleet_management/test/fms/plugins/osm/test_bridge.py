@@ -0,0 +1,173 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from overpy import exception as overpy_exception
+
+from fleet_management.plugins.osm.bridge import OSMBridgeFMS
+from fleet_management.plugins.osm.overpass import OverpassClient, QueryStats
+from fleet_management.plugins.osm.snapshot import OSMSnapshot, SnapshotAdapter
+
+
+def create_bridge(snapshot=None, snapshot_file=None):
+    # the signature only depends on the source of the map, not on the OBL bridge
+    bridge = OSMBridgeFMS.__new__(OSMBridgeFMS)
+    bridge.snapshot = snapshot
+    bridge.snapshot_file = snapshot_file
+    bridge.overpass = mock.Mock()
+    bridge.get_area_records = mock.Mock(return_value=list())
+    return bridge
+
+
+class MapSignatureTest(unittest.TestCase):
+    def test_overpass(self):
+        bridge = create_bridge()
+        bridge.overpass.get_timestamp.return_value = '2026-01-01T00:00:00Z'
+        signature = bridge.get_map_signature('BRSU')
+        self.assertEqual(bridge.get_map_signature('BRSU'), signature)
+        self.assertNotEqual(bridge.get_map_signature('AMK'), signature)
+
+        bridge.overpass.get_timestamp.return_value = '2026-01-02T00:00:00Z'
+        self.assertNotEqual(bridge.get_map_signature('BRSU'), signature)
+        bridge.get_area_records.assert_not_called()
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'snapshot.json.gz')
+            snapshot = OSMSnapshot('BRSU', {'node(1);out;': [1]})
+            snapshot.save(path)
+            bridge = create_bridge(snapshot, path)
+            signature = bridge.get_map_signature('BRSU')
+            self.assertEqual(bridge.get_map_signature('BRSU'), signature)
+
+            snapshot.put('node(2);out;', [2])
+            snapshot.save(path)
+            self.assertNotEqual(bridge.get_map_signature('BRSU'), signature)
+        bridge.overpass.get_timestamp.assert_not_called()
+
+
+def create_records(behaviour='docking'):
+    return [{'ref': 'AMK_D_L0_C1', 'id': 1, 'type': 'corridor', 'floor': 0,
+             'local_areas': [{'id': 10, 'ref': 'AMK_D_L0_C1_LA1', 'behaviour': behaviour},
+                             {'id': 11, 'ref': 'AMK_D_L0_C1_LA2', 'behaviour': 'charging'},
+                             {'id': 12, 'ref': 'AMK_D_L0_C1_LA3', 'behaviour': None}]}]
+
+
+class BehaviourIndexTest(unittest.TestCase):
+    def create_bridge(self, index_file=None):
+        bridge = OSMBridgeFMS.__new__(OSMBridgeFMS)
+        bridge.logger = mock.Mock()
+        bridge.index_file = index_file
+        bridge._area_records = dict()
+        bridge._behaviour_index = dict()
+        bridge._index_lock = threading.Lock()
+        bridge._read_area_records = mock.Mock(return_value=create_records())
+        return bridge
+
+    def test_behaviour_index(self):
+        bridge = self.create_bridge()
+        self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK', 'docking'), ['AMK_D_L0_C1_LA1'])
+        self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK'), ['AMK_D_L0_C1_LA1', 'AMK_D_L0_C1_LA2'])
+        self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK', 'waiting'), [])
+        self.assertEqual(bridge.get_local_areas_of_behaviour_type('AMK', 'charging'),
+                         [{'id': 11, 'ref': 'AMK_D_L0_C1_LA2', 'behaviour': 'charging'}])
+        # the building is read from OSM once
+        bridge._read_area_records.assert_called_once_with('AMK')
+
+        bridge._read_area_records.return_value = create_records('undocking')
+        bridge.get_area_records('AMK', refresh=True)
+        self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK', 'docking'), [])
+        self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK', 'undocking'), ['AMK_D_L0_C1_LA1'])
+
+    def test_index_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index_file = os.path.join(directory, 'index.json')
+            self.create_bridge(index_file).get_area_records('AMK')
+            self.assertEqual(os.listdir(directory), ['index.json'])
+
+            bridge = self.create_bridge(index_file)
+            self.assertEqual(bridge.get_all_local_area_of_behaviour_type('AMK', 'docking'), ['AMK_D_L0_C1_LA1'])
+            bridge._read_area_records.assert_not_called()
+
+
+class FakeOverpy(object):
+    def parse_json(self, data):
+        if isinstance(data, bytes):
+            data = data.decode()
+        return SimpleNamespace(nodes=[data], ways=[], relations=[])
+
+
+class PooledQueriesTest(unittest.TestCase):
+    def setUp(self):
+        self.bridge = OSMBridgeFMS.__new__(OSMBridgeFMS)
+        self.bridge.logger = mock.Mock()
+        self.bridge.query_stats = QueryStats()
+        self.bridge.overpass = OverpassClient('127.0.0.1', 8000, stats=self.bridge.query_stats)
+        self.bridge.overpass.session = mock.Mock()
+        self.bridge.overpass.session.post.return_value = self.create_response(200, b'{"elements": []}')
+        self.get = mock.Mock()
+
+    @staticmethod
+    def create_response(status_code, content, content_type='application/json'):
+        return mock.Mock(status_code=status_code, content=content, text=content.decode(),
+                         headers={'Content-Type': content_type}, json=lambda: json.loads(content))
+
+    def test_pooled_queries(self):
+        self.bridge.osm_adapter = SimpleNamespace(api=FakeOverpy(), get=self.get)
+        self.bridge._pool_queries()
+
+        self.assertEqual(self.bridge.osm_adapter.get('way(1);out;'), (['{"elements": []}'], [], []))
+        self.bridge.overpass.session.post.assert_called_once_with(self.bridge.overpass.url,
+                                                                  data={'data': 'way(1);out;'}, timeout=10)
+        self.get.assert_not_called()
+        self.assertEqual(self.bridge.get_query_stats()['obl']['count'], 1)
+
+        # queries missing from a snapshot that is being recorded also go through the pool
+        snapshot = OSMSnapshot('BRSU')
+        SnapshotAdapter.install(self.bridge, snapshot, record=True)
+        self.assertEqual(self.bridge.osm_adapter.get('way(2);out;'), (['{"elements": []}'], [], []))
+        self.assertEqual(self.bridge.get_query_stats()['obl']['count'], 2)
+        self.assertEqual(snapshot.get('way(2);out;'), {'elements': []})
+
+    def test_errors(self):
+        self.bridge.osm_adapter = SimpleNamespace(api=FakeOverpy(), get=self.get)
+        self.bridge._pool_queries()
+        post = self.bridge.overpass.session.post
+
+        # the errors raise the exceptions of overpy, as the queries of the OBL adapter do
+        post.return_value = self.create_response(429, b'')
+        self.assertRaises(overpy_exception.OverpassTooManyRequests, self.bridge.osm_adapter.get, 'way(1);out;')
+        post.return_value = self.create_response(504, b'')
+        self.assertRaises(overpy_exception.OverpassGatewayTimeout, self.bridge.osm_adapter.get, 'way(1);out;')
+        post.return_value = self.create_response(500, b'')
+        self.assertRaises(overpy_exception.OverpassUnknownHTTPStatusCode, self.bridge.osm_adapter.get, 'way(1);out;')
+        post.return_value = self.create_response(200, b'<osm/>', 'application/osm3s+xml')
+        self.assertRaises(overpy_exception.OverpassUnknownContentType, self.bridge.osm_adapter.get, 'way(1);out;')
+
+        post.return_value = self.create_response(
+            400, b'<p><strong style="color:#FF0000">Error</strong>: line 1: parse error</p>', 'text/html')
+        with self.assertRaises(overpy_exception.OverpassBadRequest) as context:
+            self.bridge.osm_adapter.get('way(1);out')
+        self.assertEqual(context.exception.msgs, ['Error: line 1: parse error'])
+
+        # errors are not recorded in a snapshot
+        snapshot = OSMSnapshot('BRSU')
+        SnapshotAdapter.install(self.bridge, snapshot, record=True)
+        self.assertRaises(overpy_exception.OverpassBadRequest, self.bridge.osm_adapter.get, 'way(1);out')
+        self.assertEqual(len(snapshot), 0)
+
+    def test_unpooled_queries(self):
+        self.bridge.osm_adapter = SimpleNamespace(get=self.get)
+        self.bridge._pool_queries()
+
+        self.bridge.osm_adapter.get('way(1);out;')
+        self.get.assert_called_once_with('way(1);out;')
+        self.assertEqual(self.bridge.get_query_stats()['obl']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fleet_management.plugins.osm.graph_planner import DurationGraphPathPlanner
+from fleet_management.plugins.osm.location_index import LocationIndex
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+
+
+def create_record(area_id, floor, local_area_ids):
+    return {'ref': 'A%s' % area_id, 'id': area_id, 'type': 'corridor', 'floor': floor,
+            'local_areas': [{'id': i, 'ref': 'LA%s' % i, 'behaviour': None} for i in local_area_ids]}
+
+
+class DurationGraphPathPlannerTest(unittest.TestCase):
+    def setUp(self):
+        records = [create_record(1, 0, [10, 11]), create_record(2, 0, [20, 21]), create_record(3, 1, [30])]
+        location_index = LocationIndex(SimpleNamespace(get_area_records=lambda building, refresh: records), 'BRSU')
+        location_index.refresh()
+
+        osm_bridge = mock.Mock()
+        osm_bridge.get_door.return_value = SimpleNamespace(ref='D50', type='door')
+        self.osm_path_planner = mock.Mock(location_index=location_index, osm_bridge=osm_bridge)
+
+        # the corridors are connected through door 50 and a slower direct edge
+        self.graph = DurationGraph()
+        self.graph.add_edge(10, 11, mean=2)
+        self.graph.add_edge(11, 50, mean=1)
+        self.graph.add_edge(50, 20, mean=1)
+        self.graph.add_edge(11, 20, mean=10)
+        self.graph.add_edge(20, 21, mean=2)
+        self.graph.compile()
+        self.path_planner = DurationGraphPathPlanner(self.osm_path_planner, duration_graph=self.graph)
+
+    def test_get_path_plan(self):
+        areas = self.path_planner.get_path_plan(0, 0, 'A1', 'A2', start_local_area='LA10',
+                                                destination_local_area='LA21')
+
+        self.assertEqual([area.name for area in areas], ['A1', 'D50', 'A2'])
+        self.assertEqual([area.type for area in areas], ['corridor', 'door', 'corridor'])
+        self.assertEqual([area.floor_number for area in areas], [0, 0, 0])
+        self.assertEqual([[sub_area.id for sub_area in area.sub_areas] for area in areas], [[10, 11], [], [20, 21]])
+        self.osm_path_planner.get_path_plan.assert_not_called()
+
+        self.path_planner.get_path_plan_from_local_area('LA21', 'LA10')
+        self.osm_path_planner.osm_bridge.get_door.assert_called_once_with(50)
+
+    def test_updated_edges(self):
+        self.path_planner.get_path_plan_from_local_area('LA10', 'LA21')
+        self.graph.update_edges([(11, 20, {'mean': 1})])
+        areas = self.path_planner.get_path_plan_from_local_area('LA10', 'LA21')
+
+        self.assertEqual([area.name for area in areas], ['A1', 'A2'])
+
+    def test_delegated_paths(self):
+        self.path_planner.get_path_plan(0, 1, 'A1', 'A3', start_local_area='LA10', destination_local_area='LA30')
+        self.osm_path_planner.get_path_plan.assert_called_once()
+
+        self.path_planner.get_path_plan_from_local_area('LA10', 'LA99')
+        self.osm_path_planner.get_path_plan_from_local_area.assert_called_once_with('LA10', 'LA99')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+from fleet_management.plugins.osm.location_index import LocationIndex
+
+
+class LocationIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.osm_bridge = mock.Mock()
+        self.osm_bridge.get_area_records.return_value = [
+            {'ref': 'AMK_D_L0_C1', 'id': 1, 'type': 'corridor', 'floor': 0,
+             'local_areas': [{'id': 10, 'ref': 'AMK_D_L0_C1_LA1', 'behaviour': 'docking'},
+                             {'id': 11, 'ref': 'AMK_D_L0_C1_LA2', 'behaviour': None}]},
+            {'ref': 'AMK_D_L4_C2', 'id': 2, 'type': 'room', 'floor': 4,
+             'local_areas': [{'id': 20, 'ref': 'AMK_D_L4_C2_LA1', 'behaviour': 'undocking'}]}]
+        self.location_index = LocationIndex(self.osm_bridge, 'AMK')
+        self.location_index.refresh()
+
+    def test_areas(self):
+        self.assertEqual(len(self.location_index), 2)
+        self.assertIn('AMK_D_L4_C2', self.location_index)
+        self.assertEqual(self.location_index.get_floor('AMK_D_L4_C2'), 4)
+        self.assertEqual(self.location_index.get_area_id('AMK_D_L4_C2'), 2)
+        self.assertEqual(self.location_index.get_area_type('AMK_D_L4_C2'), 'room')
+        self.assertIsNone(self.location_index.get_floor('AMK_D_L2_C1'))
+
+    def test_has_sub_area(self):
+        self.assertTrue(self.location_index.has_sub_area('AMK_D_L0_C1', 'docking'))
+        self.assertFalse(self.location_index.has_sub_area('AMK_D_L0_C1', 'undocking'))
+        self.assertFalse(self.location_index.has_sub_area('AMK_D_L2_C1', 'docking'))
+
+        sub_areas = self.location_index.get_sub_areas('AMK_D_L0_C1', 'docking')
+        self.assertEqual([(sub_area.id, sub_area.name) for sub_area in sub_areas], [(10, 'AMK_D_L0_C1_LA1')])
+        self.assertEqual([(ref, floor, behaviour, sub_area.id)
+                          for ref, floor, behaviour, sub_area in self.location_index.get_behaviour_sub_areas()],
+                         [('AMK_D_L0_C1', 0, 'docking', 10), ('AMK_D_L4_C2', 4, 'undocking', 20)])
+
+    def test_get_parent_area(self):
+        # sub-areas are found by ref and by id, including those without a behaviour
+        ref, sub_area = self.location_index.get_parent_area('AMK_D_L0_C1_LA2')
+        self.assertEqual((ref, sub_area.id), ('AMK_D_L0_C1', 11))
+        self.assertEqual(self.location_index.get_parent_area(20)[0], 'AMK_D_L4_C2')
+        self.assertIsNone(self.location_index.get_parent_area('AMK_D_L2_C1_LA1'))
+
+        # the indexed sub-areas are not modified through the returned copies
+        sub_area.name = 'modified'
+        self.assertEqual(self.location_index.get_parent_area(11)[1].name, 'AMK_D_L0_C1_LA2')
+
+    def test_refresh(self):
+        self.osm_bridge.get_area_records.return_value = list()
+        self.location_index.refresh('BRSU', reload=True)
+
+        self.osm_bridge.get_area_records.assert_called_with('BRSU', refresh=True)
+        self.assertEqual(len(self.location_index), 0)
+        self.assertIsNone(self.location_index.get_parent_area(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import threading
+import unittest
+
+from fleet_management.plugins.osm.overpass import OverpassClient, QueryStats
+
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.content = json.dumps(data).encode()
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession(object):
+    def __init__(self, elements):
+        self.elements = elements
+        self.queries = list()
+
+    def post(self, url, data=None, timeout=None):
+        query = data['data']
+        self.queries.append(query)
+        ids = [int(i) for i in query.split('(id:')[1].split(')')[0].split(',')]
+        relations = [dict(self.elements[i], type='relation', id=i) for i in ids]
+        ways = [{'type': 'way', 'id': member['ref'], 'tags': {'level': '1'}}
+                for relation in relations for member in relation.get('members', list())]
+        return FakeResponse({'elements': relations + ways})
+
+
+class OverpassClientTest(unittest.TestCase):
+    def setUp(self):
+        self.elements = {i: {'tags': {'ref': 'LA%s' % i}} for i in range(1, 6)}
+        self.elements[2]['members'] = [{'type': 'way', 'ref': 20}]
+        self.client = OverpassClient('127.0.0.1', 8000, max_batch_size=2)
+        self.client.session = FakeSession(self.elements)
+
+    def test_get_elements(self):
+        elements = self.client.get_elements([1, 2, 3, 2, 4, 5])
+
+        self.assertEqual(len(self.client.session.queries), 3)
+        self.assertEqual(sorted(elements), [1, 2, 3, 4, 5])
+        self.assertEqual(elements[1]['tags'], {'ref': 'LA1'})
+        # the tags of the member ways are merged into the tags of the relation
+        self.assertEqual(elements[2]['tags'], {'ref': 'LA2', 'level': '1'})
+        self.assertEqual(self.client.stats.stats()['relation_batch']['count'], 3)
+
+    def test_sessions(self):
+        # each thread sends its queries through its own session
+        client = OverpassClient('127.0.0.1', 8000)
+        sessions = list()
+        thread = threading.Thread(target=lambda: sessions.append(client.session))
+        thread.start()
+        thread.join()
+        self.assertIs(client.session, client.session)
+        self.assertIsNot(sessions[0], client.session)
+
+
+class QueryStatsTest(unittest.TestCase):
+    def test_stats(self):
+        stats = QueryStats(window=10)
+        for seconds in range(1, 21):
+            stats.record('obl', seconds / 10)
+        stats.record('relation_batch', 0.5)
+
+        obl = stats.stats()['obl']
+        self.assertEqual(obl['count'], 20)
+        self.assertAlmostEqual(obl['mean'], 1.05)
+        # the percentiles are computed over the last samples only
+        self.assertAlmostEqual(obl['p95'], 1.9)
+        self.assertAlmostEqual(obl['max'], 2.0)
+        self.assertEqual(stats.stats()['relation_batch'], {'count': 1, 'mean': 0.5, 'p95': 0.5, 'max': 0.5})
+
+
+if __name__ == '__main__':
+    unittest.main()
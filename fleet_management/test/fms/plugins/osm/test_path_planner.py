@@ -0,0 +1,107 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fleet_management.exceptions.osm import OSMPlannerException
+from fleet_management.plugins.osm.path_planner import _OSMPathPlanner
+
+
+def create_area(area_id, nav_area_ids, level=0):
+    nav_areas = [SimpleNamespace(id=i, ref='LA%s' % i) for i in nav_area_ids]
+    return SimpleNamespace(id=area_id, ref='A%s' % area_id, type='corridor', level=level,
+                           navigation_areas=nav_areas, exit_door=None)
+
+
+class OSMPathPlannerTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch('fleet_management.plugins.osm.path_planner.OBL'), \
+                mock.patch('fleet_management.plugins.osm.path_planner.LocalAreaFinder'):
+            self.path_planner = _OSMPathPlanner('BRSU', mock.Mock(), location_index=False)
+
+    def plan(self, *areas):
+        self.path_planner.path_planner.get_path_plan.return_value = list(areas)
+        return self.path_planner.get_path_plan(0, 0, 'A1', 'A2',
+                                               start_local_area=areas[0].navigation_areas[0].ref,
+                                               destination_local_area=areas[-1].navigation_areas[-1].ref)
+
+    def test_paths_through_the_same_area(self):
+        first = self.plan(create_area(1, [10, 11]), create_area(2, [20]))
+        second = self.plan(create_area(1, [12, 11]), create_area(2, [21, 20]))
+
+        self.assertEqual([sub_area.id for sub_area in first[0].sub_areas], [10, 11])
+        self.assertEqual([sub_area.id for sub_area in second[0].sub_areas], [12, 11])
+        self.assertEqual([sub_area.id for sub_area in second[1].sub_areas], [21, 20])
+        self.assertIsNot(first[0], second[0])
+        # the sub-areas of the same local area are not shared either
+        self.assertIsNot(first[0].sub_areas[1], second[0].sub_areas[1])
+
+    def test_cached_paths_are_not_shared(self):
+        first = self.plan(create_area(1, [10, 11]), create_area(2, [20]))
+        first[0].sub_areas.append(SimpleNamespace(id=99, name='LA99'))
+        first[1].sub_areas[0].name = 'modified'
+        second = self.plan(create_area(1, [10, 11]), create_area(2, [20]))
+
+        self.assertEqual(self.path_planner.get_path_cache_stats()['hits'], 1)
+        self.assertEqual([sub_area.id for sub_area in second[0].sub_areas], [10, 11])
+        self.assertEqual(second[1].sub_areas[0].name, 'LA20')
+        self.assertIsNot(first[0], second[0])
+
+    def test_path_cache_invalidation(self):
+        self.plan(create_area(1, [10, 11]), create_area(2, [20]))
+        map_version = self.path_planner.map_version
+        self.path_planner.reload_map(read_map=False)
+        self.plan(create_area(1, [10, 11]), create_area(2, [20]))
+
+        self.assertEqual(self.path_planner.map_version, map_version + 1)
+        self.assertEqual(self.path_planner.get_path_cache_stats()['hits'], 0)
+        self.assertEqual(self.path_planner.path_planner.get_path_plan.call_count, 2)
+
+    def test_path_cache_key(self):
+        obl_planner = self.path_planner.path_planner
+        obl_planner.get_path_plan.return_value = [create_area(1, [10, 11])]
+        for destination_local_area in ('LA10', 'LA11', 'LA10'):
+            self.path_planner.get_path_plan(0, 0, 'A1', 'A1', start_local_area='LA11',
+                                            destination_local_area=destination_local_area)
+        self.assertEqual(obl_planner.get_path_plan.call_count, 2)
+
+        # paths from the position of a robot are not cached
+        for _ in range(2):
+            self.path_planner.get_path_plan(0, 0, 'A1', 'A1', robot_position=[1.0, 2.0],
+                                            destination_local_area='LA10')
+        self.assertEqual(obl_planner.get_path_plan.call_count, 4)
+        self.assertEqual(len(self.path_planner.path_cache), 2)
+
+    def test_sub_area_cache(self):
+        local_area_finder = self.path_planner.local_area_finder
+        local_area_finder.get_local_area.side_effect = lambda area_name, behaviour: \
+            SimpleNamespace(id=10 if behaviour == 'docking' else 11, ref='%s_%s' % (area_name, behaviour))
+
+        first = self.path_planner.get_sub_area('A1', behaviour='docking')
+        second = self.path_planner.get_sub_area('A1', behaviour='docking')
+        undocking = self.path_planner.get_sub_area('A1', behaviour='undocking')
+
+        self.assertEqual((first.id, second.id, undocking.id), (10, 10, 11))
+        self.assertEqual(local_area_finder.get_local_area.call_count, 2)
+        self.assertEqual(self.path_planner.get_sub_area_cache_stats()['hits'], 1)
+        # the cached sub-area is not modified through the returned copies
+        first.name = 'modified'
+        self.assertEqual(self.path_planner.get_sub_area('A1', behaviour='docking').name, 'A1_docking')
+
+        self.path_planner.reload_map(read_map=False)
+        self.path_planner.get_sub_area('A1', behaviour='docking')
+        self.assertEqual(local_area_finder.get_local_area.call_count, 3)
+
+    def test_sub_area_position(self):
+        local_area_finder = self.path_planner.local_area_finder
+        local_area_finder.get_local_area.return_value = SimpleNamespace(id=10, ref='LA10')
+        for _ in range(2):
+            self.path_planner.get_sub_area('A1', x=1.0, y=2.0)
+        # lookups by position are not cached
+        self.assertEqual(local_area_finder.get_local_area.call_count, 2)
+
+        local_area_finder.get_local_area.return_value = None
+        self.assertRaises(OSMPlannerException, self.path_planner.get_sub_area, 'A1', behaviour='charging')
+
+
+if __name__ == '__main__':
+    unittest.main()
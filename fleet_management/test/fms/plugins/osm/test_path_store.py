@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from fleet_management.plugins.osm.path_store import PathPlanStore
+
+
+class PathPlanStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'paths.db')
+        self.store = PathPlanStore(self.path, batch_size=100, flush_interval=60)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def count_rows(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_load(self):
+        self.store.put('map1', 'path', ('A1', 'A2'), ['A1', 'A2'])
+        self.store.put('map1', 'distance', ('A1', 'A2'), 12.5)
+        self.store.put('map2', 'path', ('A1', 'A3'), ['A1', 'A3'])
+
+        entries = self.store.load('map1')
+        self.assertEqual(entries, {'path': [(('A1', 'A2'), ['A1', 'A2'])], 'distance': [(('A1', 'A2'), 12.5)]})
+        # the entries of the other maps are discarded
+        self.assertEqual(self.store.load('map2'), dict())
+
+    def test_buffered_writes(self):
+        self.store.put('map1', 'path', ('A1', 'A2'), ['A1', 'A2'])
+        self.assertEqual(self.count_rows(), 0)
+
+        self.store.batch_size = 2
+        self.store.put('map1', 'path', ('A1', 'A3'), ['A1', 'A3'])
+        deadline = time.monotonic() + 5
+        while self.count_rows() < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count_rows(), 2)
+
+    def test_close(self):
+        self.store.put('map1', 'path', ('A1', 'A2'), ['A1', 'A2'])
+        self.store.close()
+
+        self.store = PathPlanStore(self.path)
+        self.assertEqual(self.store.load('map1'), {'path': [(('A1', 'A2'), ['A1', 'A2'])]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from fleet_management.exceptions.osm import OSMPlannerException, OSMSnapshotMiss
+from fleet_management.plugins.osm.snapshot import OSMSnapshot, SnapshotAdapter
+
+
+class FakeOSMAdapter(object):
+    def get(self, query):
+        raise AssertionError("The OBL adapter should not be queried")
+
+
+class FakeOSMBridge(object):
+    def __init__(self):
+        self.osm_adapter = FakeOSMAdapter()
+        self.queries = list()
+
+    def get_osm_json(self, query):
+        self.queries.append(query)
+        return {'elements': [{'type': 'node', 'id': len(self.queries), 'tags': {'ref': query}}]}
+
+    def parse_osm_json(self, response):
+        return json.loads(json.dumps(response['elements'])), [], []
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.bridge = FakeOSMBridge()
+        self.snapshot = OSMSnapshot('BRSU')
+
+    def test_record_and_replay(self):
+        SnapshotAdapter.install(self.bridge, self.snapshot, record=True)
+        result = self.bridge.osm_adapter.get('node(1);out;')
+        self.assertEqual(self.bridge.osm_adapter.get('node(1);out;'), result)
+        self.assertEqual(self.bridge.queries, ['node(1);out;'])
+        self.assertEqual(len(self.snapshot), 1)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'snapshot.json.gz')
+            self.snapshot.save(path)
+            with gzip.open(path, 'rt') as snapshot_file:
+                self.assertEqual(json.load(snapshot_file)['responses'], self.snapshot.responses)
+            loaded = OSMSnapshot.load(path)
+
+        bridge = FakeOSMBridge()
+        SnapshotAdapter.install(bridge, loaded)
+        replayed = bridge.osm_adapter.get('node(1);out;')
+        self.assertEqual(replayed, result)
+        # every query gets new elements, which OBL may modify
+        replayed[0][0]['tags']['ref'] = 'modified'
+        self.assertEqual(bridge.osm_adapter.get('node(1);out;'), result)
+        self.assertEqual(bridge.queries, [])
+
+    def test_miss(self):
+        SnapshotAdapter.install(self.bridge, self.snapshot)
+        with self.assertRaises(OSMSnapshotMiss) as context:
+            self.bridge.osm_adapter.get('node(2);out;')
+        # the request that needed the query fails like a request that cannot be planned
+        self.assertIsInstance(context.exception, OSMPlannerException)
+        self.assertEqual(self.bridge.queries, [])
+        self.assertEqual(len(self.snapshot), 0)
+
+    def test_fallback(self):
+        self.snapshot.put('node(1);out;', {'elements': []})
+        SnapshotAdapter.install(self.bridge, self.snapshot, record=True)
+        self.assertEqual(self.bridge.osm_adapter.get('node(1);out;'), ([], [], []))
+        nodes, _, _ = self.bridge.osm_adapter.get('node(2);out;')
+        self.assertEqual(nodes[0]['tags'], {'ref': 'node(2);out;'})
+        self.assertEqual(self.bridge.queries, ['node(2);out;'])
+        self.assertIn('node(2);out;', self.snapshot)
+
+    def test_version(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'snapshot.json.gz')
+            with gzip.open(path, 'wt') as snapshot_file:
+                json.dump({'version': 1, 'building': 'BRSU', 'created': None, 'responses': {}}, snapshot_file)
+            self.assertRaises(ValueError, OSMSnapshot.load, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
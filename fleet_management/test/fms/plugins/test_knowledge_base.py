@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from fleet_management.plugins import knowledge_base
+from fleet_management.plugins.knowledge_base import InMemoryKnowledgeBase
+
+
+class InMemoryKnowledgeBaseTest(unittest.TestCase):
+    def setUp(self):
+        self.kb = InMemoryKnowledgeBase('ropod_kb')
+
+    def test_facts(self):
+        self.kb.insert_facts([('robot_at', [('bot', 'ropod_001'), ('loc', 'AMK_D_L0_C1')]),
+                              ('empty_gripper', [('bot', 'ropod_001')])])
+        self.kb.insert_facts([('empty_gripper', [('bot', 'ropod_001')])])
+        self.assertEqual(self.kb.get_predicate_names(), ['empty_gripper', 'robot_at'])
+        self.assertEqual(len(self.kb.get_predicate_assertions()), 2)
+
+        self.kb.remove_facts([('robot_at', [('bot', 'ropod_001'), ('loc', 'AMK_D_L0_C1')])])
+        self.assertEqual(self.kb.get_predicate_assertions(), [('empty_gripper', [('bot', 'ropod_001')])])
+
+    def test_fluents(self):
+        self.kb.insert_fluents([('location_floor', [('loc', 'AMK_D_L0_C1')], 0)])
+        self.kb.insert_fluents([('location_floor', [('loc', 'AMK_D_L0_C1')], 1),
+                                ('robot_floor', [('bot', 'ropod_001')], 0)])
+        self.assertEqual(self.kb.get_fluent_names(), ['location_floor', 'robot_floor'])
+        self.assertIn(('location_floor', [('loc', 'AMK_D_L0_C1')], 1), self.kb.get_fluent_assertions())
+        self.assertEqual(len(self.kb.get_fluent_assertions()), 2)
+
+        self.kb.remove_fluents([('location_floor', [('loc', 'AMK_D_L0_C1')])])
+        self.assertEqual(self.kb.get_fluent_assertions(), [('robot_floor', [('bot', 'ropod_001')], 0)])
+
+    def test_persist(self):
+        with mock.patch.object(knowledge_base, 'KnowledgeBaseInterface') as kb_interface:
+            kb = InMemoryKnowledgeBase('ropod_kb', persist=True)
+        facts = [('empty_gripper', [('bot', 'ropod_001')])]
+        kb.insert_facts(facts)
+        kb_interface.return_value.insert_facts.assert_called_once_with(facts)
+        self.assertEqual(kb.get_predicate_assertions(), facts)
+        self.kb.insert_facts(facts)
+        kb_interface.assert_called_once_with('ropod_kb')
+
+
+if __name__ == '__main__':
+    unittest.main()
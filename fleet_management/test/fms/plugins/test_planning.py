@@ -0,0 +1,374 @@
+import copy
+import itertools
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fleet_management.exceptions.osm import OSMPlannerException
+from fleet_management.exceptions.planning import NoPlanFound
+from fleet_management.plugins import planning
+from fleet_management.plugins.knowledge_base import InMemoryKnowledgeBase
+
+
+class FakeSymbolicPlanner(object):
+    def __init__(self, kb_database_name, domain_file, planner_cmd, plan_file_path, **_):
+        self.kb_database_name = kb_database_name
+
+    def plan(self, task_request, time_budget=None):
+        task_id = getattr(task_request, 'id', None)
+        if task_id == 'crash':
+            os._exit(1)
+        time.sleep(1 if task_id == 'slow' else 0.05)
+        return self.kb_database_name, os.getpid()
+
+
+class PlannerWorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # the workers are forked, also when they are replaced, so that they inherit the fake planner
+        context = multiprocessing.get_context('fork')
+        for patch in (mock.patch.object(planning, 'SymbolicPlanner', FakeSymbolicPlanner),
+                      mock.patch.object(planning.multiprocessing, 'get_context', return_value=context)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.pool = planning.PlannerWorkerPool(2, 'kb', 'domain.pddl', 'planner', self.directory.name)
+        self.addCleanup(self.pool.shutdown)
+
+    def test_claim_worker_id(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, first_lock = planning._claim_worker_id(directory, 2)
+            second, second_lock = planning._claim_worker_id(directory, 2)
+            self.assertEqual((first, second), (0, 1))
+            self.assertEqual(planning._claim_worker_id(directory, 2)[0], 'pid_%s' % os.getpid())
+
+            first_lock.close()
+            third, third_lock = planning._claim_worker_id(directory, 2)
+            self.assertEqual(third, 0)
+            second_lock.close()
+            third_lock.close()
+
+    def test_restarted_worker(self):
+        workers = set(self.pool.plan_many(range(8)))
+        self.assertEqual({kb_database_name for kb_database_name, _ in workers}, {'kb_worker_0', 'kb_worker_1'})
+
+        # the request being planned by a worker that dies fails instead of blocking the caller
+        with self.assertRaises(NoPlanFound):
+            self.pool.plan(SimpleNamespace(id='crash'))
+
+        pids = {pid for _, pid in workers}
+        deadline = time.monotonic() + 10
+        restarted = set()
+        while not restarted and time.monotonic() < deadline:
+            restarted = {worker for worker in self.pool.plan_many(range(8)) if worker[1] not in pids}
+        # the new workers are initialised with the ids of the workers that died
+        self.assertTrue(restarted)
+        self.assertTrue({kb_database_name for kb_database_name, _ in restarted} <= {'kb_worker_0', 'kb_worker_1'})
+
+    def test_timeout(self):
+        self.pool.timeout_margin = 0.1
+        with self.assertRaises(NoPlanFound):
+            self.pool.plan(SimpleNamespace(id='slow'), time_budget=0.1)
+
+
+task_ids = itertools.count()
+
+
+def create_task_request(pickup_floor=0, delivery_floor=0, load_type='mobidik', pickup='C1', delivery='C2'):
+    return SimpleNamespace(id='task_%s' % next(task_ids), load_type=load_type,
+                           pickup_pose=SimpleNamespace(name='AMK_D_L%s_%s' % (pickup_floor, pickup),
+                                                       floor_number=pickup_floor),
+                           delivery_pose=SimpleNamespace(name='AMK_D_L%s_%s' % (delivery_floor, delivery),
+                                                         floor_number=delivery_floor))
+
+
+def create_actions(*action_types):
+    return [SimpleNamespace(id=action_type, type=action_type, areas=list()) for action_type in action_types]
+
+
+class PlanTemplatesTest(unittest.TestCase):
+    def setUp(self):
+        self.templates = planning.PlanTemplates(elevators={'elevator1': {'0': 'AMK_B_L0_C0', '4': 'AMK_B_L4_C0'}})
+
+    def test_same_floor(self):
+        plan = self.templates.get_plan(create_task_request())
+        self.assertEqual([action.type for action in plan], ['DOCK', 'GOTO', 'UNDOCK'])
+        self.assertEqual([area.name for area in plan[0].areas], ['AMK_D_L0_C1'])
+        self.assertEqual([(area.name, area.floor_number) for area in plan[1].areas], [('AMK_D_L0_C2', 0)])
+        self.assertEqual([(area.name, area.floor_number) for area in plan[2].areas], [('AMK_D_L0_C2', 0)])
+        self.assertIsNot(plan[1].areas[0], plan[2].areas[0])
+
+    def test_elevator(self):
+        plan = self.templates.get_plan(create_task_request(0, 4))
+        self.assertEqual([action.type for action in plan],
+                         ['DOCK', 'GOTO', 'REQUEST_ELEVATOR', 'WAIT_FOR_ELEVATOR', 'ENTER_ELEVATOR',
+                          'RIDE_ELEVATOR', 'EXIT_ELEVATOR', 'GOTO', 'UNDOCK'])
+        self.assertEqual([area.name for area in plan[1].areas], ['AMK_B_L0_C0'])
+        self.assertEqual((plan[2].start_floor, plan[2].goal_floor), (0, 4))
+        self.assertEqual([action.elevator_id for action in plan[3:7]], [1, 1, 1, 1])
+        self.assertEqual(plan[5].level, 4)
+        self.assertEqual([(area.name, area.floor_number) for area in plan[6].areas], [('AMK_B_L4_C0', 4)])
+        self.assertEqual(len({action.id for action in plan}), len(plan))
+
+    def test_not_covered(self):
+        # the task planner is called for the floors without an elevator area and the other load types
+        self.assertIsNone(self.templates.get_plan(create_task_request(0, 2)))
+        self.assertIsNone(self.templates.get_plan(create_task_request(load_type='sickbed')))
+
+    def test_knowledge_base_elevators(self):
+        kb = InMemoryKnowledgeBase('ropod_kb')
+        planning.initialize_knowledge_base(kb)
+        elevator_areas = {(params[0][1], params[1][1]) for name, params in kb.get_predicate_assertions()
+                          if name == 'elevator_at'}
+        floors = {params[0][1]: value for name, params, value in kb.get_fluent_assertions()
+                  if name == 'location_floor'}
+
+        plan = planning.PlanTemplates().get_plan(create_task_request(0, 2))
+        self.assertEqual([action.elevator_id for action in plan[3:7]], [0, 0, 0, 0])
+        for action, floor in ((plan[1], 0), (plan[6], 2)):
+            self.assertIn(('elevator0', action.areas[0].name), elevator_areas)
+            self.assertEqual(floors[action.areas[0].name], 'floor%s' % floor)
+
+    def test_planner_plan(self):
+        # the actions of the task planner for the same request, as parsed from its plan
+        request = create_task_request(0, 2, pickup='C1', delivery='C2')
+        planner_plan = [create_action('DOCK', areas=[create_area('AMK_D_L0_C1', 0)]),
+                        create_action('GOTO', areas=[create_area('BRSU_A_L0_A8', 0)]),
+                        create_action('REQUEST_ELEVATOR', start_floor=0, goal_floor=2),
+                        create_action('WAIT_FOR_ELEVATOR', elevator_id=0),
+                        create_action('ENTER_ELEVATOR', elevator_id=0),
+                        create_action('RIDE_ELEVATOR', elevator_id=0),
+                        create_action('EXIT_ELEVATOR', elevator_id=0, areas=[create_area('BRSU_A_L2_A1', 2)]),
+                        create_action('GOTO', areas=[create_area('AMK_D_L2_C2', 2)]),
+                        create_action('UNDOCK', areas=[create_area('AMK_D_L2_C2', 2)])]
+        template_plan = planning.PlanTemplates().get_plan(request)
+
+        with mock.patch.object(planning, 'SymbolicPlanner'):
+            planner = planning.TaskPlannerInterface('kb', 'domain.pddl', 'planner', 'plans')
+        path_planner = FakePathPlanner()
+        path_planner.delays = {'BRSU_A_L0_A8': 0, 'AMK_D_L2_C2': 0}
+        self.assertEqual([describe_action(action) for action in planner._plan_paths(template_plan, path_planner)],
+                         [describe_action(action) for action in planner._plan_paths(planner_plan, path_planner)])
+
+
+def create_action(action_type, areas=None, **attributes):
+    return SimpleNamespace(id=action_type, type=action_type, areas=areas or list(), **attributes)
+
+
+def create_area(name, floor_number):
+    return SimpleNamespace(name=name, floor_number=floor_number)
+
+
+def describe_action(action):
+    attributes = {name: value for name, value in vars(action).items() if name not in ('id', 'areas')}
+    return attributes, [(area.name, area.floor_number) for area in action.areas]
+
+
+class PlannerCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.planner = planning.SymbolicPlanner.__new__(planning.SymbolicPlanner)
+        self.planner.planner_cmd = 'fast-downward.py --plan-file PLAN-FILE --search-time-limit 10 ' \
+                                   '--alias seq-sat-lama-2011 DOMAIN PROBLEM'
+
+    def test_budget(self):
+        self.assertEqual(self.planner.get_planner_cmd(3.2), 'fast-downward.py --plan-file PLAN-FILE '
+                                                            '--search-time-limit 4 --alias lama-first DOMAIN PROBLEM')
+        self.assertIn('--search-time-limit 1 ', self.planner.get_planner_cmd(0.1))
+
+    def test_no_budget(self):
+        # the configured command is kept if the budget is not shorter than its time limit
+        self.assertEqual(self.planner.get_planner_cmd(None), self.planner.planner_cmd)
+        self.assertEqual(self.planner.get_planner_cmd(10), self.planner.planner_cmd)
+        self.planner.planner_cmd = 'fast-downward.py --alias seq-sat-lama-2011 DOMAIN PROBLEM'
+        self.assertEqual(self.planner.get_planner_cmd(3), self.planner.planner_cmd)
+
+
+class TaskPlannerInterfaceTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(planning, 'SymbolicPlanner'):
+            self.planner = planning.TaskPlannerInterface('kb', 'domain.pddl', 'planner', 'plans',
+                                                         plan_templates={'load_types': ['mobidik']})
+        self.symbolic_planner = self.planner.symbolic_planner
+        self.path_planner = SimpleNamespace(map_version=1)
+
+        # the requests are given as TaskRequest structs, and the plans are returned as lists of actions
+        # with the paths that were planned for them
+        for name, side_effect in (('_to_task_request', lambda request, *args: request),
+                                  ('_to_task_plan', lambda plan: plan),
+                                  ('_plan_paths', lambda actions_, path_planner: copy.deepcopy(actions_))):
+            patch = mock.patch.object(self.planner, name, side_effect=side_effect)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_plan_cache_key(self):
+        self.symbolic_planner.plan.side_effect = lambda *args: create_actions('GOTO', 'DOCK')
+        requests = [create_task_request(load_type='sickbed'),
+                    create_task_request(load_type='sickbed', delivery='C3'),
+                    create_task_request(load_type='sickbed', pickup_floor=1),
+                    create_task_request(load_type='sickbed', delivery_floor=1),
+                    create_task_request(load_type='mobidik_2')]
+        self.planner.plan_templates = None
+        for request in requests:
+            self.planner.plan(request, self.path_planner)
+        self.assertEqual(self.symbolic_planner.plan.call_count, len(requests))
+
+        for request in requests:
+            self.planner.plan(copy.deepcopy(request), self.path_planner)
+        self.assertEqual(self.symbolic_planner.plan.call_count, len(requests))
+
+    def test_plan_cache_copies(self):
+        self.symbolic_planner.plan.return_value = create_actions('GOTO', 'DOCK')
+        first = self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+        second = self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+
+        self.assertEqual(self.symbolic_planner.plan.call_count, 1)
+        self.assertEqual([action.type for action in second], ['GOTO', 'DOCK'])
+        self.assertNotEqual([action.id for action in first], [action.id for action in second])
+
+    def test_plan_cache_invalidation(self):
+        self.symbolic_planner.plan.side_effect = lambda *args: create_actions('GOTO', 'DOCK')
+        with tempfile.TemporaryDirectory() as directory:
+            self.planner.domain_file = os.path.join(directory, 'domain.pddl')
+            with open(self.planner.domain_file, 'w') as domain_file:
+                domain_file.write('(define (domain ropod))')
+            self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+            self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+            self.assertEqual(self.symbolic_planner.plan.call_count, 1)
+
+            # the map changed
+            self.path_planner.map_version += 1
+            self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+            self.assertEqual(self.symbolic_planner.plan.call_count, 2)
+
+            # the planning domain changed
+            os.utime(self.planner.domain_file, (0, 0))
+            self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+            self.planner.plan(create_task_request(load_type='sickbed'), self.path_planner)
+            self.assertEqual(self.symbolic_planner.plan.call_count, 3)
+
+    def test_plan_batch(self):
+        sickbed = create_task_request(load_type='sickbed')
+        no_plan = create_task_request(load_type='sickbed', delivery='C3')
+        mobidik = create_task_request()
+        self.symbolic_planner.plan_many.return_value = [create_actions('GOTO', 'DOCK'), NoPlanFound(no_plan.id)]
+
+        plans = self.planner.plan_batch([sickbed, no_plan, mobidik, copy.deepcopy(sickbed)], self.path_planner)
+
+        # the task planner is called once for each distinct request that no template covers
+        self.symbolic_planner.plan_many.assert_called_once_with([sickbed, no_plan])
+        self.assertEqual(len(plans), 4)
+        self.assertEqual([action.type for action in plans[0]], ['GOTO', 'DOCK'])
+        self.assertIsNone(plans[1])
+        self.assertEqual([action.type for action in plans[2]], ['DOCK', 'GOTO', 'UNDOCK'])
+        # requests with the same plan get their own copy
+        self.assertEqual([action.type for action in plans[3]], ['GOTO', 'DOCK'])
+        self.assertNotEqual([action.id for action in plans[0]], [action.id for action in plans[3]])
+
+    def test_plan_batch_cached(self):
+        sickbed = create_task_request(load_type='sickbed')
+        self.symbolic_planner.plan_many.return_value = [create_actions('GOTO', 'DOCK')]
+        self.planner.plan_batch([sickbed], self.path_planner)
+
+        self.symbolic_planner.plan_many.return_value = list()
+        plans = self.planner.plan_batch([create_task_request(load_type='sickbed')], self.path_planner)
+        self.symbolic_planner.plan_many.assert_called_with([])
+        self.assertEqual([action.type for action in plans[0]], ['GOTO', 'DOCK'])
+
+    def test_plan_batch_errors(self):
+        unreadable = SimpleNamespace(request_id='unreadable')
+        sickbed = create_task_request(load_type='sickbed')
+        no_path = create_task_request(delivery='C3')
+        mobidik = create_task_request()
+        self.symbolic_planner.plan_many.return_value = [create_actions('GOTO', 'DOCK')]
+
+        def to_task_request(request, *args):
+            if request is unreadable:
+                raise ValueError(request.request_id)
+            return request
+
+        def plan_paths(actions_, path_planner):
+            if no_path.delivery_pose.name in [area.name for action in actions_ for area in action.areas]:
+                raise KeyError(no_path.delivery_pose.name)
+            return copy.deepcopy(actions_)
+
+        self.planner._to_task_request.side_effect = to_task_request
+        self.planner._plan_paths.side_effect = plan_paths
+        plans = self.planner.plan_batch([unreadable, sickbed, no_path, mobidik], self.path_planner)
+
+        # the requests that fail do not fail the rest of the batch
+        self.assertEqual(len(plans), 4)
+        self.assertIsNone(plans[0])
+        self.assertEqual([action.type for action in plans[1]], ['GOTO', 'DOCK'])
+        self.assertIsNone(plans[2])
+        self.assertEqual([action.type for action in plans[3]], ['DOCK', 'GOTO', 'UNDOCK'])
+
+
+class BatchPathPlannerTest(unittest.TestCase):
+    def test_copies(self):
+        path_planner = mock.Mock()
+        path_planner.get_sub_area.return_value = SimpleNamespace(name='C1_LA1')
+        path_planner.get_path_plan.return_value = [SimpleNamespace(name='C1', sub_areas=[SimpleNamespace(name='LA1')])]
+        batch_path_planner = planning._BatchPathPlanner(path_planner)
+
+        first = batch_path_planner.get_path_plan(0, 0, 'C1', 'C2')
+        first[0].sub_areas.append(SimpleNamespace(name='LA2'))
+        first[0].name = 'modified'
+        second = batch_path_planner.get_path_plan(0, 0, 'C1', 'C2')
+        self.assertEqual(path_planner.get_path_plan.call_count, 1)
+        self.assertEqual(second[0].name, 'C1')
+        self.assertEqual([sub_area.name for sub_area in second[0].sub_areas], ['LA1'])
+
+        batch_path_planner.get_sub_area('C1', behaviour='docking').name = 'modified'
+        self.assertEqual(batch_path_planner.get_sub_area('C1', behaviour='docking').name, 'C1_LA1')
+        self.assertEqual(path_planner.get_sub_area.call_count, 1)
+
+
+class FakePathPlanner(object):
+    def __init__(self):
+        self.delays = {'AMK_B_L0_C0': 0.1, 'AMK_D_L4_C2': 0}
+
+    def get_sub_area(self, ref, behaviour=None):
+        return SimpleNamespace(name='%s_%s' % (ref, behaviour))
+
+    @staticmethod
+    def task_to_behaviour(action_type):
+        return action_type.lower()
+
+    def get_path_plan(self, start_floor, destination_floor, start_area, destination_area, **kwargs):
+        if destination_area not in self.delays:
+            raise ValueError(destination_area)
+        # the first path is planned last
+        time.sleep(self.delays[destination_area])
+        return [SimpleNamespace(name=start_area, floor_number=start_floor, sub_areas=list()),
+                SimpleNamespace(name=destination_area, floor_number=destination_floor, sub_areas=list())]
+
+
+class PlanPathsTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(planning, 'SymbolicPlanner'):
+            self.planner = planning.TaskPlannerInterface('kb', 'domain.pddl', 'planner', 'plans')
+        self.plan = planning.PlanTemplates({'elevator0': {0: 'AMK_B_L0_C0', 4: 'AMK_B_L4_C0'}}).get_plan(
+            create_task_request(0, 4, pickup='C1', delivery='C2'))
+
+    def test_plan_paths(self):
+        plan = self.planner._plan_paths(self.plan, FakePathPlanner())
+
+        self.assertEqual([action.type for action in plan],
+                         ['DOCK', 'GOTO', 'REQUEST_ELEVATOR', 'WAIT_FOR_ELEVATOR', 'ENTER_ELEVATOR',
+                          'RIDE_ELEVATOR', 'EXIT_ELEVATOR', 'GOTO', 'UNDOCK'])
+        self.assertEqual([area.name for area in plan[1].areas], ['AMK_D_L0_C1', 'AMK_B_L0_C0'])
+        self.assertEqual([area.name for area in plan[7].areas], ['AMK_B_L4_C0', 'AMK_D_L4_C2'])
+        self.assertEqual(plan[5].level, 4)
+
+    def test_path_planner_error(self):
+        path_planner = FakePathPlanner()
+        del path_planner.delays['AMK_D_L4_C2']
+        self.assertRaises(OSMPlannerException, self.planner._plan_paths, self.plan, path_planner)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+from fleet_management.resources.infrastructure.duration_estimator import DurationEstimator
+
+
+class DurationEstimatorTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = DurationGraph()
+        self.graph.add_edge(1, 2, mean=5, variance=1, n_runs=4)
+        self.graph.add_edge(2, 3, mean=7, variance=2, n_runs=0)
+        self.graph.compile()
+        self.estimator = DurationEstimator(self.graph, min_samples=2)
+
+    def test_welford(self):
+        samples = [3., 4.5, 8., 6.]
+        for duration in samples:
+            self.estimator.add_sample(3, 2, duration)
+        mean, variance, n_samples = self.estimator.get_estimate(2, 3)
+        self.assertEqual(n_samples, 4)
+        self.assertAlmostEqual(mean, np.mean(samples))
+        self.assertAlmostEqual(variance, np.var(samples))
+
+    def test_prior(self):
+        self.estimator.add_sample(1, 2, 10)
+        mean, variance, n_samples = self.estimator.get_estimate(1, 2)
+        self.assertEqual(n_samples, 5)
+        self.assertAlmostEqual(mean, 6)
+        self.assertAlmostEqual(variance, 4.8)
+
+    def test_prior_weight(self):
+        self.graph.update_edges([(1, 2, {'n_runs': 10000})])
+        estimator = DurationEstimator(self.graph, prior_weight=10)
+        for _ in range(90):
+            estimator.add_sample(1, 2, 15)
+        # the topology counts as 10 samples, not 10000
+        mean, _, n_samples = estimator.get_estimate(1, 2)
+        self.assertEqual(n_samples, 100)
+        self.assertAlmostEqual(mean, 14)
+
+    def test_position_updates(self):
+        self.estimator.update_position('ropod_001', 1, timestamp=0)
+        self.estimator.update_position('ropod_001', 2, timestamp=10)
+        self.assertIsNone(self.estimator.get_estimate(1, 2))
+
+        self.estimator.update_task_progress('ropod_001', 'GOTO', None, timestamp=20)
+        self.estimator.update_position('ropod_001', 2, timestamp=21)
+        self.estimator.update_position('ropod_001', 3, timestamp=25)
+        self.estimator.update_position('ropod_001', 2, timestamp=500)
+        self.assertEqual(self.estimator.get_estimate(2, 3), (5., 0., 1))
+
+    def test_write_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.graph.learned_durations = os.path.join(directory, 'learned_durations.json')
+            self.estimator.add_sample(2, 3, 4)
+            self.estimator.add_sample(3, 4, 1)
+            self.estimator.write_back()
+            self.assertFalse(self.graph.has_edge(3, 4))
+            self.assertEqual(self.graph.get_path_duration([]), (0, 0))
+            self.assertEqual(self.graph._get_edges_duration([1, 2, 3]), (9, 1))
+
+            self.estimator.add_sample(3, 4, 3)
+            self.estimator.write_back()
+            self.assertEqual(self.graph._get_edges_duration([2, 3, 4]), (6, 1))
+
+            edges, _, _ = DurationGraph.load_learned_durations(self.graph.learned_durations)
+            self.assertEqual(sorted((u, v, data['n_runs']) for u, v, data in edges), [(2, 3, 1), (3, 4, 2)])
+
+    def test_elevator(self):
+        for query_id, (waited, rode) in enumerate([(100, 50), (120, 70)]):
+            self.estimator.elevator_called(query_id, 0, 2, timestamp=0)
+            self.estimator.elevator_entered(query_id, timestamp=waited)
+            self.estimator.elevator_exited(query_id, timestamp=waited + rode)
+
+        self.assertEqual(self.estimator.get_action_estimate('WAIT_FOR_ELEVATOR', 0, 2), (90, 100, 2))
+        self.assertEqual(self.estimator.get_action_estimate('RIDE_ELEVATOR', 0, 2), (45, 100, 2))
+        self.assertIsNone(self.estimator.get_action_estimate('RIDE_ELEVATOR', 2, 0))
+
+        self.estimator.write_back()
+        self.assertEqual(self.graph.get_action_cost('RIDE_ELEVATOR', 0, 2), (45, 100))
+        # the floors that have not been observed get the mean over the observed floors
+        self.assertEqual(self.graph.get_action_cost('RIDE_ELEVATOR', 2, 0), (45, 100))
+
+    def test_elevator_events(self):
+        for query_id, offset in enumerate([0, 2]):
+            self.estimator.elevator_called(query_id, 0, 2, timestamp=0)
+            self.estimator.elevator_call_accepted(query_id, timestamp=1 + offset)
+            self.estimator.elevator_at_start_floor(query_id, timestamp=31 + offset)
+            # the elevator is reported at the start floor until the robot entered
+            self.estimator.elevator_at_start_floor(query_id, timestamp=35 + offset)
+            self.estimator.elevator_entered(query_id, timestamp=41 + offset)
+            self.estimator.elevator_at_goal_floor(query_id, timestamp=61 + offset)
+            self.estimator.elevator_exited(query_id, timestamp=69 + 2 * offset)
+
+        self.assertEqual(self.estimator.get_action_estimate('REQUEST_ELEVATOR'), (2, 1, 2))
+        self.assertEqual(self.estimator.get_action_estimate('WAIT_FOR_ELEVATOR', 0, 2), (30, 0, 2))
+        self.assertEqual(self.estimator.get_action_estimate('ENTER_ELEVATOR'), (10, 0, 2))
+        self.assertEqual(self.estimator.get_action_estimate('RIDE_ELEVATOR', 0, 2), (20, 0, 2))
+        self.assertEqual(self.estimator.get_action_estimate('EXIT_ELEVATOR'), (9, 1, 2))
+        # events after the trip finished are ignored
+        self.estimator.elevator_at_goal_floor(1, timestamp=100)
+        self.assertEqual(self.estimator.get_action_estimate('RIDE_ELEVATOR', 0, 2), (20, 0, 2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.graph.learned_durations = os.path.join(directory, 'learned_durations.json')
+            self.estimator.write_back()
+            self.assertEqual(self.graph.get_action_cost('ENTER_ELEVATOR'), (10, 0))
+            self.assertEqual(self.graph.get_action_cost('EXIT_ELEVATOR'), (9, 1))
+            _, floor_pair_costs, action_costs = DurationGraph.load_learned_durations(self.graph.learned_durations)
+        self.assertEqual(sorted(row[0] for row in floor_pair_costs), ['RIDE_ELEVATOR', 'WAIT_FOR_ELEVATOR'])
+        self.assertEqual(sorted(row[0] for row in action_costs),
+                         ['ENTER_ELEVATOR', 'EXIT_ELEVATOR', 'REQUEST_ELEVATOR'])
+
+    def test_elevator_query_expiry(self):
+        self.estimator.elevator_query_ttl = 60
+        self.estimator.elevator_called('lost', 0, 2, timestamp=0)
+        self.estimator.elevator_called('found', 0, 2, timestamp=100)
+        self.assertEqual(list(self.estimator._elevator_queries), ['found'])
+        self.estimator.elevator_entered('lost', timestamp=110)
+        self.assertIsNone(self.estimator.get_action_estimate('WAIT_FOR_ELEVATOR', 0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fleet_management.resources.infrastructure.brsu import DurationGraph
+
+
+def create_plan(*actions):
+    plan_actions = list()
+    for action in actions:
+        if isinstance(action, str):
+            plan_actions.append(SimpleNamespace(type=action))
+        elif isinstance(action, SimpleNamespace):
+            plan_actions.append(action)
+        else:
+            areas = [SimpleNamespace(type='corridor', id=None, subareas=[SimpleNamespace(id=i) for i in action])]
+            plan_actions.append(SimpleNamespace(type='GOTO', areas=areas))
+    return SimpleNamespace(actions=plan_actions)
+
+
+class DurationGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = DurationGraph()
+        self.graph.add_edge(1, 2, mean=5, variance=1)
+        self.graph.add_edge(2, 3, mean=7, variance=2)
+        self.graph.add_edge(3, 4, mean=1, variance=0.5)
+        self.graph.compile()
+
+    def test_get_duration(self):
+        self.assertEqual(self.graph.get_duration(create_plan('DOCK', [1, 2, 3], 'UNDOCK')), (82, 3))
+        self.assertEqual(self.graph.get_duration(create_plan([3, 2], [9, 4])), (7, 2))
+
+    def test_get_duration_elevator(self):
+        self.graph.graph['action_costs'] = {'ENTER_ELEVATOR': [10, 1], 'EXIT_ELEVATOR': [10, 1]}
+        self.graph.update_floor_pair_costs([['WAIT_FOR_ELEVATOR', 0, 2, 100, 16, 5],
+                                            ['RIDE_ELEVATOR', 0, 2, 40, 9, 5]])
+        request = SimpleNamespace(type='REQUEST_ELEVATOR', start_floor=0, goal_floor=2)
+        plan = create_plan([1, 2], request, 'WAIT_FOR_ELEVATOR', 'ENTER_ELEVATOR', 'RIDE_ELEVATOR',
+                           'EXIT_ELEVATOR', [4, 3])
+        self.assertEqual(self.graph.get_duration(plan), (5 + 5 + 100 + 10 + 40 + 10 + 1, 1 + 4 + 16 + 1 + 9 + 1 + 0.5))
+
+        request.goal_floor = 1
+        mean, variance = self.graph.get_duration_many([plan])
+        self.assertEqual(mean[0], 5 + 5 + 100 + 10 + 40 + 10 + 1)
+
+    def test_observed_action_costs(self):
+        self.assertEqual(self.graph.get_action_cost('RIDE_ELEVATOR', 0, 1),
+                         DurationGraph.elevator_action_costs['RIDE_ELEVATOR'])
+        self.graph.update_floor_pair_costs([['RIDE_ELEVATOR', 0, 2, 40, 9, 1], ['RIDE_ELEVATOR', 2, 0, 20, 1, 3]])
+        self.assertEqual(self.graph.get_action_cost('RIDE_ELEVATOR', 0, 1), (25, (9 + 225 + 3 * (1 + 25)) / 4))
+        self.assertEqual(self.graph.get_action_cost('WAIT_FOR_ELEVATOR', 0, 1),
+                         DurationGraph.elevator_action_costs['WAIT_FOR_ELEVATOR'])
+
+    def test_get_duration_many(self):
+        plans = [create_plan('DOCK', [1, 2, 3], 'UNDOCK'), create_plan([3, 2], [9, 4]), create_plan([4, 3, 2, 1])]
+        mean, variance = self.graph.get_duration_many(plans)
+        self.assertEqual(list(mean), [82, 7, 13])
+        self.assertEqual(list(variance), [3, 2, 3.5])
+        self.assertEqual(len(self.graph.get_duration_many([])[0]), 0)
+
+    def test_compiled_topology(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'topology.yaml')
+            with open(source, 'w') as topology:
+                topology.write('nodes: []')
+            compiled = os.path.join(directory, 'compiled')
+
+            self.graph.add_node(1, pose=[1.5, 2, 0], name='start')
+            self.graph.edges[1, 2].update(name='1_to_2', n_runs=125)
+            self.graph.update_floor_pair_costs([['RIDE_ELEVATOR', 0, 2, 40, 9, 5]])
+            self.graph.save_compiled(compiled, source)
+            graph = DurationGraph.load_compiled(compiled, source)
+
+            # the durations are answered by the compiled arrays, without building the networkx view
+            self.assertEqual(graph.get_action_cost('RIDE_ELEVATOR', 0, 2), (40, 9))
+            self.assertEqual(graph.get_duration(create_plan('DOCK', [1, 2, 3], 'UNDOCK')), (82, 3))
+            self.assertTrue(graph.has_edge(2, 1))
+            self.assertFalse(graph.has_edge(1, 3))
+            self.assertEqual(graph.get_edge_data(2, 1), {'mean': 5, 'variance': 1, 'n_runs': 125})
+            self.assertIn('_compiled_view', graph.__dict__)
+
+            self.assertEqual(sorted(graph.edges), sorted(self.graph.edges))
+            self.assertNotIn('_compiled_view', graph.__dict__)
+            self.assertEqual(graph.nodes[1], {'pose': [1.5, 2, 0], 'name': 'start'})
+            self.assertEqual(graph.nodes[4], dict())
+            self.assertEqual(graph.edges[1, 2], self.graph.edges[1, 2])
+            self.assertTrue(all(isinstance(node_id, int) for node_id in graph.nodes))
+
+            with open(source, 'w') as topology:
+                topology.write('nodes: [1]')
+            self.assertIsNone(DurationGraph.load_compiled(compiled, source))
+
+    def test_compiled_learned_durations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'topology.yaml')
+            with open(source, 'w') as topology:
+                topology.write('{nodes: [{id: 1}, {id: 2}], links: [{source: 1, target: 2, mean: 5, variance: 1}]}')
+            compiled = os.path.join(directory, 'compiled')
+            learned = os.path.join(directory, 'learned.json')
+            DurationGraph.save_learned_durations(learned, [(1, 2, {'mean': 4, 'variance': 1})],
+                                                 [['RIDE_ELEVATOR', 0, 2, 40, 9, 5]])
+
+            with mock.patch('fleet_management.resources.infrastructure.brsu.load_file_from_module',
+                            return_value=source):
+                DurationGraph.load_graph(compiled_topology=compiled)
+                graph = DurationGraph.load_graph(compiled_topology=compiled, learned_durations=learned)
+            self.assertEqual(graph.get_edge_data(1, 2)['mean'], 4)
+            self.assertEqual(graph.edges[1, 2]['mean'], 4)
+            self.assertEqual(graph.get_action_cost('RIDE_ELEVATOR', 0, 2), (40, 9))
+
+            # the learned durations are only kept in their own file
+            graph = DurationGraph.load_compiled(compiled, source)
+            self.assertEqual(graph.edges[1, 2]['mean'], 5)
+            self.assertEqual(graph.get_action_cost('RIDE_ELEVATOR', 0, 2),
+                             DurationGraph.elevator_action_costs['RIDE_ELEVATOR'])
+
+    def test_update_edges(self):
+        csr = self.graph.get_csr()
+        self.graph.update_edges([(2, 1, {'mean': 3, 'variance': 2})])
+        # the compiled graph is replaced, not modified, while other threads may be reading it
+        self.assertEqual(csr.mean.tolist(), [5, 7, 1])
+        self.assertEqual(self.graph.get_duration(create_plan([1, 2, 3])), (10, 4))
+        self.assertEqual(self.graph.edges[1, 2]['mean'], 3)
+
+        self.graph.update_edges([(4, 5, {'mean': 2, 'variance': 1})])
+        self.assertEqual(self.graph.get_duration(create_plan([3, 4, 5])), (3, 1.5))
+
+
+class CSRDurationGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = DurationGraph()
+        for node_id, pose in [(1, [0, 0, 0]), (2, [10, 0, 0]), (3, [10, 10, 0]), (4, [0, 10, 0]), (5, [50, 50, 0])]:
+            self.graph.add_node(node_id, pose=pose)
+        self.graph.add_edge(1, 2, mean=5, variance=1)
+        self.graph.add_edge(2, 3, mean=5, variance=1)
+        self.graph.add_edge(1, 4, mean=20, variance=2)
+        self.graph.add_edge(4, 3, mean=1, variance=1)
+        self.csr = self.graph.to_csr()
+
+    def test_shortest_path(self):
+        self.assertEqual(self.csr.shortest_path(1, 3), [1, 2, 3])
+        self.assertEqual(self.csr.shortest_path(4, 2), [4, 3, 2])
+        self.assertEqual(self.csr.shortest_path(1, 1), [1])
+
+    def test_no_path(self):
+        self.assertIsNone(self.csr.shortest_path(1, 5))
+        self.assertIsNone(self.csr.shortest_path(1, 6))
+
+    def test_shortest_expected_duration(self):
+        self.assertEqual(self.graph.shortest_expected_duration(1, 3), (10, 2, [1, 2, 3]))
+        self.assertEqual(self.graph.shortest_expected_duration(4, 1), (11, 3, [4, 3, 2, 1]))
+        self.assertIsNone(self.graph.shortest_expected_duration(1, 5))
+        self.assertIsNone(self.graph.shortest_expected_duration(6, 1))
+
+        self.graph.update_edges([(1, 4, {'mean': 2, 'variance': 1})])
+        self.assertEqual(self.graph.shortest_expected_duration(1, 3), (3, 2, [1, 4, 3]))
+
+    def test_shortest_expected_durations(self):
+        paths = self.graph.shortest_expected_durations(2)
+        self.assertEqual(paths, {1: (5, 1, [2, 1]), 2: (0, 0, [2]), 3: (5, 1, [2, 3]), 4: (6, 2, [2, 3, 4])})
+        self.assertEqual(self.graph.shortest_expected_durations(6), dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
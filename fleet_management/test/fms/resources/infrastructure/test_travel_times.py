@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from fleet_management.resources.infrastructure.travel_times import TravelTimeMatrix
+
+
+class TravelTimeMatrixTest(unittest.TestCase):
+    def setUp(self):
+        mean = np.array([[0., 10., np.nan],
+                         [12., 0., 30.],
+                         [20., 40., 0.]])
+        self.matrix = TravelTimeMatrix(['A', 'B', 'C'], mean, mean / 10, building='BRSU')
+
+    def test_get_duration(self):
+        self.assertEqual(self.matrix.get_duration('B', 'C'), (30., 3.))
+        self.assertIsNone(self.matrix.get_duration('A', 'C'))
+        self.assertIsNone(self.matrix.get_duration('A', 'D'))
+        self.assertEqual(self.matrix.get_mean_duration_to('A'), 16.)
+
+    def test_get_durations(self):
+        mean, variance = self.matrix.get_durations([('A', 'B'), ('A', 'C'), ('C', 'D'), ('C', 'A')])
+        np.testing.assert_array_equal(mean, [10., np.nan, np.nan, 20.])
+        np.testing.assert_array_equal(variance, [1., np.nan, np.nan, 2.])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'travel_times.npz')
+            self.matrix.save(path)
+            matrix = TravelTimeMatrix.load_matrix(path)
+        self.assertEqual(matrix.locations, ['A', 'B', 'C'])
+        self.assertEqual(matrix.building, 'BRSU')
+        self.assertEqual(matrix.get_duration('C', 'B'), (40., 4.))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fleet_management.task.manager import TaskManager
+
+
+def create_task(seconds_to_pickup, pickup_location='AMK_D_L0_C1'):
+    latest_pickup_time = datetime.datetime.now() + datetime.timedelta(seconds=seconds_to_pickup)
+    return SimpleNamespace(task_id='task_1', request=SimpleNamespace(latest_pickup_time=latest_pickup_time,
+                                                                     pickup_location=pickup_location))
+
+
+class PlanningBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.resource_manager = mock.Mock()
+        self.resource_manager.get_allocation_backlog.return_value = 0
+        self.task_manager = TaskManager(None, None, resource_manager=self.resource_manager,
+                                        planning_budget={'fraction': 0.1, 'min': 1, 'max': 10,
+                                                         'expected_travel_time': 100, 'allocation_time': 20})
+        self.task_manager.path_planner = SimpleNamespace(location_index=None)
+
+    def test_budget(self):
+        # a tenth of the time left after the travel time
+        self.assertAlmostEqual(self.task_manager._get_planning_budget(create_task(150)), 5, places=1)
+        self.assertEqual(self.task_manager._get_planning_budget(create_task(1000)), 10)
+        self.assertEqual(self.task_manager._get_planning_budget(create_task(-60)), 1)
+
+    def test_backlog(self):
+        self.resource_manager.get_allocation_backlog.return_value = 2
+        self.assertAlmostEqual(self.task_manager._get_planning_budget(create_task(150)), 1, places=1)
+
+    def test_no_budget(self):
+        self.task_manager.planning_budget = None
+        self.assertIsNone(self.task_manager._get_planning_budget(create_task(150)))
+
+    def test_expected_travel_time(self):
+        location_index = mock.Mock()
+        location_index.get_sub_areas.return_value = [SimpleNamespace(id=10, name='LA10'),
+                                                     SimpleNamespace(id=11, name='LA11'),
+                                                     SimpleNamespace(id=12, name='LA12')]
+        location_index.get_behaviour_sub_areas.return_value = [('AMK_D_L0_C2', 0, 'undocking',
+                                                                SimpleNamespace(id=20))]
+        self.task_manager.path_planner = SimpleNamespace(location_index=location_index, map_version=1)
+        self.task_manager.travel_time_matrix = mock.Mock()
+        self.task_manager.travel_time_matrix.get_mean_duration_to.side_effect = {'LA10': 30, 'LA11': None,
+                                                                                 'LA12': 60}.get
+        self.task_manager.duration_graph = mock.Mock()
+        self.task_manager.duration_graph.shortest_expected_durations.return_value = {20: (90, 4, [11, 20])}
+
+        # the travel times to all the docking sub-areas are averaged
+        task = create_task(150)
+        self.assertEqual(self.task_manager._get_expected_travel_time(task), 60)
+        self.assertEqual(self.task_manager._get_expected_travel_time(task), 60)
+        self.task_manager.duration_graph.shortest_expected_durations.assert_called_once_with(11)
+        location_index.get_sub_areas.assert_called_once_with('AMK_D_L0_C1', 'docking')
+
+        self.task_manager.path_planner.map_version = 2
+        self.task_manager._get_expected_travel_time(task)
+        self.assertEqual(location_index.get_sub_areas.call_count, 2)
+
+    def test_default_travel_time(self):
+        location_index = mock.Mock()
+        location_index.get_sub_areas.return_value = list()
+        self.task_manager.path_planner = SimpleNamespace(location_index=location_index)
+        self.assertEqual(self.task_manager._get_expected_travel_time(create_task(150)), 100)
+
+
+class RequestLocationTest(unittest.TestCase):
+    def setUp(self):
+        self.task_manager = TaskManager(None, None)
+        self.task_manager.path_planner = mock.Mock()
+
+    def test_location_index(self):
+        location_index = self.task_manager.path_planner.location_index
+        location_index.has_sub_area.side_effect = lambda ref, behaviour: (ref, behaviour) == ('AMK_D_L0_C1', 'docking')
+
+        self.assertTrue(self.task_manager._is_valid_request_location('AMK_D_L0_C1', behaviour='docking'))
+        self.assertFalse(self.task_manager._is_valid_request_location('AMK_D_L0_C1', behaviour='undocking'))
+        # OSM is not queried when the index is available
+        self.task_manager.path_planner.get_sub_area.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
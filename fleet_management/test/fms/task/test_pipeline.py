@@ -0,0 +1,59 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from fleet_management.task.pipeline import PlanningPipeline
+
+
+class PlanningPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.done = threading.Semaphore(0)
+        self.pipeline = PlanningPipeline(self.process, workers=1, max_queue_size=2, enqueue_timeout=0.01,
+                                         on_done=self.done.release)
+
+    def tearDown(self):
+        self.release.set()
+
+    def process(self, task):
+        self.release.wait()
+        if task.task_id == 'fail':
+            raise ValueError(task.task_id)
+        return task.task_id != 'no plan'
+
+    def wait_done(self, n_tasks):
+        for _ in range(n_tasks):
+            self.assertTrue(self.done.acquire(timeout=5))
+
+    def test_backpressure(self):
+        tasks = [SimpleNamespace(task_id=i) for i in range(4)]
+        # nothing is planned until the pipeline is started, so the third task does not fit in the queue
+        self.assertEqual([self.pipeline.submit(task) for task in tasks[:3]], [True, True, False])
+        self.assertEqual(self.pipeline.depth, 2)
+
+        self.pipeline.start()
+        self.release.set()
+        self.wait_done(2)
+        self.assertTrue(self.pipeline.submit(tasks[3]))
+        self.wait_done(1)
+
+        self.assertEqual(self.pipeline.get_results(), [tasks[0], tasks[1], tasks[3]])
+        self.assertEqual(self.pipeline.get_results(), [])
+        metrics = self.pipeline.metrics()
+        self.assertEqual(metrics['depth'], 0)
+        self.assertEqual(metrics['max_depth'], 2)
+        self.assertEqual((metrics['submitted'], metrics['rejected'], metrics['completed']), (3, 1, 3))
+
+    def test_failed_tasks(self):
+        self.pipeline.start()
+        self.release.set()
+        for task_id in ('no plan', 'fail'):
+            self.pipeline.submit(SimpleNamespace(task_id=task_id))
+        self.wait_done(2)
+
+        self.assertEqual(self.pipeline.get_results(), [])
+        self.assertEqual(self.pipeline.metrics()['failed'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
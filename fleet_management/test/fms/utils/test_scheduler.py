@@ -0,0 +1,37 @@
+import unittest
+
+from fleet_management.utils.scheduler import EventScheduler
+
+
+class EventSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.runs = list()
+        self.scheduler = EventScheduler(tick_rates={'periodic': 100})
+        self.scheduler.add_component('periodic', lambda: self.runs.append('periodic'))
+        self.scheduler.add_component('on_event', lambda: self.runs.append('on_event'), events=['allocation'])
+
+    def test_periodic_component(self):
+        self.scheduler.run_once(timeout=0.5)
+        self.assertEqual(self.runs, ['periodic'])
+
+    def test_event_wakes_component(self):
+        self.scheduler.run_once(timeout=0.5)
+        self.scheduler.notify('allocation')
+        self.scheduler.run_once(timeout=0.5)
+        self.assertEqual(self.runs.count('on_event'), 1)
+
+    def test_delayed_event(self):
+        self.scheduler.notify('allocation', delay=0.05)
+        for _ in range(20):
+            self.scheduler.run_once(timeout=0.01)
+        self.assertIn('on_event', self.runs)
+
+    def test_unknown_event(self):
+        self.scheduler.notify('dispatch')
+        self.scheduler.run_once(timeout=0.5)
+        self.assertNotIn('on_event', self.runs)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(EventSchedulerTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
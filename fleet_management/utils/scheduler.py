@@ -0,0 +1,127 @@
+import heapq
+import logging
+import threading
+import time
+
+
+class _ScheduledComponent(object):
+
+    def __init__(self, name, callback, period=None):
+        self.name = name
+        self.callback = callback
+        self.period = period
+        self.next_tick = time.monotonic()
+
+    def is_due(self, now):
+        return self.period is not None and now >= self.next_tick
+
+    def run(self, now):
+        if self.period is not None:
+            self.next_tick = now + self.period
+        self.callback()
+
+
+class EventScheduler(object):
+    """Runs the FMS components when there is work for them to do
+
+    Components are woken up by events (e.g. the arrival of a message of a given type,
+    a new allocation or a task becoming dispatchable) and, optionally, at a fixed tick
+    rate for the periodic work that is not triggered by any event.
+
+    Args:
+        tick_rates (dict): Tick rate (in Hz) of each component. A component without a
+                           tick rate only runs when one of its events is notified
+        default_tick_rate (float): Tick rate of components not listed in ``tick_rates``
+    """
+
+    def __init__(self, tick_rates=None, default_tick_rate=None, **_):
+        self.logger = logging.getLogger('fms.scheduler')
+        self.tick_rates = tick_rates or dict()
+        self.default_tick_rate = default_tick_rate
+
+        self._components = list()
+        self._subscriptions = dict()
+        self._pending = set()
+        self._timers = list()
+        self._condition = threading.Condition()
+        self._running = False
+
+    def add_component(self, name, callback, events=None, tick_rate=None):
+        """Registers the periodic work of a component
+
+        Args:
+            name (str): The name of the component
+            callback (callable): The function to run
+            events (list): Events that wake up the component
+            tick_rate (float): Overrides the tick rate (in Hz) from the configuration
+        """
+        if tick_rate is None:
+            tick_rate = self.tick_rates.get(name, self.default_tick_rate)
+        period = 1.0 / tick_rate if tick_rate else None
+
+        with self._condition:
+            self._components.append(_ScheduledComponent(name, callback, period))
+            for event in events or list():
+                self._subscriptions.setdefault(event, set()).add(name)
+
+        self.logger.debug("Scheduling %s (tick rate: %s Hz, events: %s)", name, tick_rate, events)
+
+    def notify(self, event, delay=0):
+        """Wakes up the components subscribed to an event
+
+        Args:
+            event (str): The event that occurred
+            delay (float): Seconds from now at which the components should be woken up
+        """
+        with self._condition:
+            if delay > 0:
+                heapq.heappush(self._timers, (time.monotonic() + delay, event))
+            else:
+                self._pending.update(self._subscriptions.get(event, set()))
+            self._condition.notify()
+
+    def run_once(self, timeout=None):
+        """Waits until at least one component is due and runs all the due components
+
+        Args:
+            timeout (float): Maximum number of seconds to wait
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._release_timers(now)
+            wait = self._time_to_next_run(now)
+            if timeout is not None:
+                wait = min(wait, timeout) if wait is not None else timeout
+            if not self._pending and (wait is None or wait > 0):
+                self._condition.wait(wait)
+                now = time.monotonic()
+                self._release_timers(now)
+
+            due = [c for c in self._components if c.name in self._pending or c.is_due(now)]
+            self._pending.clear()
+
+        for component in due:
+            component.run(now)
+
+    def run(self):
+        self._running = True
+        while self._running:
+            self.run_once()
+
+    def shutdown(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def _release_timers(self, now):
+        while self._timers and self._timers[0][0] <= now:
+            _, event = heapq.heappop(self._timers)
+            self._pending.update(self._subscriptions.get(event, set()))
+
+    def _time_to_next_run(self, now):
+        deadlines = [c.next_tick for c in self._components if c.period is not None]
+        if self._timers:
+            deadlines.append(self._timers[0][0])
+        if not deadlines:
+            return None
+        return max(min(deadlines) - now, 0)